@@ -0,0 +1,148 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Asset names are bytes in DataDescriptions
+def asset_name(name) -> str:
+    if isinstance(name, bytes):
+        return name.decode('utf-8')
+    return name
+
+
+# Name / id / array index lookups for the assets of one NAT_MODELDEF, built
+# once per model definition so per-frame lookups are plain dict reads.
+#
+# Indices are the positions assets take in a fully decoded frame (the order of
+# the model definition): row of frame.rigid_bodies, row of frame.skeletons[id]
+# for bones, position in frame.marker_sets. Frame helpers check the id at that
+# index and fall back to searching, so they stay correct for subscribed frames.
+class AssetRegistry:
+    def __init__(self, data_descs=None) -> None:
+        self.clear()
+        if data_descs is not None:
+            self.update(data_descs)
+
+    def clear(self) -> None:
+        # Number of model definitions this registry has been built from
+        self.version = 0
+
+        # name -> id, id -> name, id -> index
+        self.rigid_body_ids = OrderedDict()
+        self.rigid_body_names = OrderedDict()
+        self.rigid_body_indices = {}
+
+        self.skeleton_ids = OrderedDict()
+        self.skeleton_names = OrderedDict()
+        self.skeleton_indices = {}
+
+        # skeleton id -> (bone name -> bone id, bone id -> name, bone id -> row)
+        self.bone_ids = {}
+        self.bone_names = {}
+        self.bone_indices = {}
+
+        # marker set name -> index, marker set name -> (marker name -> column)
+        self.marker_set_indices = OrderedDict()
+        self.marker_indices = {}
+
+    # Rebuild from a DataDescriptions object
+    def update(self, data_descs) -> None:
+        version = self.version
+        self.clear()
+        self.version = version + 1
+
+        for index, rigid_body in enumerate(data_descs.rigid_body_list):
+            name = asset_name(rigid_body.sz_name)
+            self.rigid_body_ids[name] = rigid_body.id_num
+            self.rigid_body_names[rigid_body.id_num] = name
+            self.rigid_body_indices[rigid_body.id_num] = index
+
+        for index, skeleton in enumerate(data_descs.skeleton_list):
+            name = asset_name(skeleton.name)
+            self.skeleton_ids[name] = skeleton.id_num
+            self.skeleton_names[skeleton.id_num] = name
+            self.skeleton_indices[skeleton.id_num] = index
+
+            bone_ids = self.bone_ids[skeleton.id_num] = OrderedDict()
+            bone_names = self.bone_names[skeleton.id_num] = OrderedDict()
+            bone_indices = self.bone_indices[skeleton.id_num] = {}
+            for row, bone in enumerate(skeleton.rigid_body_description_list):
+                # frames pack bone ids as (skeleton id << 16) | bone id
+                bone_id = bone.id_num & 0xffff
+                bone_name = asset_name(bone.sz_name)
+                bone_ids[bone_name] = bone_id
+                bone_names[bone_id] = bone_name
+                bone_indices[bone_id] = row
+
+        for index, marker_set in enumerate(data_descs.marker_set_list):
+            name = asset_name(marker_set.marker_set_name)
+            self.marker_set_indices[name] = index
+            self.marker_indices[name] = OrderedDict(
+                (asset_name(marker_name), column) for column, marker_name in enumerate(marker_set.marker_names_list))
+
+    # Id of a rigid body given by name (ids pass through)
+    def rigid_body_id(self, rigid_body) -> int:
+        if isinstance(rigid_body, str):
+            return self.rigid_body_ids[rigid_body]
+        return rigid_body
+
+    def skeleton_id(self, skeleton) -> int:
+        if isinstance(skeleton, str):
+            return self.skeleton_ids[skeleton]
+        return skeleton
+
+    # Bone id within a skeleton, both given by name or id
+    def bone_id(self, skeleton, bone) -> int:
+        if isinstance(bone, str):
+            return self.bone_ids[self.skeleton_id(skeleton)][bone]
+        return bone
+
+    # Row of a rigid body in frame.rigid_bodies
+    def rigid_body_index(self, rigid_body) -> int:
+        return self.rigid_body_indices[self.rigid_body_id(rigid_body)]
+
+    # Row of a bone in frame.skeletons[skeleton id]
+    def bone_index(self, skeleton, bone) -> int:
+        skeleton_id = self.skeleton_id(skeleton)
+        return self.bone_indices[skeleton_id][self.bone_id(skeleton_id, bone)]
+
+    # Column of a marker in frame.marker_sets[marker set name]
+    def marker_index(self, marker_set, marker) -> int:
+        return self.marker_indices[marker_set][marker]
+
+    # Name of the asset a labeled marker belongs to; labeled marker ids
+    # are packed as (model id << 16) | marker id
+    def marker_model_name(self, marker_id) -> str:
+        model_id = marker_id >> 16
+        if model_id in self.rigid_body_names:
+            return self.rigid_body_names[model_id]
+        return self.skeleton_names.get(model_id)
+
+    # Record of a rigid body in a structures.FrameArrays, or None
+    def rigid_body(self, frame, rigid_body):
+        rigid_body_id = self.rigid_body_id(rigid_body)
+        return _find(frame.rigid_bodies, self.rigid_body_indices.get(rigid_body_id), rigid_body_id)
+
+    # Record of a bone in a structures.FrameArrays, or None
+    def bone(self, frame, skeleton, bone):
+        skeleton_id = self.skeleton_id(skeleton)
+        bone_id = self.bone_id(skeleton_id, bone)
+        bones = frame.skeletons.get(skeleton_id)
+        return _find(bones, self.bone_indices[skeleton_id].get(bone_id), bone_id, mask=True)
+
+
+# Record with the given id, trying the expected row first
+def _find(records, index, record_id, mask=False):
+    if records is None:
+        return None
+    if index is not None and index < len(records):
+        found_id = int(records[index]['id'])
+        if mask:
+            found_id &= 0xffff
+        if found_id == record_id:
+            return records[index]
+    ids = records['id'] & 0xffff if mask else records['id']
+    rows = np.flatnonzero(ids == record_id)
+    if len(rows) == 0:
+        return None
+    return records[rows[0]]
@@ -0,0 +1,272 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+from Resources.APIs.Official.PythonClient.NatNetClient import NatNetClient, get_message_id
+
+from OptiTracker import OptiTracker
+from FrameBuffer import EVICT_OLDEST
+
+
+class NatNetProtocol(asyncio.DatagramProtocol):
+    def __init__(self, packet_received) -> None:
+        self.packet_received = packet_received
+
+    def datagram_received(self, data, addr) -> None:
+        self.packet_received(data)
+
+    def error_received(self, exc) -> None:
+        print("ERROR: socket error occurred:\n  %s" % exc)
+
+
+# Runs a NatNetClient on an asyncio event loop instead of its receive and
+# decode threads. Packets are decoded on the loop as they arrive, so
+# listeners run on the loop thread.
+#
+# Each datagram arrives in its own bytes object, so the structures.FrameArrays
+# views handed out by frames() stay valid for as long as the frame is kept.
+class AsyncNatNetClient:
+    def __init__(self, client: NatNetClient = None, frame_queue_size: int = 240) -> None:
+        self.client = client if client is not None else NatNetClient()
+        self.client.frame_arrays_listener = self.__frame_received
+        self.client.command_response_listener = self.__response_received
+
+        # Called with every frame, whether or not frames() is being iterated
+        self.frame_listener = None
+
+        # Created by connect(), on the loop it is used from
+        self.frame_queue_size = frame_queue_size
+        self.frame_queue = None
+        self.frame_consumers = 0
+        self.reading_paused = False
+
+        self.data_transport = None
+        self.command_transport = None
+        self.keep_alive_task = None
+
+        # message id of the expected reply -> futures waiting for it, oldest first
+        self.pending = {
+            NatNetClient.NAT_SERVERINFO: deque(),
+            NatNetClient.NAT_MODELDEF: deque(),
+            NatNetClient.NAT_RESPONSE: deque()
+        }
+
+    # Open the sockets and connect to the server. Returns the server version.
+    async def connect(self, timeout: float = 2.0) -> list:
+        if not self.client.open_sockets():
+            raise ConnectionError("Could not open NatNet sockets")
+        loop = asyncio.get_running_loop()
+        self.frame_queue = asyncio.Queue(self.frame_queue_size)
+
+        self.client.data_socket.setblocking(False)
+        self.client.command_socket.setblocking(False)
+        self.data_transport, _ = await loop.create_datagram_endpoint(
+            lambda: NatNetProtocol(self.__packet_received), sock=self.client.data_socket)
+        self.command_transport, _ = await loop.create_datagram_endpoint(
+            lambda: NatNetProtocol(self.__packet_received), sock=self.client.command_socket)
+
+        if not self.client.use_multicast:
+            self.keep_alive_task = loop.create_task(self.__keep_alive())
+
+        return await self.__request(NatNetClient.NAT_SERVERINFO, NatNetClient.NAT_CONNECT, "", timeout)
+
+    async def close(self) -> None:
+        if self.keep_alive_task is not None:
+            self.keep_alive_task.cancel()
+            self.keep_alive_task = None
+        for transport in (self.data_transport, self.command_transport):
+            if transport is not None:
+                transport.close()
+        self.data_transport = None
+        self.command_transport = None
+
+        for futures in self.pending.values():
+            while futures:
+                futures.popleft().cancel()
+
+        # end any frames() iterators
+        if self.frame_queue is None:
+            return
+        if self.frame_queue.full():
+            self.frame_queue.get_nowait()
+        self.frame_queue.put_nowait(None)
+
+    # Send a command string (e.g. "StartRecording") and wait for its NAT_RESPONSE.
+    # Replies are matched to requests in the order they were sent.
+    async def send_command(self, command_str: str, timeout: float = 2.0):
+        return await self.__request(NatNetClient.NAT_RESPONSE, NatNetClient.NAT_REQUEST, command_str, timeout)
+
+    # Request the model definitions and wait for them (DataDescriptions)
+    async def request_model_def(self, timeout: float = 2.0):
+        return await self.__request(NatNetClient.NAT_MODELDEF, NatNetClient.NAT_REQUEST_MODELDEF, "", timeout)
+
+    # Decoded frames (structures.FrameArrays), oldest first. When the consumer
+    # falls frame_queue_size frames behind, reading from the sockets pauses and
+    # the kernel receive buffer absorbs the backlog (see socket_receive_buffer_size).
+    async def frames(self):
+        if self.frame_queue is None:
+            raise RuntimeError("frames() needs a connected client, call connect() first")
+        self.frame_consumers += 1
+        try:
+            while True:
+                frame = await self.frame_queue.get()
+                if frame is None:
+                    return
+                if self.reading_paused:
+                    self.__resume_reading()
+                yield frame
+        finally:
+            self.frame_consumers -= 1
+            if self.reading_paused and self.frame_consumers == 0:
+                self.__resume_reading()
+
+    async def __request(self, response_id, command, command_str, timeout):
+        future = asyncio.get_running_loop().create_future()
+        self.pending[response_id].append(future)
+        self.command_transport.sendto(self.client.compose_request(command, command_str),
+                                      (self.client.server_ip_address, self.client.command_port))
+        return await asyncio.wait_for(future, timeout)
+
+    def __packet_received(self, data) -> None:
+        arrival_time = time.perf_counter()
+        self.client.metrics.record_packet(get_message_id(data), arrival_time)
+        if self.client.packet_listener is not None:
+            self.client.packet_listener(data, arrival_time)
+        self.client.process_packet(data, self.client.print_level)
+
+    def __frame_received(self, frame) -> None:
+        if self.frame_listener is not None:
+            self.frame_listener(frame)
+        if self.frame_consumers == 0:
+            return
+        if self.frame_queue.full():
+            # only reached if the transport could not be paused
+            self.frame_queue.get_nowait()
+            self.client.metrics.record_overflow()
+        self.frame_queue.put_nowait(frame)
+        if self.frame_queue.full():
+            self.__pause_reading()
+
+    def __response_received(self, message_id, payload) -> None:
+        if message_id == NatNetClient.NAT_UNRECOGNIZED_REQUEST:
+            future = self.__next_pending(NatNetClient.NAT_RESPONSE)
+            if future is not None:
+                future.set_exception(ValueError("Request not recognized by the NatNet server"))
+            return
+        future = self.__next_pending(message_id)
+        if future is not None:
+            future.set_result(payload)
+
+    # Oldest future still waiting for a reply of this type
+    def __next_pending(self, message_id):
+        futures = self.pending.get(message_id)
+        while futures:
+            future = futures.popleft()
+            if not future.done():
+                return future
+        return None
+
+    def __transports(self):
+        # in unicast mode frames arrive on the command socket
+        return [transport for transport in (self.data_transport, self.command_transport) if transport is not None]
+
+    def __pause_reading(self) -> None:
+        for transport in self.__transports():
+            if hasattr(transport, 'pause_reading'):
+                transport.pause_reading()
+        self.reading_paused = True
+
+    def __resume_reading(self) -> None:
+        for transport in self.__transports():
+            if hasattr(transport, 'resume_reading'):
+                transport.resume_reading()
+        self.reading_paused = False
+
+    async def __keep_alive(self) -> None:
+        keep_alive = self.client.compose_request(NatNetClient.NAT_KEEPALIVE, "")
+        while True:
+            self.command_transport.sendto(keep_alive, (self.client.server_ip_address, self.client.command_port))
+            await asyncio.sleep(1.0)
+
+
+# OptiTracker driven by asyncio: frames still go to the frame buffer and
+# recorders, and can also be consumed with `async for frame in tracker.frames()`.
+class AsyncOptiTracker(OptiTracker):
+    def __init__(self, buffer_capacity: int = 7200, eviction: str = EVICT_OLDEST,
+                 frame_queue_size: int = 240) -> None:
+        super().__init__(buffer_capacity, eviction)
+
+        self.async_client = AsyncNatNetClient(self.client, frame_queue_size)
+        self.async_client.frame_listener = self.get_new_frame_data
+
+        # Loop the client runs on, set by start_client
+        self.loop = None
+
+        # Future of a record(frames=...) call, done once the frame buffer has
+        # received record_target frames
+        self.record_waiter = None
+        self.record_target = None
+
+    # Connect and request the model definitions. Returns the server version.
+    async def start_client(self) -> list:
+        self.loop = asyncio.get_running_loop()
+        server_version = await self.async_client.connect()
+        # stored by get_data_descriptions, through full_description_listener
+        await self.async_client.request_model_def()
+        return server_version
+
+    async def stop_client(self) -> None:
+        await self.async_client.close()
+
+    def frames(self):
+        return self.async_client.frames()
+
+    def get_new_frame_data(self, frame_data, source: int = 0) -> None:
+        super().get_new_frame_data(frame_data, source)
+        waiter = self.record_waiter
+        if waiter is not None and not waiter.done() and self.frame_buffer.received >= self.record_target:
+            waiter.set_result(None)
+
+    # OptiTracker.record for the loop: frames are decoded on the loop, so
+    # waiting has to yield to it instead of blocking on frame_condition
+    async def record(self, duration: float = None, frames: int = None) -> OrderedDict:
+        if duration is None and frames is None:
+            raise ValueError("record needs a duration, a frame count, or both")
+
+        frame_buffer = self.frame_buffer
+        start = frame_buffer.appended
+        if frames is None:
+            await asyncio.sleep(duration)
+        else:
+            self.record_target = frame_buffer.received + frames
+            self.record_waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self.record_waiter, duration)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.record_waiter = None
+        return self._recorded(frame_buffer, start, frames)
+
+    async def send_command(self, command_str: str, timeout: float = 2.0):
+        return await self.async_client.send_command(command_str, timeout)
+
+    # Request the model definitions and wait for them (DataDescriptions); not
+    # an override of OptiTracker.request_model_def, which only sends the request
+    async def request_model_def_async(self, timeout: float = 2.0):
+        return await self.async_client.request_model_def(timeout)
+
+    # Request the model definitions from the loop, without waiting for them
+    def _refresh_model_defs(self, source: int = 0) -> None:
+        if self.loop is None or self.async_client.command_transport is None:
+            return
+        stream = self.sources[source]
+        stream.model_def_requested = True
+        stream.model_def_requested_at = time.monotonic()
+        self.loop.call_soon_threadsafe(self.__refresh_model_defs)
+
+    def __refresh_model_defs(self) -> None:
+        task = self.loop.create_task(self.async_client.request_model_def(self.model_def_timeout))
+        # stored by get_data_descriptions; a lost reply is asked for again
+        # with the next changed frame after model_def_timeout
+        task.add_done_callback(lambda task: task.cancelled() or task.exception())
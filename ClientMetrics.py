@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+
+# Reception and decode telemetry for NatNetClient.
+#
+# Recording is a handful of counter updates and array writes per packet, so it
+# can stay on in production; percentiles and rates are only computed when
+# get_data_dict() is called. Timing samples are kept for the last `window`
+# frames in preallocated arrays.
+#
+# Latencies come from the frame suffix hi-res stamps (NatNet 3.0+), which are
+# in server clock ticks:
+#   system latency    camera mid-exposure -> Motive transmit
+#   software latency  data received by Motive -> Motive transmit
+# Transit time to this client is not included, that would need the client
+# and server clocks to be synchronised.
+#
+# Packets are recorded from both the data and the command receive threads,
+# so those counters are updated under a lock.
+class ClientMetrics:
+    def __init__(self, window: int = 1024) -> None:
+        self.window = window
+
+        self.arrival_times = np.zeros(window, dtype=np.float64)
+        self.decode_times = np.zeros(window, dtype=np.float64)
+        self.system_latencies = np.zeros(window, dtype=np.float64)
+        self.software_latencies = np.zeros(window, dtype=np.float64)
+
+        # Server hi-res clock ticks per second, from NAT_SERVERINFO (0 if unknown)
+        self.clock_frequency = 0
+
+        self.packet_lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        # message id -> packets received
+        self.message_counts = {}
+        self.packets_received = 0
+        self.packets_overflowed = 0
+        self.queue_peak = 0
+
+        self.frames_decoded = 0
+        self.frames_missed = 0
+        self.last_frame_number = None
+
+        # Packets whose decoding or listeners raised, and the last such error
+        self.decode_errors = 0
+        self.last_decode_error = None
+
+        self.arrival_count = 0
+        self.decode_count = 0
+        self.latency_count = 0
+
+    # Receive threads: a packet arrived (arrival_time in time.perf_counter seconds)
+    def record_packet(self, message_id, arrival_time) -> None:
+        with self.packet_lock:
+            self.packets_received += 1
+            self.message_counts[message_id] = self.message_counts.get(message_id, 0) + 1
+            self.arrival_times[self.arrival_count % self.window] = arrival_time
+            self.arrival_count += 1
+
+    # Receive threads: a packet was dropped because the receive queue was full
+    def record_overflow(self) -> None:
+        with self.packet_lock:
+            self.packets_overflowed += 1
+
+    def record_queue_depth(self, depth) -> None:
+        with self.packet_lock:
+            if depth > self.queue_peak:
+                self.queue_peak = depth
+
+    # Decode thread: a frame was decoded in decode_time seconds.
+    # stamps is (camera mid-exposure, data received, transmit) or None.
+    def record_frame(self, frame_number, decode_time, stamps=None) -> None:
+        # frames lost before they were decoded (network, socket buffer or queue overflow)
+        if self.last_frame_number is not None and frame_number > self.last_frame_number + 1:
+            self.frames_missed += frame_number - self.last_frame_number - 1
+        self.last_frame_number = frame_number
+
+        self.decode_times[self.decode_count % self.window] = decode_time
+        self.decode_count += 1
+        self.frames_decoded += 1
+
+        if stamps is not None and self.clock_frequency > 0:
+            mid_exposure, data_received, transmit = stamps
+            slot = self.latency_count % self.window
+            self.system_latencies[slot] = (transmit - mid_exposure) / self.clock_frequency
+            self.software_latencies[slot] = (transmit - data_received) / self.clock_frequency
+            self.latency_count += 1
+
+    # Decode thread: processing a packet raised `error`
+    def record_decode_error(self, error) -> None:
+        self.decode_errors += 1
+        self.last_decode_error = error
+
+    # Packets per second over the arrival window
+    def receive_rate(self) -> float:
+        n = min(self.arrival_count, self.window)
+        if n < 2:
+            return 0.0
+        newest = self.arrival_times[(self.arrival_count - 1) % self.window]
+        oldest = self.arrival_times[(self.arrival_count - n) % self.window]
+        if newest <= oldest:
+            return 0.0
+        return float((n - 1) / (newest - oldest))
+
+    def get_data_dict(self, queue_depth=0) -> OrderedDict:
+        data = OrderedDict()
+        with self.packet_lock:
+            data['packets_received'] = self.packets_received
+            data['packets_overflowed'] = self.packets_overflowed
+            data['message_counts'] = dict(self.message_counts)
+        data['frames_decoded'] = self.frames_decoded
+        data['frames_missed'] = self.frames_missed
+        data['decode_errors'] = self.decode_errors
+        data['last_decode_error'] = repr(self.last_decode_error) if self.last_decode_error is not None else None
+        data['receive_rate_hz'] = self.receive_rate()
+        data['queue_depth'] = queue_depth
+        data['queue_peak'] = self.queue_peak
+        data['decode_ms'] = _percentiles(self.decode_times, self.decode_count, self.window)
+        data['system_latency_ms'] = _percentiles(self.system_latencies, self.latency_count, self.window)
+        data['software_latency_ms'] = _percentiles(self.software_latencies, self.latency_count, self.window)
+        return data
+
+
+# p50 / p99 in milliseconds of the valid part of a sample window
+def _percentiles(samples, count, window):
+    n = min(count, window)
+    if n == 0:
+        return {'p50': None, 'p99': None}
+    p50, p99 = np.percentile(samples[:n], (50, 99)) * 1e3
+    return {'p50': float(p50), 'p99': float(p99)}
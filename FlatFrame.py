@@ -0,0 +1,96 @@
+import sys
+
+import numpy as np
+
+
+# Fields every flat frame starts with
+FRAME_FIELDS = ('frame_number', 'timestamp', 'timecode', 'timecode_sub', 'params')
+
+# Fields per rigid body and per skeleton bone
+POSE_FIELDS = ('x', 'y', 'z', 'qx', 'qy', 'qz', 'qw')
+
+
+# Record dtype -> dtype viewing its pos and rot fields as one (7,) pose
+_pose_views = {}
+
+
+def _pose_view(dtype):
+    view = _pose_views.get(dtype)
+    if view is None:
+        # pos and rot are adjacent in every rigid body record
+        view = _pose_views[dtype] = np.dtype({
+            'names': ['pose'],
+            'formats': [('<f4', (len(POSE_FIELDS),))],
+            'offsets': [dtype.fields['pos'][1]],
+            'itemsize': dtype.itemsize
+        })
+    return view
+
+
+# A frame as one flat float64 record: the FRAME_FIELDS, then the pose of every
+# rigid body and then of every skeleton bone, in frame order. Field names are
+#   rigid_body_<id>_<pose field>
+#   skeleton_<id>_bone_<bone id>_<pose field>
+#
+# The record is preallocated and refilled in place for every frame, so
+# NatNetClient.flat_frame_listener gets the same object each time; copy
+# `values` to keep a frame. The field layout (and with it `fields`, `index`
+# and the interned names) is only rebuilt when the assets in a frame change,
+# which bumps `layout_version`. Labeled markers are left out, as their count
+# changes from frame to frame.
+class FlatFrame:
+    def __init__(self) -> None:
+        self.layout_version = 0
+        self.ids = None
+        self.__layout([], [])
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    # Value of a field by name; use values[i] with index[name] in loops
+    def __getitem__(self, name):
+        return self.values[self.index[name]]
+
+    def get_data_dict(self) -> dict:
+        return dict(zip(self.fields, self.values.tolist()))
+
+    # Refill from a structures.FrameArrays
+    def update(self, frame) -> None:
+        rigid_bodies = frame.rigid_bodies
+        skeletons = frame.skeletons
+
+        ids = (rigid_bodies['id'].tobytes() if rigid_bodies is not None else b'',) + tuple(
+            (skeleton_id, bones['id'].tobytes()) for skeleton_id, bones in skeletons.items())
+        if ids != self.ids:
+            self.ids = ids
+            self.__layout(rigid_bodies['id'] if rigid_bodies is not None else [],
+                          [(skeleton_id, bones['id']) for skeleton_id, bones in skeletons.items()])
+
+        suffix = frame.suffix
+        names = suffix.dtype.names
+        suffix = suffix.item()
+        self.values[0:5] = (frame.frame_number, suffix[names.index('timestamp')], suffix[0], suffix[1], suffix[-1])
+
+        poses = self.poses
+        row = 0
+        for records in ([rigid_bodies] if rigid_bodies is not None else []) + list(skeletons.values()):
+            end = row + len(records)
+            poses[row:end] = records.view(_pose_view(records.dtype))['pose']
+            row = end
+
+    def __layout(self, rigid_body_ids, skeletons) -> None:
+        fields = list(FRAME_FIELDS)
+        for rigid_body_id in rigid_body_ids:
+            fields.extend('rigid_body_%d_%s' % (rigid_body_id, field) for field in POSE_FIELDS)
+        for skeleton_id, bone_ids in skeletons:
+            for bone_id in bone_ids:
+                # frames pack bone ids as (skeleton id << 16) | bone id
+                fields.extend('skeleton_%d_bone_%d_%s' % (skeleton_id, int(bone_id) & 0xffff, field)
+                              for field in POSE_FIELDS)
+
+        self.fields = tuple(sys.intern(field) for field in fields)
+        self.index = {field: i for i, field in enumerate(self.fields)}
+        self.values = np.zeros(len(self.fields), dtype=np.float64)
+        # rigid bodies and bones as (n, 7) rows of values
+        self.poses = self.values[len(FRAME_FIELDS):].reshape(-1, len(POSE_FIELDS))
+        self.layout_version += 1
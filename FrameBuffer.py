@@ -0,0 +1,150 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Asset types kept by FrameBuffer, in row order
+ASSET_TYPES = ('rigid_bodies', 'skeletons', 'labeled_markers')
+
+# What to do when a full buffer receives another frame
+EVICT_OLDEST = 'overwrite'    # ring behaviour, oldest frame is dropped
+REJECT_NEWEST = 'reject'      # keep what is stored, drop the incoming frame
+
+
+# Fixed-capacity ring buffer of decoded frames (structures.FrameArrays).
+#
+# Every asset type gets a preallocated (capacity, width) structured array, where
+# width is the largest record count seen so far for that type (all skeleton bones
+# of a frame share one row). Storage is mirrored: frame k is written to slot
+# k % capacity and to slot k % capacity + capacity, so the latest n <= capacity
+# frames are always contiguous and can be returned as views instead of copies.
+class FrameBuffer:
+    def __init__(self, capacity: int = 7200, eviction: str = EVICT_OLDEST) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if eviction not in (EVICT_OLDEST, REJECT_NEWEST):
+            raise ValueError("eviction must be '%s' or '%s'" % (EVICT_OLDEST, REJECT_NEWEST))
+
+        self.capacity = capacity
+        self.eviction = eviction
+
+        # Frames ever appended, and frames dropped by the eviction policy
+        self.appended = 0
+        self.evicted = 0
+        # Frames passed to append(), whether stored or rejected
+        self.received = 0
+
+        self.frame_numbers = np.zeros(2 * capacity, dtype=np.int64)
+        self.timestamps = np.zeros(2 * capacity, dtype=np.float64)
+
+        # Per asset type: records (2 * capacity, width) and valid counts per row.
+        # Allocated on first use, since dtypes depend on the bitstream version.
+        self.records = OrderedDict((asset_type, None) for asset_type in ASSET_TYPES)
+        self.counts = OrderedDict(
+            (asset_type, np.zeros(2 * capacity, dtype=np.int32)) for asset_type in ASSET_TYPES)
+
+    def __len__(self) -> int:
+        return min(self.appended, self.capacity)
+
+    # Drop all stored frames, keeping the allocated storage
+    def clear(self) -> None:
+        self.appended = 0
+        self.evicted = 0
+        self.received = 0
+        for counts in self.counts.values():
+            counts[:] = 0
+
+    # Copy a frame into the ring. O(1) in the number of stored frames.
+    # Returns False if the frame was rejected by the eviction policy.
+    def append(self, frame) -> bool:
+        self.received += 1
+        if self.appended >= self.capacity and self.eviction == REJECT_NEWEST:
+            self.evicted += 1
+            return False
+        if self.appended >= self.capacity:
+            self.evicted += 1
+
+        slot = self.appended % self.capacity
+        mirror = slot + self.capacity
+
+        self.frame_numbers[slot] = self.frame_numbers[mirror] = frame.frame_number
+        self.timestamps[slot] = self.timestamps[mirror] = frame.timestamp
+
+        self.__write(
+            'rigid_bodies', slot, [frame.rigid_bodies] if frame.rigid_bodies is not None else [])
+        self.__write('skeletons', slot, list(frame.skeletons.values()))
+        self.__write(
+            'labeled_markers', slot, [frame.labeled_markers] if frame.labeled_markers is not None else [])
+
+        self.appended += 1
+        return True
+
+    def __write(self, asset_type, slot, blocks) -> None:
+        count = 0
+        for block in blocks:
+            count += len(block)
+
+        if count > 0:
+            records = self.__reserve(asset_type, blocks[0].dtype, count)
+
+        counts = self.counts[asset_type]
+        counts[slot] = counts[slot + self.capacity] = count
+        if count == 0:
+            return
+
+        row = records[slot]
+        start = 0
+        for block in blocks:
+            row[start:start + len(block)] = block
+            start += len(block)
+        records[slot + self.capacity, :count] = row[:count]
+
+    # Make sure the records array for asset_type fits `count` records of `dtype`
+    def __reserve(self, asset_type, dtype, count) -> np.ndarray:
+        records = self.records[asset_type]
+        if records is not None and records.dtype != dtype:
+            # bitstream version changed, older rows of this type can't be kept
+            self.counts[asset_type][:] = 0
+            records = None
+        if records is None:
+            records = np.zeros((2 * self.capacity, count), dtype=dtype)
+        elif records.shape[1] < count:
+            grown = np.zeros((2 * self.capacity, count), dtype=dtype)
+            grown[:, :records.shape[1]] = records
+            records = grown
+        self.records[asset_type] = records
+        return records
+
+    # Slice of the mirrored storage holding the latest n frames
+    def __window(self, n) -> slice:
+        n = max(0, min(n, len(self)))
+        start = (self.appended - n) % self.capacity
+        return slice(start, start + n)
+
+    # Views over a window: frame numbers, timestamps, and per asset type the
+    # (n, width) records plus '<asset_type>_count' with valid records per row
+    def __views(self, window) -> OrderedDict:
+        views = OrderedDict()
+        views['frame_number'] = self.frame_numbers[window]
+        views['timestamp'] = self.timestamps[window]
+        for asset_type, records in self.records.items():
+            if records is None:
+                views[asset_type] = None
+            else:
+                views[asset_type] = records[window]
+            views[asset_type + '_count'] = self.counts[asset_type][window]
+        return views
+
+    # Latest n frames (all stored frames if n is None), oldest first
+    def latest(self, n: int = None) -> OrderedDict:
+        if n is None:
+            n = len(self)
+        return self.__views(self.__window(n))
+
+    # Frames with a frame number greater than frame_number, oldest first.
+    # Relies on frame numbers increasing, as they do within a Motive session.
+    def since(self, frame_number: int) -> OrderedDict:
+        window = self.__window(len(self))
+        frame_numbers = self.frame_numbers[window]
+        first = np.searchsorted(frame_numbers, frame_number, side='right')
+        return self.__views(slice(window.start + first, window.stop))
@@ -0,0 +1,289 @@
+import os
+import time
+import weakref
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from threading import Lock
+
+import numpy as np
+
+from structures import rigid_body_struct, labeled_marker_struct
+from FrameBuffer import ASSET_TYPES
+
+
+# Shared-memory segment layout:
+#   Header
+#   frame_number, timestamp              (2 * capacity,)
+#   per asset type: records              (2 * capacity, width)
+#                   counts               (2 * capacity,)
+# Storage is mirrored as in FrameBuffer, so the latest n frames are contiguous
+# and readers get them as views. Every array starts on a 64 byte boundary.
+BUS_MAGIC = b'NNBUS\0\0\1'
+
+Header = np.dtype([
+    ('magic', 'S8'),
+    ('capacity', '<u4'),
+    ('rigid_bodies', '<u4'),     # widths, in records per frame
+    ('skeletons', '<u4'),
+    ('labeled_markers', '<u4'),
+    ('sequence', '<u8'),         # seqlock, 2 * frames published (+1 while one is written)
+    ('truncated', '<u8')         # records dropped because a frame exceeded a width
+])
+
+# Records are kept in the 3.0 and later layout whatever version the server
+# streams; fields an older version lacks are left at zero
+BUS_RECORD_DTYPES = OrderedDict([
+    ('rigid_bodies', rigid_body_struct(3, 0)),
+    ('skeletons', rigid_body_struct(3, 0)),
+    ('labeled_markers', labeled_marker_struct(3, 0))
+])
+
+ALIGNMENT = 64
+
+# Names of the segments created by this process (and inherited by forked
+# children, which share its resource tracker)
+_published_names = set()
+
+
+# Array name -> (offset, dtype, shape) within a segment, and the segment size
+def bus_layout(capacity, widths):
+    arrays = OrderedDict()
+    offset = Header.itemsize
+
+    def place(name, dtype, shape):
+        nonlocal offset
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        arrays[name] = (offset, np.dtype(dtype), shape)
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+    place('frame_number', np.int64, (2 * capacity,))
+    place('timestamp', np.float64, (2 * capacity,))
+    for asset_type in ASSET_TYPES:
+        place(asset_type, BUS_RECORD_DTYPES[asset_type], (2 * capacity, widths[asset_type]))
+        place(asset_type + '_count', np.int32, (2 * capacity,))
+    return arrays, offset
+
+
+def _map_arrays(buffer, layout):
+    return OrderedDict(
+        (name, np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset))
+        for name, (offset, dtype, shape) in layout.items())
+
+
+# Publishes decoded frames (structures.FrameArrays) into a ring in shared
+# memory, so other processes on the machine can read them without running a
+# NatNetClient of their own (see FrameBusReader). Add it to an OptiTracker as
+# a frame sink (OptiTracker.start_frame_bus).
+#
+# Widths are fixed when the segment is created; records beyond them are
+# dropped and counted in the header's truncated field. Skeleton bones of a
+# frame share one row, as in FrameBuffer.
+#
+# Writes are guarded by a seqlock: the sequence counter is odd while a frame is
+# being written and the writer never waits for readers. Only the slot of the
+# frame being written changes, so readers of the latest capacity - 1 frames are
+# unaffected by a write in progress and can tell from the counter whether the
+# frames they read were overwritten since (see FrameBusReader.valid).
+#
+# close() may be called while the data thread is still writing a frame; the
+# two share a lock, and frames written after close() are ignored.
+class FramePublisher:
+    def __init__(self, name: str = None, capacity: int = 240, rigid_bodies: int = 64,
+                 skeletons: int = 512, labeled_markers: int = 512) -> None:
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+
+        self.capacity = capacity
+        self.widths = OrderedDict([
+            ('rigid_bodies', rigid_bodies),
+            ('skeletons', skeletons),
+            ('labeled_markers', labeled_markers)
+        ])
+
+        layout, size = bus_layout(capacity, self.widths)
+        self.shared_memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self.shared_memory.name
+        _published_names.add(self.name)
+
+        self.header = np.ndarray((), dtype=Header, buffer=self.shared_memory.buf)
+        self.header['capacity'] = capacity
+        for asset_type, width in self.widths.items():
+            self.header[asset_type] = width
+        self.header['sequence'] = 0
+        self.header['truncated'] = 0
+        self.arrays = _map_arrays(self.shared_memory.buf, layout)
+        self.lock = Lock()
+
+        # the magic goes in last, readers only attach to complete headers
+        self.header['magic'] = BUS_MAGIC
+
+    # Frames published so far
+    @property
+    def published(self) -> int:
+        return int(self.header['sequence']) // 2
+
+    # Copy a frame into the ring; called from the client's data thread
+    def write_frame(self, frame) -> None:
+        with self.lock:
+            if self.arrays is not None:
+                self.__write_frame(frame)
+
+    def __write_frame(self, frame) -> None:
+        sequence = int(self.header['sequence'])
+        published = sequence // 2
+        slot = published % self.capacity
+        mirror = slot + self.capacity
+
+        self.header['sequence'] = sequence + 1
+        arrays = self.arrays
+        arrays['frame_number'][slot] = arrays['frame_number'][mirror] = frame.frame_number
+        arrays['timestamp'][slot] = arrays['timestamp'][mirror] = frame.timestamp
+        self.__write(
+            'rigid_bodies', slot, [frame.rigid_bodies] if frame.rigid_bodies is not None else [])
+        self.__write('skeletons', slot, list(frame.skeletons.values()))
+        self.__write(
+            'labeled_markers', slot, [frame.labeled_markers] if frame.labeled_markers is not None else [])
+        self.header['sequence'] = sequence + 2
+
+    def __write(self, asset_type, slot, blocks) -> None:
+        row = self.arrays[asset_type][slot]
+        width = len(row)
+        count = 0
+        for block in blocks:
+            block = block[:width - count]
+            if len(block) == 0:
+                break
+            if block.dtype == row.dtype:
+                row[count:count + len(block)] = block
+            else:
+                # older bitstream version, copy the fields it has
+                for name in block.dtype.names:
+                    row[name][count:count + len(block)] = block[name]
+            count += len(block)
+
+        dropped = sum(len(block) for block in blocks) - count
+        if dropped:
+            self.header['truncated'] += dropped
+
+        counts = self.arrays[asset_type + '_count']
+        counts[slot] = counts[slot + self.capacity] = count
+        self.arrays[asset_type][slot + self.capacity, :count] = row[:count]
+
+    # Remove the segment; attached readers keep their mapping until they close
+    def close(self) -> None:
+        with self.lock:
+            if self.arrays is None:
+                return
+            # the arrays are the only views of the segment, it can't be
+            # closed while they exist
+            self.arrays = None
+            self.header = None
+            try:
+                self.shared_memory.close()
+            finally:
+                self.shared_memory.unlink()
+                _published_names.discard(self.name)
+
+
+# Read-only view of a FramePublisher's ring from another process.
+#
+# latest() hands out zero-copy views in the FrameBuffer.latest() layout plus
+# the 'generation' they were taken at. The publisher keeps writing into the
+# same memory, so views of a frame stay correct only until capacity newer
+# frames have arrived; check valid() after using them, or use read(), which
+# copies and retries until it got a consistent copy.
+class FrameBusReader:
+    def __init__(self, name: str) -> None:
+        self.shared_memory = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix' and name not in _published_names:
+            # attaching registers the segment with this process' resource
+            # tracker, which would unlink it when this process exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shared_memory._name, 'shared_memory')
+
+        self.header = np.ndarray((), dtype=Header, buffer=self.shared_memory.buf)
+        if bytes(self.header['magic']) != BUS_MAGIC:
+            self.header = None
+            self.shared_memory.close()
+            raise ValueError("%s is not a NatNet frame bus" % name)
+
+        self.capacity = int(self.header['capacity'])
+        self.widths = OrderedDict((asset_type, int(self.header[asset_type])) for asset_type in ASSET_TYPES)
+        self.layout, _ = bus_layout(self.capacity, self.widths)
+        self.__map()
+
+    def __map(self) -> None:
+        self.header = np.ndarray((), dtype=Header, buffer=self.shared_memory.buf)
+        self.arrays = _map_arrays(self.shared_memory.buf, self.layout)
+        for array in self.arrays.values():
+            array.flags.writeable = False
+
+    # Frames published so far; odd while a frame is being written
+    @property
+    def generation(self) -> int:
+        return int(self.header['sequence'])
+
+    @property
+    def published(self) -> int:
+        return self.generation // 2
+
+    @property
+    def truncated(self) -> int:
+        return int(self.header['truncated'])
+
+    # Views of the latest n published frames (at most capacity - 1), oldest first
+    def latest(self, n: int = 1) -> OrderedDict:
+        generation = self.generation
+        n = max(0, min(n, generation // 2, self.capacity - 1))
+        start = (generation // 2 - n) % self.capacity
+        window = slice(start, start + n)
+
+        views = OrderedDict()
+        views['generation'] = generation
+        views['frame_number'] = self.arrays['frame_number'][window]
+        views['timestamp'] = self.arrays['timestamp'][window]
+        for asset_type in ASSET_TYPES:
+            views[asset_type] = self.arrays[asset_type][window]
+            views[asset_type + '_count'] = self.arrays[asset_type + '_count'][window]
+        return views
+
+    # True if none of the frames in views (from latest) has been overwritten.
+    # A write overwrites the frame capacity frames older than the one it adds.
+    def valid(self, views) -> bool:
+        first = views['generation'] // 2 - len(views['frame_number'])
+        started = (self.generation + 1) // 2
+        return started <= first + self.capacity
+
+    # Consistent copy of the latest n frames
+    def read(self, n: int = 1) -> OrderedDict:
+        while True:
+            views = self.latest(n)
+            copied = OrderedDict(
+                (name, view.copy() if isinstance(view, np.ndarray) else view) for name, view in views.items())
+            if self.valid(views):
+                return copied
+
+    # Poll until more than `published` frames have been published or timeout
+    # seconds have passed. Returns the number of frames published.
+    def wait(self, published: int, timeout: float = None, interval: float = 0.0005) -> int:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            current = self.published
+            if current > published or (deadline is not None and time.monotonic() >= deadline):
+                return current
+            time.sleep(interval)
+
+    # Views handed out by latest() must be dropped before closing; while any
+    # exist close() raises BufferError and the reader stays usable. (numpy
+    # doesn't pin the mapping, unmapping it under a live view would crash.)
+    def close(self) -> None:
+        if self.arrays is None:
+            return
+        # views keep the array they were sliced from alive
+        mapped = [weakref.ref(array) for array in self.arrays.values()]
+        self.arrays = None
+        self.header = None
+        if any(array() is not None for array in mapped):
+            self.__map()
+            raise BufferError("views from FrameBusReader.latest() still exist, drop them before closing")
+        self.shared_memory.close()
@@ -0,0 +1,173 @@
+import bisect
+import time
+from collections import deque
+from threading import Event, Lock, Thread
+
+
+# Merges the frames of several NatNet streams into one stream in time order,
+# for an OptiTracker listening to more than one server. push() is called from
+# every client's decode thread; the listener gets (source, frame) in order.
+#
+# Every server stamps frames with its own clock (the FrameSuffixData
+# timestamp, seconds since it started). A source's timestamps are mapped onto
+# the local time.perf_counter clock through the smallest arrival - timestamp
+# seen from it over the last `offset_window` seconds, i.e. the offset of its
+# least delayed recent frame, so network and queueing jitter do not reorder
+# frames while clock drift between the machines is still followed.
+#
+# Frames wait in a per-source buffer until every source has one buffered (the
+# earliest of them is then next in time), or until they are `window` seconds
+# old, so a server that stalls holds the stream back by at most `window`.
+# A source buffer over `depth` frames releases the earliest frame right away.
+# Frames older than the last one released are late and dropped. Buffered
+# frames keep their server timestamp and are placed with the current offset.
+#
+# The listener is called outside the lock, one frame at a time and in order,
+# by whichever thread released frames first. Without new frames nothing is
+# released; call flush() periodically, or start() a thread that does.
+class FrameMerger:
+    def __init__(self, sources: int, listener, window: float = 0.05, depth: int = 64,
+                 offset_window: float = 10.0) -> None:
+        self.listener = listener
+        self.window = window
+        self.depth = depth
+        self.offset_window = offset_window
+
+        # Per source: local clock - server clock, the (arrival, offset)
+        # candidates for it within offset_window, smallest offset first, and
+        # frames waiting as (server timestamp, arrival order, frame), earliest first
+        self.offsets = [None] * sources
+        self.offset_candidates = [deque() for i in range(sources)]
+        self.pending = [deque() for i in range(sources)]
+        self.lock = Lock()
+
+        # Released frames waiting for the listener, and whether a thread is
+        # calling it
+        self.ready = deque()
+        self.delivering = False
+
+        # Local time of the last frame released
+        self.released_time = float('-inf')
+        self.pushed = 0
+        self.released = 0
+        self.late = 0
+
+        self.flush_thread = None
+        self.stop_flushing = Event()
+
+    # Local time of a frame timestamp from a source
+    def local_time(self, source: int, timestamp: float) -> float:
+        offset = self.offsets[source]
+        return timestamp + offset if offset is not None else None
+
+    # Buffer a frame (structures.FrameArrays) of a source; copies it, since
+    # frames are only valid during the frame listener call
+    def push(self, source: int, frame, arrival: float = None) -> None:
+        if arrival is None:
+            arrival = time.perf_counter()
+        timestamp = frame.timestamp
+
+        with self.lock:
+            offset = self.__update_offset(source, arrival, arrival - timestamp)
+            if timestamp + offset < self.released_time:
+                self.late += 1
+                return
+            self.pushed += 1
+            pending = self.pending[source]
+            entry = (timestamp, self.pushed, frame.copy())
+            if pending and timestamp < pending[-1][0]:
+                # packets of one stream can arrive out of order too
+                # (timestamp, arrival order) is unique, so frames are never compared
+                bisect.insort(pending, entry)
+            else:
+                pending.append(entry)
+            self.__release(arrival - self.window)
+        self.__deliver()
+
+    # Release frames that have waited `window` seconds; call periodically to
+    # drain the buffers when no frames arrive, or with everything=True on stop
+    def flush(self, everything: bool = False) -> None:
+        with self.lock:
+            self.__release(float('inf') if everything else time.perf_counter() - self.window)
+        self.__deliver()
+
+    # Flush every `interval` seconds (default window / 2) from a thread of its own
+    def start(self, interval: float = None) -> None:
+        if self.flush_thread is not None:
+            return
+        interval = interval if interval is not None else self.window / 2
+        self.stop_flushing.clear()
+        self.flush_thread = Thread(target=self.__flush_periodically, args=(interval,), daemon=True)
+        self.flush_thread.start()
+
+    def stop(self) -> None:
+        if self.flush_thread is None:
+            return
+        self.stop_flushing.set()
+        self.flush_thread.join()
+        self.flush_thread = None
+
+    # Frames buffered per source
+    def depths(self) -> list:
+        return [len(pending) for pending in self.pending]
+
+    def __flush_periodically(self, interval) -> None:
+        while not self.stop_flushing.wait(interval):
+            self.flush()
+
+    # Sliding window minimum of arrival - timestamp; returns the source's offset
+    def __update_offset(self, source, arrival, offset):
+        candidates = self.offset_candidates[source]
+        while candidates and candidates[-1][1] >= offset:
+            candidates.pop()
+        candidates.append((arrival, offset))
+        while candidates[0][0] < arrival - self.offset_window:
+            candidates.popleft()
+        offset = self.offsets[source] = candidates[0][1]
+        return offset
+
+    def __release(self, expired) -> None:
+        pending = self.pending
+        offsets = self.offsets
+        while True:
+            source = None
+            every_source = True
+            overfull = False
+            for i, frames in enumerate(pending):
+                if not frames:
+                    every_source = False
+                    continue
+                if len(frames) > self.depth:
+                    overfull = True
+                local_time = frames[0][0] + offsets[i]
+                if source is None or local_time < earliest:
+                    source = i
+                    earliest = local_time
+            if source is None:
+                return
+            if not (every_source or overfull or earliest <= expired):
+                return
+
+            timestamp, order, frame = pending[source].popleft()
+            self.released_time = earliest
+            self.released += 1
+            self.ready.append((source, frame))
+
+    # Hand released frames to the listener, unless another thread already is
+    def __deliver(self) -> None:
+        with self.lock:
+            if self.delivering or not self.ready:
+                return
+            self.delivering = True
+        try:
+            while True:
+                with self.lock:
+                    if not self.ready:
+                        self.delivering = False
+                        return
+                    source, frame = self.ready.popleft()
+                self.listener(source, frame)
+        except BaseException:
+            with self.lock:
+                self.delivering = False
+            raise
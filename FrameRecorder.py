@@ -0,0 +1,223 @@
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+# Columns every table starts with
+frame_key_struct = [
+    ('frame_number', '<i8'),
+    ('timestamp', '<f8')
+]
+
+
+# Record dtype -> same dtype prefixed with the frame key columns
+_keyed_dtypes = {}
+
+
+def keyed_struct(record_dtype):
+    dtype = _keyed_dtypes.get(record_dtype)
+    if dtype is None:
+        fields = [field for field in record_dtype.descr if field[0] not in ('frame_number', 'timestamp')]
+        dtype = _keyed_dtypes[record_dtype] = np.dtype(frame_key_struct + fields)
+    return dtype
+
+
+# Fill `rows` with `records` prefixed with the frame key columns
+def fill_keyed_rows(rows, records, frame_number, timestamp):
+    rows['frame_number'] = frame_number
+    rows['timestamp'] = timestamp
+    for name in records.dtype.names:
+        if name != 'timestamp':
+            rows[name] = records[name]
+
+
+# Skeleton table row: frame key plus all bones of the skeleton
+def skeleton_row_struct(bone_dtype, bone_count):
+    key = (bone_dtype, bone_count)
+    dtype = _keyed_dtypes.get(key)
+    if dtype is None:
+        dtype = _keyed_dtypes[key] = np.dtype(frame_key_struct + [('bones', bone_dtype, (bone_count,))])
+    return dtype
+
+
+# Growable block of rows waiting to be written to one table
+class RowBlock:
+    def __init__(self, dtype, capacity) -> None:
+        self.rows = np.empty(capacity, dtype=dtype)
+        self.count = 0
+
+    # View of the next n rows, to be filled in by the caller
+    def take(self, n):
+        end = self.count + n
+        if end > len(self.rows):
+            grown = np.empty(max(end, 2 * len(self.rows)), dtype=self.rows.dtype)
+            grown[:self.count] = self.rows[:self.count]
+            self.rows = grown
+        view = self.rows[self.count:end]
+        self.count = end
+        return view
+
+
+# Streams decoded frames (structures.FrameArrays) into a chunked, compressed
+# HDF5 file with one columnar table per asset:
+#   /frames                      frame number, timestamp and suffix fields
+#   /rigid_bodies/<id>           one row per frame
+#   /skeletons/<id>              one row per frame, bones as a fixed-size sub-array
+#   /labeled_markers/<model_id>  one row per marker per frame
+# Rows are batched in memory and written every flush_every frames, always
+# whole frames at a time.
+#
+# write_frame() runs on the decode thread while close() usually runs on
+# another one; after close() further frames are ignored.
+class FrameRecorder:
+    def __init__(self, path: str, flush_every: int = 240, chunk_rows: int = 4096,
+                 compression: str = 'gzip') -> None:
+        if h5py is None:
+            raise ImportError("FrameRecorder requires h5py (pip install h5py)")
+
+        self.path = path
+        self.flush_every = flush_every
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+
+        self.file = h5py.File(path, 'w')
+        self.frame_count = 0
+
+        # table path -> RowBlock waiting to be written, and (table path,
+        # RowBlock) queued before the table's definition changed, written first
+        self.pending = OrderedDict()
+        self.retired = []
+        self.pending_frames = 0
+
+        self.lock = Lock()
+        self.closed = False
+
+        # table path -> h5py dataset
+        self.datasets = {}
+
+    # Queue one frame for writing. Copies everything it keeps, so the
+    # frame's packet buffer can be reused as soon as this returns.
+    def write_frame(self, frame) -> None:
+        with self.lock:
+            if not self.closed:
+                self.__write_frame(frame)
+
+    def __write_frame(self, frame) -> None:
+        frame_number = frame.frame_number
+        timestamp = frame.timestamp
+
+        suffix = frame.suffix
+        fill_keyed_rows(self.__take('frames', keyed_struct(suffix.dtype), 1),
+                        suffix, frame_number, timestamp)
+
+        # Rigid bodies and labeled markers are split into per-asset tables at flush
+        rigid_bodies = frame.rigid_bodies
+        if rigid_bodies is not None and len(rigid_bodies):
+            rows = self.__take('rigid_bodies', keyed_struct(rigid_bodies.dtype), len(rigid_bodies))
+            fill_keyed_rows(rows, rigid_bodies, frame_number, timestamp)
+
+        for skeleton_id, bones in frame.skeletons.items():
+            row = self.__take('skeletons/%d' % skeleton_id, skeleton_row_struct(bones.dtype, len(bones)), 1)
+            row['frame_number'] = frame_number
+            row['timestamp'] = timestamp
+            row['bones'][0] = bones
+
+        labeled_markers = frame.labeled_markers
+        if labeled_markers is not None and len(labeled_markers):
+            rows = self.__take('labeled_markers', keyed_struct(labeled_markers.dtype), len(labeled_markers))
+            fill_keyed_rows(rows, labeled_markers, frame_number, timestamp)
+
+        self.frame_count += 1
+        self.pending_frames += 1
+        if self.pending_frames >= self.flush_every:
+            self.__flush()
+
+    # Reserve n pending rows of `dtype` for a table
+    def __take(self, table, dtype, n):
+        block = self.pending.get(table)
+        if block is not None and block.rows.dtype != dtype:
+            # definition changed, what was queued under the old one is
+            # written with the rest at the next flush
+            if block.count:
+                self.retired.append((table, block))
+            block = None
+        if block is None:
+            block = self.pending[table] = RowBlock(dtype, self.flush_every)
+        return block.take(n)
+
+    # Append all queued rows to their datasets
+    def flush(self) -> None:
+        with self.lock:
+            if not self.closed:
+                self.__flush()
+
+    def __flush(self) -> None:
+        for table, block in self.retired + list(self.pending.items()):
+            if block.count == 0:
+                continue
+            rows = block.rows[:block.count]
+            if table == 'rigid_bodies':
+                self.__append_split(table, rows, rows['id'])
+            elif table == 'labeled_markers':
+                self.__append_split(table, rows, rows['id'] >> 16)
+            else:
+                self.__append(table, rows)
+            block.count = 0
+        self.retired = []
+        self.pending_frames = 0
+        self.file.flush()
+
+    # One table per distinct key, e.g. rigid body id or marker model id
+    def __append_split(self, group, rows, keys) -> None:
+        for key in np.unique(keys):
+            self.__append('%s/%d' % (group, key), rows[keys == key])
+
+    def __append(self, table, rows) -> None:
+        dataset = self.__dataset(table, rows.dtype)
+        start = dataset.shape[0]
+        dataset.resize((start + len(rows),))
+        dataset[start:] = rows
+
+    def __dataset(self, table, dtype):
+        dataset = self.datasets.get(table)
+        if dataset is not None and dataset.dtype == dtype:
+            return dataset
+        # If an asset's definition changes mid-recording (e.g. its bone count),
+        # its new rows go to <table>_2, <table>_3, ...
+        name = table
+        version = 1
+        while name in self.file and self.file[name].dtype != dtype:
+            version += 1
+            name = '%s_%d' % (table, version)
+        if name in self.file:
+            dataset = self.file[name]
+        else:
+            dataset = self.file.create_dataset(
+                name, shape=(0,), maxshape=(None,), dtype=dtype,
+                chunks=(self.chunk_rows,), compression=self.compression)
+        self.datasets[table] = dataset
+        return dataset
+
+    def close(self) -> None:
+        with self.lock:
+            if self.closed:
+                return
+            self.__flush()
+            self.closed = True
+            self.file.attrs['frame_count'] = self.frame_count
+            self.file.close()
+            self.file = None
+
+
+# Open a recording for reading. Tables are h5py datasets, so slicing
+# them only reads (and decompresses) the chunks that are touched.
+def open_recording(path: str):
+    if h5py is None:
+        raise ImportError("open_recording requires h5py (pip install h5py)")
+    return h5py.File(path, 'r')
@@ -0,0 +1,79 @@
+import os
+import re
+import hashlib
+
+
+# Cache file: magic, then the NAT_MODELDEF payload exactly as received
+CACHE_MAGIC = b'NNDEF\0\0\1'
+
+
+# Content hash of a NAT_MODELDEF payload
+def model_def_hash(payload) -> str:
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+# NAT_MODELDEF payloads on disk, one file per server and version per content
+# hash, so a client can decode the last known model definitions as soon as it
+# knows which server it is talking to, before the MODELDEF reply arrives
+# (set it as NatNetClient.model_def_cache). Payloads are stored raw, as they
+# only decode under the bitstream version they were received with, which is
+# part of the key.
+class ModelDefCache:
+    def __init__(self, directory: str, keep: int = 4) -> None:
+        self.directory = directory
+        # Files kept per key, newest first
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    # Key of a server: its address, application name, server version and the
+    # NatNet bitstream version in use
+    @staticmethod
+    def key(server_address, application_name, server_version, nat_net_version) -> str:
+        key = "%s_%s_%s_%s" % (server_address, application_name,
+                               '.'.join(str(v) for v in server_version),
+                               '.'.join(str(v) for v in nat_net_version))
+        return re.sub(r'[^A-Za-z0-9_.-]', '-', key)
+
+    def __paths(self, key):
+        prefix = key + '_'
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.startswith(prefix) and name.endswith('.modeldef')]
+        return sorted(paths, key=os.path.getmtime, reverse=True)
+
+    # Most recently stored payload for a key, as (hash, payload), or None
+    def load(self, key):
+        for path in self.__paths(key):
+            try:
+                with open(path, 'rb') as cache_file:
+                    data = cache_file.read()
+            except OSError:
+                continue
+            if data[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+                continue
+            payload = data[len(CACHE_MAGIC):]
+            content_hash = model_def_hash(payload)
+            if path.endswith('_%s.modeldef' % content_hash):
+                return content_hash, payload
+        return None
+
+    # Store a payload under a key, making it the key's most recent one
+    def store(self, key, payload, content_hash: str = None) -> str:
+        if content_hash is None:
+            content_hash = model_def_hash(payload)
+        path = os.path.join(self.directory, '%s_%s.modeldef' % (key, content_hash))
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            # written under a temporary name so readers never see half a file
+            temporary_path = path + '.tmp'
+            with open(temporary_path, 'wb') as cache_file:
+                cache_file.write(CACHE_MAGIC)
+                cache_file.write(payload)
+            os.replace(temporary_path, path)
+
+        for stale_path in self.__paths(key)[self.keep:]:
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+        return content_hash
@@ -0,0 +1,555 @@
+import argparse
+import math
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from Resources.APIs.Official.PythonClient import MoCapData
+from Resources.APIs.Official.PythonClient import DataDescriptions
+from Resources.APIs.Official.PythonClient.NatNetClient import NatNetClient
+
+from structures import frame_layout, has_fixed_rigid_body_records, rigid_body_struct, labeled_marker_struct
+
+
+MessageHeader = struct.Struct('<HH')
+Int = struct.Struct('<i')
+Float = struct.Struct('<f')
+Double = struct.Struct('<d')
+Vector3 = struct.Struct('<fff')
+Quaternion = struct.Struct('<ffff')
+Pose = struct.Struct('<I3f4f')
+LabeledMarker = struct.Struct('<I3ff')
+Short = struct.Struct('<h')
+Timecode = struct.Struct('<II')
+FrameStamps = struct.Struct('<QQQ')
+
+
+# Serialization of MoCapData / DataDescriptions objects into NatNet packets,
+# the inverse of NatNetClient's __unpack_* methods for the same bitstream
+# versions. Names may be str or bytes.
+
+def _name(name) -> bytes:
+    if isinstance(name, str):
+        name = name.encode('utf-8')
+    return name + b'\0'
+
+
+def pack_message(message_id, payload) -> bytes:
+    return MessageHeader.pack(message_id, len(payload)) + payload
+
+
+def _pack_rigid_body(rigid_body, major, minor) -> bytes:
+    out = [Pose.pack(rigid_body.id_num, *rigid_body.pos, *rigid_body.rot)]
+    # Before 3.0 the markers of a rigid body are sent inline
+    if major < 3 and major != 0:
+        markers = rigid_body.rb_marker_list
+        out.append(Int.pack(len(markers)))
+        out.extend(Vector3.pack(*marker.pos) for marker in markers)
+        if major >= 2:
+            out.extend(Int.pack(marker.id_num) for marker in markers)
+            out.extend(Float.pack(marker.size) for marker in markers)
+    if major >= 2:
+        out.append(Float.pack(rigid_body.error))
+    if ((major == 2) and (minor >= 6)) or major > 2:
+        out.append(Short.pack(1 if rigid_body.tracking_valid else 0))
+    return b''.join(out)
+
+
+def _pack_channel_items(items) -> bytes:
+    out = [Int.pack(len(items))]
+    for item in items:
+        out.append(Int.pack(item.id_num) + Int.pack(len(item.channel_data_list)))
+        for channel in item.channel_data_list:
+            out.append(Int.pack(len(channel.frame_list)))
+            out.append(struct.pack('<%df' % len(channel.frame_list), *channel.frame_list))
+    return b''.join(out)
+
+
+# NAT_FRAMEOFDATA packet for a MoCapData
+def pack_mocap_data(mocap_data, major, minor) -> bytes:
+    out = [Int.pack(mocap_data.prefix_data.frame_number)]
+
+    marker_set_data = mocap_data.marker_set_data
+    out.append(Int.pack(len(marker_set_data.marker_data_list)))
+    for marker_data in marker_set_data.marker_data_list:
+        out.append(_name(marker_data.model_name) + Int.pack(len(marker_data.marker_pos_list)))
+        out.extend(Vector3.pack(*pos) for pos in marker_data.marker_pos_list)
+    unlabeled = marker_set_data.unlabeled_markers.marker_pos_list
+    out.append(Int.pack(len(unlabeled)))
+    out.extend(Vector3.pack(*pos) for pos in unlabeled)
+
+    rigid_bodies = mocap_data.rigid_body_data.rigid_body_list
+    out.append(Int.pack(len(rigid_bodies)))
+    out.extend(_pack_rigid_body(rigid_body, major, minor) for rigid_body in rigid_bodies)
+
+    # Skeletons (version 2.1 and later)
+    if ((major == 2) and (minor > 0)) or major > 2:
+        skeletons = mocap_data.skeleton_data.skeleton_list
+        out.append(Int.pack(len(skeletons)))
+        for skeleton in skeletons:
+            out.append(Int.pack(skeleton.id_num) + Int.pack(len(skeleton.rigid_body_list)))
+            out.extend(_pack_rigid_body(bone, major, minor) for bone in skeleton.rigid_body_list)
+
+    # Labeled markers (version 2.3 and later)
+    if ((major == 2) and (minor > 3)) or major > 2:
+        labeled_markers = mocap_data.labeled_marker_data.labeled_marker_list
+        out.append(Int.pack(len(labeled_markers)))
+        for marker in labeled_markers:
+            out.append(LabeledMarker.pack(marker.id_num, *marker.pos, marker.size))
+            if ((major == 2) and (minor >= 6)) or major > 2:
+                out.append(Short.pack(marker.param))
+            if major >= 3:
+                out.append(Float.pack(marker.residual))
+
+    # Force plates (2.9 and later) and devices (2.11 and later)
+    if ((major == 2) and (minor >= 9)) or major > 2:
+        out.append(_pack_channel_items(mocap_data.force_plate_data.force_plate_list))
+    if ((major == 2) and (minor >= 11)) or major > 2:
+        out.append(_pack_channel_items(mocap_data.device_data.device_list))
+
+    suffix = mocap_data.suffix_data
+    out.append(Timecode.pack(suffix.timecode, suffix.timecode_sub))
+    if ((major == 2) and (minor >= 7)) or major > 2:
+        out.append(Double.pack(suffix.timestamp))
+    else:
+        out.append(Float.pack(suffix.timestamp))
+    if major >= 3:
+        out.append(FrameStamps.pack(suffix.stamp_camera_mid_exposure, suffix.stamp_data_received,
+                                    suffix.stamp_transmit))
+    out.append(Short.pack(suffix.param))
+
+    return pack_message(NatNetClient.NAT_FRAMEOFDATA, b''.join(out))
+
+
+def _pack_rigid_body_description(rigid_body, major, minor) -> bytes:
+    out = []
+    if (major >= 2) or (major == 0):
+        out.append(_name(rigid_body.sz_name))
+    out.append(Int.pack(rigid_body.id_num) + Int.pack(rigid_body.parent_id) + Vector3.pack(*rigid_body.pos))
+    # Marker offsets and labels (3.0 and later), names (4.0 and later)
+    if (major >= 3) or (major == 0):
+        markers = rigid_body.rb_marker_list
+        out.append(Int.pack(len(markers)))
+        out.extend(Vector3.pack(*marker.pos) for marker in markers)
+        out.extend(Int.pack(marker.active_label) for marker in markers)
+        if (major >= 4) or (major == 0):
+            out.extend(_name(marker.marker_name) for marker in markers)
+    return b''.join(out)
+
+
+def _pack_description(data_type, description, major, minor) -> bytes:
+    if data_type == 0:
+        out = [_name(description.marker_set_name), Int.pack(len(description.marker_names_list))]
+        out.extend(_name(marker_name) for marker_name in description.marker_names_list)
+    elif data_type == 1:
+        out = [_pack_rigid_body_description(description, major, minor)]
+    elif data_type == 2:
+        out = [_name(description.name), Int.pack(description.id_num),
+               Int.pack(len(description.rigid_body_description_list))]
+        out.extend(_pack_rigid_body_description(bone, major, minor)
+                   for bone in description.rigid_body_description_list)
+    elif data_type == 3:
+        out = [Int.pack(description.id_num), _name(description.serial_number),
+               Float.pack(description.width), Float.pack(description.length), Vector3.pack(*description.position)]
+        for row in description.cal_matrix:
+            out.append(struct.pack('<12f', *row))
+        for corner in description.corners:
+            out.append(Vector3.pack(*corner))
+        out.append(Int.pack(description.plate_type) + Int.pack(description.channel_data_type))
+        out.append(Int.pack(len(description.channel_list)))
+        out.extend(_name(channel_name) for channel_name in description.channel_list)
+    elif data_type == 4:
+        out = [Int.pack(description.id_num), _name(description.name), _name(description.serial_number),
+               Int.pack(description.device_type) + Int.pack(description.channel_data_type),
+               Int.pack(len(description.channel_list))]
+        out.extend(_name(channel_name) for channel_name in description.channel_list)
+    else:
+        out = [_name(description.name), Vector3.pack(*description.position),
+               Quaternion.pack(*description.orientation)]
+    return Int.pack(data_type) + b''.join(out)
+
+
+# Description type ids, as read by NatNetClient.__unpack_data_descriptions
+description_types = {
+    'marker_set_list': 0,
+    'rigid_body_list': 1,
+    'skeleton_list': 2,
+    'force_plate_list': 3,
+    'device_list': 4,
+    'camera_list': 5
+}
+
+
+# NAT_MODELDEF packet for a DataDescriptions, in the order descriptions were added
+def pack_data_descriptions(data_descs, major, minor) -> bytes:
+    datasets = []
+    for list_name, pos in data_descs.data_order_dict.values():
+        data_type = description_types[list_name]
+        # force plates and devices are only described from 3.0 on
+        if data_type in (3, 4) and major < 3:
+            continue
+        datasets.append(_pack_description(data_type, getattr(data_descs, list_name)[pos], major, minor))
+    return pack_message(NatNetClient.NAT_MODELDEF, Int.pack(len(datasets)) + b''.join(datasets))
+
+
+# NAT_SERVERINFO packet
+def pack_server_info(application_name, server_version, nat_net_version, clock_frequency) -> bytes:
+    name = application_name.encode('utf-8')[:255]
+    payload = name + b'\0' * (256 - len(name))
+    payload += struct.pack('BBBB', *server_version) + struct.pack('BBBB', *nat_net_version)
+    payload += struct.pack('<Q', clock_frequency)
+    return pack_message(NatNetClient.NAT_SERVERINFO, payload)
+
+
+# Synthetic scene: rigid bodies with ids 1.., skeletons with the ids after
+# them, a marker set and marker_count labeled markers per asset.
+# Returns (DataDescriptions, MoCapData) with everything at rest.
+def build_scene(rigid_body_count=2, skeleton_count=1, bone_count=21, marker_count=3, unlabeled_marker_count=0):
+    data_descs = DataDescriptions.DataDescriptions()
+    mocap_data = MoCapData.MoCapData()
+    mocap_data.set_prefix_data(MoCapData.FramePrefixData(0))
+    marker_set_data = MoCapData.MarkerSetData()
+    rigid_body_data = MoCapData.RigidBodyData()
+    skeleton_data = MoCapData.SkeletonData()
+    labeled_marker_data = MoCapData.LabeledMarkerData()
+    rot = [0.0, 0.0, 0.0, 1.0]
+
+    # model id -> (name, position)
+    models = []
+    for i in range(rigid_body_count):
+        models.append((i + 1, "RigidBody%d" % (i + 1), [0.5 * i, 1.0, 0.0]))
+    for i in range(skeleton_count):
+        models.append((rigid_body_count + i + 1, "Skeleton%d" % (i + 1), [0.5 * i, 0.0, 2.0]))
+
+    for model_id, name, pos in models:
+        marker_set = DataDescriptions.MarkerSetDescription()
+        marker_set.set_name(name.encode('utf-8'))
+        marker_data = MoCapData.MarkerData()
+        marker_data.set_model_name(name.encode('utf-8'))
+        for k in range(marker_count):
+            marker_pos = [pos[0] + 0.01 * k, pos[1], pos[2]]
+            marker_set.add_marker_name(("%s_%d" % (name, k + 1)).encode('utf-8'))
+            marker_data.add_pos(marker_pos, copy_data=False)
+            labeled_marker_data.add_labeled_marker(
+                MoCapData.LabeledMarker((model_id << 16) | (k + 1), marker_pos, 0.014, 0x04), copy_data=False)
+        data_descs.add_marker_set(marker_set)
+        marker_set_data.add_marker_data(marker_data, copy_data=False)
+
+    for i in range(unlabeled_marker_count):
+        marker_set_data.add_unlabeled_marker([0.0, 0.01 * i, 0.0], copy_data=False)
+
+    for model_id, name, pos in models[:rigid_body_count]:
+        description = DataDescriptions.RigidBodyDescription(name.encode('utf-8'), model_id, -1, pos)
+        rigid_body = MoCapData.RigidBody(model_id, list(pos), list(rot))
+        rigid_body.tracking_valid = True
+        for k in range(marker_count):
+            offset = [0.01 * k, 0.0, 0.0]
+            description.add_rb_marker(DataDescriptions.RBMarker("Marker%d" % (k + 1), k + 1, offset))
+            marker = MoCapData.RigidBodyMarker()
+            marker.pos = [pos[0] + offset[0], pos[1], pos[2]]
+            marker.id_num = k + 1
+            marker.size = 0.014
+            rigid_body.add_rigid_body_marker(marker, copy_data=False)
+        data_descs.add_rigid_body(description)
+        rigid_body_data.add_rigid_body(rigid_body, copy_data=False)
+
+    for model_id, name, pos in models[rigid_body_count:]:
+        description = DataDescriptions.SkeletonDescription(name.encode('utf-8'), model_id)
+        skeleton = MoCapData.Skeleton(model_id)
+        for j in range(bone_count):
+            bone_pos = [pos[0], pos[1] + 0.08 * j, pos[2]]
+            description.add_rigid_body_description(DataDescriptions.RigidBodyDescription(
+                ("%s_Bone%d" % (name, j + 1)).encode('utf-8'), j + 1, j, [0.0, 0.08, 0.0]))
+            # bone ids in frames are packed as (skeleton id << 16) | bone id
+            bone = MoCapData.RigidBody((model_id << 16) | (j + 1), bone_pos, list(rot))
+            bone.tracking_valid = True
+            skeleton.add_rigid_body(bone, copy_data=False)
+        data_descs.add_skeleton(description)
+        skeleton_data.add_skeleton(skeleton, copy_data=False)
+
+    suffix_data = MoCapData.FrameSuffixData()
+    suffix_data.timecode = 0
+    suffix_data.timecode_sub = 0
+    suffix_data.timestamp = 0.0
+    suffix_data.stamp_camera_mid_exposure = 0
+    suffix_data.stamp_data_received = 0
+    suffix_data.stamp_transmit = 0
+
+    mocap_data.set_marker_set_data(marker_set_data)
+    mocap_data.set_rigid_body_data(rigid_body_data)
+    mocap_data.set_skeleton_data(skeleton_data)
+    mocap_data.set_labeled_marker_data(labeled_marker_data)
+    mocap_data.set_force_plate_data(MoCapData.ForcePlateData())
+    mocap_data.set_device_data(MoCapData.DeviceData())
+    mocap_data.set_suffix_data(suffix_data)
+    return data_descs, mocap_data
+
+
+# A packed frame of the scene that is animated in place: positions and
+# rotations are rewritten through byte offsets found with structures.frame_layout,
+# so each frame costs a few NumPy operations whatever the asset count.
+class FrameTemplate:
+    def __init__(self, mocap_data, major, minor) -> None:
+        self.major = major
+        self.minor = minor
+        self.packet = bytearray(pack_mocap_data(mocap_data, major, minor))
+        self.bytes = np.frombuffer(self.packet, dtype=np.uint8)
+
+        # frame_layout offsets are relative to the payload
+        layout = frame_layout(memoryview(self.packet)[4:], major, minor)
+        self.frame_number_offset = 4 + layout['frame_number']
+        self.suffix_offset = 4 + layout['suffix']
+
+        # Byte offsets of every pose (rigid bodies and bones) and marker position
+        rb_size = rigid_body_struct(major, minor).itemsize
+        pose_offsets = []
+        rb_offset, rb_count = layout['rigid_bodies']
+        pose_offsets.extend(_record_offsets(rb_offset, rb_count, rb_size, major))
+        for _, bone_offset, bone_count in layout['skeletons']:
+            pose_offsets.extend(_record_offsets(bone_offset, bone_count, rb_size, major))
+        pose_offsets = 4 + np.array(pose_offsets, dtype=np.int64)
+
+        marker_offsets = []
+        for _, offset, count in layout['marker_sets']:
+            marker_offsets.extend(offset + 12 * np.arange(count))
+        lm_offset, lm_count = layout['labeled_markers']
+        lm_size = labeled_marker_struct(major, minor).itemsize
+        marker_offsets.extend(lm_offset + 4 + lm_size * np.arange(lm_count))
+        marker_offsets = 4 + np.array(marker_offsets, dtype=np.int64)
+
+        self.pos_columns = np.concatenate([pose_offsets + 4, marker_offsets])[:, None] + np.arange(12)
+        self.rot_columns = (pose_offsets + 16)[:, None] + np.arange(16)
+        self.rest_pos = self.bytes[self.pos_columns].copy().view('<f4')
+        self.phase = np.linspace(0.0, 2.0 * math.pi, len(self.pos_columns), endpoint=False)[:, None]
+
+        self.legacy_timestamp = not (((major == 2) and (minor >= 7)) or major > 2)
+
+    # Write frame `frame_number` at time t (seconds) and return the packet
+    def frame(self, frame_number, t, stamps=None) -> bytearray:
+        Int.pack_into(self.packet, self.frame_number_offset, frame_number)
+
+        # everything sways 5 cm and spins about y at 1/4 turn per second
+        angle = 0.5 * math.pi * t
+        pos = self.rest_pos + 0.05 * np.sin(2.0 * math.pi * 0.5 * t + self.phase).astype(np.float32)
+        self.bytes[self.pos_columns] = pos.view(np.uint8)
+        if len(self.rot_columns):
+            rot = np.array([0.0, math.sin(angle / 2), 0.0, math.cos(angle / 2)], dtype='<f4').view(np.uint8)
+            self.bytes[self.rot_columns] = rot
+
+        offset = self.suffix_offset + 8
+        if self.legacy_timestamp:
+            Float.pack_into(self.packet, offset, t)
+        else:
+            Double.pack_into(self.packet, offset, t)
+            if self.major >= 3 and stamps is not None:
+                FrameStamps.pack_into(self.packet, offset + 8, *stamps)
+        return self.packet
+
+
+# Offsets of consecutive fixed records, or the offsets listed for pre-3.0 ones
+def _record_offsets(offset, count, size, major):
+    if has_fixed_rigid_body_records(major):
+        return list(offset + size * np.arange(count))
+    return list(offset)
+
+
+# Local NatNet server for load-testing clients without Motive. Answers
+# NAT_CONNECT, NAT_REQUEST_MODELDEF, NAT_REQUEST ("Bitstream,<major>.<minor>"
+# switches the bitstream version, other commands return 0) and
+# NAT_KEEPALIVE on the command port, and streams NAT_FRAMEOFDATA at
+# frame_rate, multicast to multicast_address:data_port or unicast to every
+# client that connected.
+class NatNetSimulator:
+    def __init__(self, version=(4, 1), frame_rate: float = 120.0, rigid_body_count: int = 2,
+                 skeleton_count: int = 1, bone_count: int = 21, marker_count: int = 3,
+                 unlabeled_marker_count: int = 0, use_multicast: bool = True,
+                 local_ip_address: str = "127.0.0.1", multicast_address: str = "239.255.42.99",
+                 command_port: int = 1510, data_port: int = 1511) -> None:
+        self.version = tuple(version)
+        self.frame_rate = frame_rate
+        self.use_multicast = use_multicast
+        self.local_ip_address = local_ip_address
+        self.multicast_address = multicast_address
+        self.command_port = command_port
+        self.data_port = data_port
+
+        self.application_name = "NatNetSimulator"
+        self.server_version = (4, 1, 0, 0)
+        # hi-res stamps are time.perf_counter_ns() ticks
+        self.clock_frequency = 1000000000
+
+        self.data_descs, self.mocap_data = build_scene(
+            rigid_body_count, skeleton_count, bone_count, marker_count, unlabeled_marker_count)
+        self.template = FrameTemplate(self.mocap_data, *self.version)
+
+        # Unicast clients, address -> time last heard from
+        self.clients = {}
+        self.client_timeout = 5.0
+
+        self.frames_sent = 0
+        # Frames sent after their scheduled time had already passed
+        self.frames_late = 0
+
+        self.command_socket = None
+        self.data_socket = None
+        self.stop_threads = False
+        self.command_thread = None
+        self.frame_thread = None
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        self.command_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.command_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.command_socket.bind((self.local_ip_address, self.command_port))
+        self.command_socket.settimeout(0.1)
+        # command_port 0 picks a free port
+        self.command_port = self.command_socket.getsockname()[1]
+
+        self.data_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.data_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        if self.use_multicast:
+            self.data_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                        socket.inet_aton(self.local_ip_address))
+            self.data_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+            self.data_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+
+        self.stop_threads = False
+        self.command_thread = threading.Thread(target=self.__command_thread_function)
+        self.command_thread.daemon = True
+        self.command_thread.start()
+        self.frame_thread = threading.Thread(target=self.__frame_thread_function)
+        self.frame_thread.daemon = True
+        self.frame_thread.start()
+
+    def stop(self) -> None:
+        self.stop_threads = True
+        for thread in (self.command_thread, self.frame_thread):
+            if thread is not None:
+                thread.join()
+        self.command_thread = None
+        self.frame_thread = None
+        for sock in (self.command_socket, self.data_socket):
+            if sock is not None:
+                sock.close()
+        self.command_socket = None
+        self.data_socket = None
+
+    def __command_thread_function(self) -> None:
+        while not self.stop_threads:
+            try:
+                data, address = self.command_socket.recvfrom(64 * 1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if len(data) < 4:
+                continue
+            message_id, packet_size = MessageHeader.unpack_from(data)
+            reply = self.__handle_request(message_id, data[4:4 + packet_size])
+
+            if not self.use_multicast:
+                with self.lock:
+                    self.clients[address] = time.monotonic()
+            if reply is not None:
+                self.command_socket.sendto(reply, address)
+
+    def __handle_request(self, message_id, payload):
+        major, minor = self.version
+        if message_id == NatNetClient.NAT_CONNECT:
+            return pack_server_info(self.application_name, self.server_version,
+                                    self.version + (0, 0), self.clock_frequency)
+        if message_id == NatNetClient.NAT_REQUEST_MODELDEF:
+            return pack_data_descriptions(self.data_descs, major, minor)
+        if message_id == NatNetClient.NAT_REQUEST:
+            command = payload.split(b'\0', 1)[0].decode('utf-8')
+            return pack_message(NatNetClient.NAT_RESPONSE, Int.pack(self.__command(command)))
+        if message_id == NatNetClient.NAT_KEEPALIVE:
+            return None
+        return pack_message(NatNetClient.NAT_UNRECOGNIZED_REQUEST, b'')
+
+    def __command(self, command) -> int:
+        if command.startswith("Bitstream,"):
+            try:
+                major, minor = (int(part) for part in command.split(",", 1)[1].split("."))
+            except ValueError:
+                return -1
+            with self.lock:
+                self.version = (major, minor)
+                self.template = FrameTemplate(self.mocap_data, major, minor)
+        return 0
+
+    # Send frames on an absolute schedule, so the rate holds on average even
+    # when a single sleep oversleeps
+    def __frame_thread_function(self) -> None:
+        period = 1.0 / self.frame_rate
+        start = time.perf_counter()
+        frame_index = 0
+        while not self.stop_threads:
+            deadline = start + frame_index * period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -period:
+                self.frames_late += 1
+                if delay < -1.0:
+                    # too far behind to catch up, e.g. the machine was suspended
+                    start = time.perf_counter() - frame_index * period
+
+            now = time.perf_counter_ns()
+            with self.lock:
+                # ~5 ms system latency, 1 ms software latency
+                packet = self.template.frame(frame_index, frame_index * period,
+                                             (now - 5000000, now - 1000000, now))
+                self.__send_frame(packet)
+            frame_index += 1
+
+    def __send_frame(self, packet) -> None:
+        try:
+            if self.use_multicast:
+                self.data_socket.sendto(packet, (self.multicast_address, self.data_port))
+            else:
+                now = time.monotonic()
+                for address, last_heard in list(self.clients.items()):
+                    if now - last_heard > self.client_timeout:
+                        del self.clients[address]
+                    else:
+                        self.data_socket.sendto(packet, address)
+        except OSError as msg:
+            if not self.stop_threads:
+                print("ERROR: could not send frame:\n  %s" % msg)
+                return
+        self.frames_sent += 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream synthetic NatNet frames for load testing")
+    parser.add_argument('--version', default="4.1", help="bitstream version, e.g. 3.1")
+    parser.add_argument('--rate', type=float, default=120.0, help="frames per second")
+    parser.add_argument('--rigid-bodies', type=int, default=2)
+    parser.add_argument('--skeletons', type=int, default=1)
+    parser.add_argument('--bones', type=int, default=21, help="bones per skeleton")
+    parser.add_argument('--markers', type=int, default=3, help="markers per rigid body / skeleton")
+    parser.add_argument('--unlabeled-markers', type=int, default=0)
+    parser.add_argument('--unicast', action='store_true')
+    parser.add_argument('--local-ip', default="127.0.0.1")
+    args = parser.parse_args()
+
+    major, minor = (int(part) for part in args.version.split("."))
+    simulator = NatNetSimulator((major, minor), args.rate, args.rigid_bodies, args.skeletons, args.bones,
+                                args.markers, args.unlabeled_markers, not args.unicast, args.local_ip)
+    simulator.start()
+    print("Streaming NatNet %d.%d at %.0f Hz (Ctrl-C to stop)" % (major, minor, args.rate))
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    simulator.stop()
+    print("Sent %d frames, %d late" % (simulator.frames_sent, simulator.frames_late))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
 import sys
 import os
+import time
+from collections import OrderedDict
+from functools import partial
+from threading import Condition
 
 # Get script directory to allow for relative imports
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -9,32 +13,139 @@ sys.path.append(os.path.dirname(SCRIPT_DIR))
 # Import native API class
 from Resources.APIs.Official.PythonClient.NatNetClient import NatNetClient
 
-# Wrapper for NatNetClient API class
+from FrameBuffer import FrameBuffer, EVICT_OLDEST
+from structures import Subscription, ALL
+from AssetRegistry import AssetRegistry
+from FrameRecorder import FrameRecorder
+from TakeDatabase import TakeDatabase
+from PacketCapture import CaptureWriter
+from FrameBus import FramePublisher
+from PoseSnapshot import LatestPoses
+from ModelDefCache import ModelDefCache
+from FrameMerger import FrameMerger
+from Resampler import Resampler
+
+
+# One NatNet server an OptiTracker listens to, and what is known about it
+class StreamSource:
+    def __init__(self, index: int, client, buffer_capacity: int, eviction: str) -> None:
+        self.index = index
+        self.client = client
+
+        # Latest DataDescriptions received from the server, and its lookups
+        self.data_descriptions = None
+        self.assets = AssetRegistry()
+
+        # Set while new model definitions are on their way, since
+        # model_def_requested_at (time.monotonic seconds)
+        self.model_def_requested = False
+        self.model_def_requested_at = 0.0
+
+        # Frame data, bounded ring of the most recent buffer_capacity frames
+        self.frame_buffer = FrameBuffer(buffer_capacity, eviction)
+
+        # Poses of the latest frame, readable without locking (see latest_rigid_body)
+        self.latest_poses = LatestPoses()
+
+
+# Wrapper for NatNetClient API class.
+#
+# `servers` lists the NatNet servers to listen to, each as a server address or
+# a dict of NatNetClient settings (e.g. server_ip_address, multicast_address,
+# data_port); None is a single client with the default settings. Every server
+# gets its own client, with its own sockets and decode thread, and its own
+# StreamSource in `sources`. Methods taking a `source` index default to the
+# first server, which `client`, `frame_buffer`, `assets` etc. also refer to.
+#
+# With several servers, recorders and frame_listener receive the frames of all
+# of them merged into one stream in time order (see FrameMerger), within a
+# reorder window of reorder_window seconds.
 class OptiTracker:
-    def __init__(self) -> None:
-        # NatNetClient instance
-        self.client = self.init_client()
+    def __init__(self, buffer_capacity: int = 7200, eviction: str = EVICT_OLDEST, servers: list = None,
+                 reorder_window: float = 0.05) -> None:
+        if servers is None:
+            servers = [None]
+
+        # NatNetClient instances, and per server state
+        self.sources = [
+            StreamSource(index, self.init_client(server, index), buffer_capacity, eviction)
+            for index, server in enumerate(servers)]
 
         # Initialize data containers
         self.descriptions = {   # Model descriptions, keys denote model types
             'skeletons': {},
             'rigid_bodies': {}
         } 
-        self.frames = {  # Frame data, keys denote frame numbers
-            # 'skeletons': {},
-            # 'rigid_bodies': {}
-        }        
 
-    # Create NatNetClient instance
-    def init_client(self) -> object:
+        # Assets requested with subscribe(), names resolved against data_descriptions
+        self.subscription_spec = None
+
+        # Frame sinks (objects with write_frame(frame) and close())
+        self.recorders = []
+
+        # Set this to get every frame as (source index, structures.FrameArrays),
+        # merged in time order when there are several servers
+        self.frame_listener = None
+
+        # Time-ordered fan-in of several servers' frames
+        self.merger = None
+        if len(self.sources) > 1:
+            self.merger = FrameMerger(len(self.sources), self.__write_frame, reorder_window)
+
+        # Raw packet capture, see start_capture
+        self.capture = None
+
+        # Seconds to wait for the model definitions asked for after assets
+        # changed before asking again, in case the reply was lost
+        self.model_def_timeout = 2.0
+
+        # Guards the frame buffers; notified once the frame buffer of source
+        # frame_target_source has appended frame_target frames
+        self.frame_condition = Condition()
+        self.frame_target = None
+        self.frame_target_source = 0
+
+    # The first server's client and state
+    @property
+    def client(self):
+        return self.sources[0].client
+
+    @property
+    def frame_buffer(self) -> FrameBuffer:
+        return self.sources[0].frame_buffer
+
+    @property
+    def latest_poses(self) -> LatestPoses:
+        return self.sources[0].latest_poses
+
+    @property
+    def assets(self) -> AssetRegistry:
+        return self.sources[0].assets
+
+    @property
+    def data_descriptions(self):
+        return self.sources[0].data_descriptions
+
+    @property
+    def model_def_requested(self) -> bool:
+        return self.sources[0].model_def_requested
+
+    # Create NatNetClient instance for a server (see OptiTracker)
+    def init_client(self, server=None, source: int = 0) -> object:
         
         # Spawn client instance
         client = NatNetClient()
+        if isinstance(server, str):
+            client.set_server_address(server)
+        elif server is not None:
+            for name, value in server.items():
+                if not hasattr(client, name):
+                    raise ValueError("Unknown NatNetClient setting '%s'" % name)
+                setattr(client, name, value)
 
         # Set frame listeners
-        client.new_frame_listener = self.get_new_frame_data
-        # client.rigid_bodies_frame_listener = self.get_rigid_bodies_frame_data
-        # client.skeletons_frame_listener = self.get_skeletons_frame_data
+        client.frame_arrays_listener = partial(self.get_new_frame_data, source=source)
+        client.full_description_listener = partial(self.get_data_descriptions, source=source)
 
         # # Set description listeners
         # client.skeleton_description_listener = self.get_skeleton_descriptions
@@ -42,44 +153,307 @@ class OptiTracker:
 
         return client
     
-    # Start NatNetClient, returns True if successful, False otherwise
+    # Start the NatNetClients, returns True if all of them started, False otherwise
     def start_client(self) -> bool:
-        return self.client.run()
+        started = [source.client.run() for source in self.sources]
+        if self.merger is not None:
+            # releases the frames of a stalled server after reorder_window
+            self.merger.start()
+        return all(started)
 
-    # Stop NatNetClient
+    # Stop the NatNetClients
     def stop_client(self) -> None:
-        self.client.shutdown()
+        for source in self.sources:
+            source.client.shutdown()
+        if self.merger is not None:
+            self.merger.stop()
+            self.merger.flush(everything=True)
 
-    # Get new frame data
-    def get_new_frame_data(self, frame_data) -> None:
-        # Store frame data
-        self.frames[frame_data['prefix_data']['frame_number']] = frame_data
+    # Get new frame data (structures.FrameArrays) of a source; called from
+    # that source's decode thread
+    def get_new_frame_data(self, frame_data, source: int = 0) -> None:
+        stream = self.sources[source]
 
-    # Get frame data for skeletons
-    def get_skeletons_frame_data(self, frame_number, frame_data) -> None:
-        # Store skeleton frame data
-        self.frames['skeletons'][str(frame_number)] = frame_data
+        # Assets were added, removed or renamed in Motive
+        if frame_data.tracked_models_changed and not self.__model_def_pending(stream):
+            self._refresh_model_defs(source)
 
-    # Get frame data for rigid bodies
-    def get_rigid_bodies_frame_data(self, frame_number, frame_data) -> None:
-        # Store rigid body frame data
-        self.frames['rigid_bodies'][str(frame_number)] = frame_data
+        stream.latest_poses.update(frame_data)
 
-    # Get model descriptions for skeletons
-    def get_skeleton_descriptions(self, desc_dict) -> None:
-        # Store skeleton descriptions
-        self.descriptions['skeletons'][desc_dict['name']] = desc_dict
+        # Copy frame data into the ring buffer; the arrays are views into the packet
+        with self.frame_condition:
+            stream.frame_buffer.append(frame_data)
+            if self.frame_target is not None and source == self.frame_target_source and\
+                    stream.frame_buffer.received >= self.frame_target:
+                self.frame_condition.notify_all()
 
-    # Get model descriptions for rigid bodies
-    def get_rigid_body_descriptions(self, desc_dict) -> None:
-        # Store rigid body descriptions
-        self.descriptions['rigid_bodies'][desc_dict['sz_name']] = desc_dict
+        if self.merger is None:
+            self.__write_frame(source, frame_data)
+        elif self.recorders or self.frame_listener is not None:
+            self.merger.push(source, frame_data)
+
+    def __write_frame(self, source, frame_data) -> None:
+        for recorder in self.recorders:
+            recorder.write_frame(frame_data)
+        if self.frame_listener is not None:
+            self.frame_listener(source, frame_data)
+
+    # Block until `duration` seconds have passed or `frames` frames have arrived,
+    # whichever comes first, without using any CPU while waiting. The client must
+    # be running. Returns a copy of the captured frames in the frame_buffer.latest()
+    # layout; at most buffer_capacity frames are kept, and frames a full
+    # REJECT_NEWEST buffer rejects count towards `frames` but are not returned.
+    def record(self, duration: float = None, frames: int = None, source: int = 0) -> OrderedDict:
+        if duration is None and frames is None:
+            raise ValueError("record needs a duration, a frame count, or both")
 
+        frame_buffer = self.sources[source].frame_buffer
+        deadline = time.monotonic() + duration if duration is not None else None
+        with self.frame_condition:
+            start = frame_buffer.appended
+            received = frame_buffer.received
+            if frames is not None:
+                self.frame_target = received + frames
+                self.frame_target_source = source
+            try:
+                while frames is None or frame_buffer.received - received < frames:
+                    timeout = None
+                    if deadline is not None:
+                        timeout = deadline - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    self.frame_condition.wait(timeout)
+            finally:
+                self.frame_target = None
 
+            # frames can keep arriving while this thread waits for the lock
+            return self._recorded(frame_buffer, start, frames)
 
+    # Copy of the frames appended to frame_buffer since `start` appended
+    # frames, at most `frames` of them
+    @staticmethod
+    def _recorded(frame_buffer, start, frames) -> OrderedDict:
+        captured = frame_buffer.appended - start
+        window = frame_buffer.latest(captured)
+        count = captured if frames is None else min(captured, frames)
+        return OrderedDict(
+            (name, view[:count].copy() if view is not None else None) for name, view in window.items())
 
+    # Latest (frame number, timestamp, [x, y, z, qx, qy, qz, qw]) of a rigid
+    # body given by id or name, or None if it was not in the latest frame.
+    # Never waits on the data thread, so it can be polled from display loops.
+    def latest_rigid_body(self, rigid_body, source: int = 0):
+        stream = self.sources[source]
+        return stream.latest_poses.rigid_body(stream.assets.rigid_body_id(rigid_body))
 
+    # Same for one bone of a skeleton, both given by id or name
+    def latest_bone(self, skeleton, bone, source: int = 0):
+        stream = self.sources[source]
+        skeleton_id = stream.assets.skeleton_id(skeleton)
+        return stream.latest_poses.bone(skeleton_id, stream.assets.bone_id(skeleton_id, bone))
 
+    # Same for all bones of a skeleton, poses as a (bones, 7) array in frame order
+    def latest_skeleton(self, skeleton, source: int = 0):
+        stream = self.sources[source]
+        return stream.latest_poses.skeleton(stream.assets.skeleton_id(skeleton))
 
+    # Resample a source's rigid body and bone poses onto a uniform clock of
+    # `rate` samples per second; call update() on the returned Resampler to
+    # get the samples since the last call (see Resampler)
+    def resample(self, rate: float, source: int = 0, **kwargs) -> Resampler:
+        return Resampler(self.sources[source].frame_buffer, rate, lock=self.frame_condition, **kwargs)
 
+    # Frame loss, receive rate, decode time and latency telemetry (see
+    # NatNetClient.get_metrics) of a source. With several servers, the first
+    # one's also include the merger's counters.
+    def get_metrics(self, source: int = 0) -> dict:
+        stream = self.sources[source]
+        metrics = stream.client.get_metrics()
+        metrics['frames_evicted'] = stream.frame_buffer.evicted
+        if self.merger is not None and source == 0:
+            metrics['frames_merged'] = self.merger.released
+            metrics['frames_late'] = self.merger.late
+            metrics['reorder_depths'] = self.merger.depths()
+        return metrics
 
+    # Stream frames into a chunked, compressed HDF5 file (see FrameRecorder)
+    def start_recording(self, path: str, **kwargs) -> FrameRecorder:
+        recorder = FrameRecorder(path, **kwargs)
+        self.add_recorder(recorder)
+        return recorder
+
+    # Record frames into an SQLite take database (see TakeDatabase)
+    def start_database(self, path: str, **kwargs) -> TakeDatabase:
+        database = TakeDatabase(path, **kwargs)
+        self.add_recorder(database)
+        return database
+
+    # Publish frames into shared memory for other processes (see FrameBus);
+    # they attach with FrameBusReader(publisher.name)
+    def start_frame_bus(self, name: str = None, **kwargs) -> FramePublisher:
+        publisher = FramePublisher(name, **kwargs)
+        self.add_recorder(publisher)
+        return publisher
+
+    # Keep model definitions on disk (see ModelDefCache), so assets resolve
+    # by name from the first frames of a session instead of after the
+    # MODELDEF reply. Set before start_client.
+    def cache_model_defs(self, directory: str, **kwargs) -> ModelDefCache:
+        cache = ModelDefCache(directory, **kwargs)
+        for source in self.sources:
+            source.client.model_def_cache = cache
+        return cache
+
+    # Attach a frame sink; it receives every frame from the data thread.
+    # Sinks with write_descriptions(data_descs) also receive model definitions.
+    def add_recorder(self, recorder) -> None:
+        if hasattr(recorder, 'write_descriptions'):
+            for source in self.sources:
+                if source.data_descriptions is not None:
+                    recorder.write_descriptions(source.data_descriptions)
+        self.recorders = self.recorders + [recorder]
+
+    # Tee every received packet into a raw capture file, to be replayed
+    # offline with PacketCapture.decode_capture
+    def start_capture(self, path: str, source: int = 0, **kwargs) -> CaptureWriter:
+        self.stop_capture()
+        client = self.sources[source].client
+        self.capture = CaptureWriter(path, client, **kwargs)
+        client.packet_listener = self.capture.write_packet
+        return self.capture
+
+    def stop_capture(self) -> None:
+        capture, self.capture = self.capture, None
+        if capture is not None:
+            for source in self.sources:
+                source.client.packet_listener = None
+            capture.close()
+
+    # Detach and close all frame sinks. The data thread may still be passing
+    # them a frame; sinks ignore frames written after close().
+    def stop_recording(self) -> None:
+        recorders, self.recorders = self.recorders, []
+        for recorder in recorders:
+            recorder.close()
+
+    # Only decode the given assets; everything else in a frame is skipped.
+    # Each argument is ALL, or a list of ids or names from the model definitions
+    # (model ids for labeled markers, marker set names for marker sets).
+    # skeletons may also map a skeleton id or name to a list of bone ids or names.
+    # Names are resolved once the model definitions have been received, against
+    # each server's own; with a single server unknown names are an error.
+    def subscribe(self, rigid_bodies=None, skeletons=None, labeled_markers=None, marker_sets=None,
+                  unlabeled_markers: bool = False, force_plates=None, devices=None) -> None:
+        self.subscription_spec = {
+            'rigid_bodies': rigid_bodies,
+            'skeletons': skeletons,
+            'labeled_markers': labeled_markers,
+            'marker_sets': marker_sets,
+            'unlabeled_markers': unlabeled_markers,
+            'force_plates': force_plates,
+            'devices': devices
+        }
+        for source in self.sources:
+            source.client.subscription = self.__resolve_subscription(source, strict=len(self.sources) == 1)
+
+    # Decode every asset again
+    def unsubscribe(self) -> None:
+        self.subscription_spec = None
+        for source in self.sources:
+            source.client.subscription = None
+
+    def __resolve_subscription(self, source, strict: bool = False) -> Subscription:
+        spec = self.subscription_spec
+
+        rigid_body_ids = source.assets.rigid_body_ids
+        skeleton_ids = source.assets.skeleton_ids
+        bone_ids = source.assets.bone_ids
+
+        skeletons = spec['skeletons']
+        if isinstance(skeletons, dict):
+            resolved = {}
+            for skeleton, bones in skeletons.items():
+                skeleton_id = self.__resolve_id(skeleton, skeleton_ids, strict)
+                if skeleton_id is not None:
+                    resolved[skeleton_id] = self.__resolve_ids(bones, bone_ids.get(skeleton_id, {}), strict)
+            skeletons = resolved
+        else:
+            skeletons = self.__resolve_ids(skeletons, skeleton_ids, strict)
+
+        return Subscription(
+            marker_sets=spec['marker_sets'],
+            unlabeled_markers=spec['unlabeled_markers'],
+            rigid_bodies=self.__resolve_ids(spec['rigid_bodies'], rigid_body_ids, strict),
+            skeletons=skeletons,
+            labeled_markers=spec['labeled_markers'],
+            force_plates=spec['force_plates'],
+            devices=spec['devices'])
+
+    def __resolve_ids(self, ids, lookup, strict):
+        if ids is None or (isinstance(ids, str) and ids == ALL):
+            return ids
+        resolved = []
+        for asset in ids:
+            asset_id = self.__resolve_id(asset, lookup, strict)
+            if asset_id is not None:
+                resolved.append(asset_id)
+        return resolved
+
+    # Id of an asset given by id or name. Names that aren't in the model
+    # definitions (yet) are left out; when strict, unknown names are an error
+    # once the definitions have been received.
+    def __resolve_id(self, asset, lookup, strict):
+        if not isinstance(asset, str):
+            return asset
+        if asset in lookup:
+            return lookup[asset]
+        if strict and self.data_descriptions is not None:
+            raise ValueError("Unknown asset name '%s'" % asset)
+        return None
+
+    # True while a source's model definitions request is unanswered for less
+    # than model_def_timeout seconds
+    def __model_def_pending(self, stream) -> bool:
+        if stream.model_def_requested and time.monotonic() - stream.model_def_requested_at > self.model_def_timeout:
+            stream.model_def_requested = False
+        return stream.model_def_requested
+
+    # Ask for new model definitions after assets changed; called from the
+    # decode thread. Trackers driving the client another way override this.
+    def _refresh_model_defs(self, source: int = 0) -> None:
+        self.request_model_def(source)
+
+    # Ask a server for its model definitions; they arrive through get_data_descriptions
+    def request_model_def(self, source: int = 0) -> None:
+        stream = self.sources[source]
+        client = stream.client
+        if client.command_socket is None:
+            return
+        stream.model_def_requested = True
+        stream.model_def_requested_at = time.monotonic()
+        client.send_request(client.command_socket, client.NAT_REQUEST_MODELDEF, "",
+                            (client.server_ip_address, client.command_port))
+
+    # Get the complete model definitions (DataDescriptions) of a source
+    def get_data_descriptions(self, data_descs, source: int = 0) -> None:
+        stream = self.sources[source]
+        stream.data_descriptions = data_descs
+        stream.assets.update(data_descs)
+        stream.model_def_requested = False
+
+        if self.subscription_spec is not None:
+            stream.client.subscription = self.__resolve_subscription(stream)
+
+        for recorder in self.recorders:
+            if hasattr(recorder, 'write_descriptions'):
+                recorder.write_descriptions(data_descs)
+
+    # Get model descriptions for skeletons
+    def get_skeleton_descriptions(self, desc_dict) -> None:
+        # Store skeleton descriptions
+        self.descriptions['skeletons'][desc_dict['name']] = desc_dict
+
+    # Get model descriptions for rigid bodies
+    def get_rigid_body_descriptions(self, desc_dict) -> None:
+        # Store rigid body descriptions
+        self.descriptions['rigid_bodies'][desc_dict['sz_name']] = desc_dict
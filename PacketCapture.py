@@ -0,0 +1,252 @@
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from structures import (frame_layout, has_fixed_rigid_body_records, rigid_body_struct,
+                        labeled_marker_struct, frame_suffix_struct, _skip_legacy_rigid_body)
+from FrameBuffer import ASSET_TYPES
+
+
+# Raw packet capture file:
+#   magic
+#   per packet: Record header, then the packet exactly as received
+#               (message id, packet size, payload)
+CAPTURE_MAGIC = b'NNCAP\0\0\1'
+
+# receive time (seconds since the epoch), NatNet major, minor, packet length
+Record = struct.Struct('<dBBH')
+
+# Record header followed by the packet's message id
+RecordMessage = struct.Struct('<dBBHH')
+
+NAT_FRAMEOFDATA = 7
+
+# Message id and packet size at the start of every packet
+PACKET_HEADER_SIZE = 4
+
+# Rows gathered per step, bounds the temporary index arrays
+GATHER_ROWS = 4096
+
+
+# Tees every packet a NatNetClient receives into a capture file. Set
+# write_packet as the client's packet_listener (OptiTracker.start_capture does
+# this). Packets are written from the receive threads, so writes are locked.
+class CaptureWriter:
+    def __init__(self, path: str, client, buffer_size: int = 1 << 20) -> None:
+        self.path = path
+        self.client = client
+        self.packet_count = 0
+
+        # arrival times are time.perf_counter() seconds, the file keeps wall time
+        self.clock_offset = time.time() - time.perf_counter()
+
+        self.lock = threading.Lock()
+        self.file = open(path, 'wb', buffering=buffer_size)
+        self.file.write(CAPTURE_MAGIC)
+
+    def write_packet(self, data, arrival_time) -> None:
+        header = Record.pack(arrival_time + self.clock_offset, self.client.get_major(),
+                             self.client.get_minor(), len(data))
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(header)
+            self.file.write(data)
+            self.packet_count += 1
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+# Index a capture file without decoding anything. Returns the memory-mapped
+# file and an OrderedDict of per-packet arrays: offset (of the packet in the
+# file), size, receive_time, major, minor, message_id.
+def read_capture(path: str):
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    if bytes(buffer[:len(CAPTURE_MAGIC)]) != CAPTURE_MAGIC:
+        raise ValueError("%s is not a NatNet packet capture" % path)
+
+    offsets = []
+    headers = []
+    view = memoryview(buffer)
+    end = len(buffer)
+    offset = len(CAPTURE_MAGIC)
+    while offset + Record.size <= end:
+        if offset + RecordMessage.size <= end:
+            header = RecordMessage.unpack_from(view, offset)
+        else:
+            header = Record.unpack_from(view, offset) + (-1,)
+        offset += Record.size
+        if offset + header[3] > end:
+            # packet cut short, e.g. the capture was not closed
+            break
+        offsets.append(offset)
+        headers.append(header)
+        offset += header[3]
+
+    headers = np.array(headers, dtype=np.float64).reshape(-1, 5)
+    index = OrderedDict()
+    index['offset'] = np.array(offsets, dtype=np.int64)
+    index['size'] = headers[:, 3].astype(np.int64)
+    index['receive_time'] = headers[:, 0]
+    index['major'] = headers[:, 1].astype(np.int32)
+    index['minor'] = headers[:, 2].astype(np.int32)
+    index['message_id'] = headers[:, 4].astype(np.int32)
+    return buffer, index
+
+
+# Decode every frame of a capture into per-asset arrays in one pass, in the
+# FrameBuffer.latest() layout: frame_number, timestamp, receive_time, and per
+# asset type the (n, width) records plus '<asset_type>_count'.
+#
+# Frames that share a layout (same counts, ids and names, i.e. the same model
+# definitions) are decoded together: each record array is gathered for the
+# whole group out of the memory-mapped file (see _gather) and viewed with its
+# structures dtype, so there is no per-frame Python work. Only frames of
+# one NatNet version are decoded (the first frame's unless `version` is given).
+def decode_capture(path: str, version=None) -> OrderedDict:
+    buffer, index = read_capture(path)
+
+    frames = np.flatnonzero(index['message_id'] == NAT_FRAMEOFDATA)
+    if version is None and len(frames):
+        version = (int(index['major'][frames[0]]), int(index['minor'][frames[0]]))
+    if version is not None:
+        major, minor = version
+        frames = frames[(index['major'][frames] == major) & (index['minor'][frames] == minor)]
+    else:
+        major, minor = 0, 0
+
+    # payload offset, as structures.frame_layout offsets are relative to it
+    starts = index['offset'][frames] + PACKET_HEADER_SIZE
+    groups = _layout_groups(buffer, starts, index['size'][frames], major, minor)
+
+    dtypes = OrderedDict([
+        ('rigid_bodies', rigid_body_struct(major, minor)),
+        ('skeletons', rigid_body_struct(major, minor)),
+        ('labeled_markers', labeled_marker_struct(major, minor))
+    ])
+
+    n = len(frames)
+    decoded = OrderedDict()
+    decoded['frame_number'] = np.zeros(n, dtype=np.int64)
+    decoded['timestamp'] = np.zeros(n, dtype=np.float64)
+    decoded['receive_time'] = index['receive_time'][frames]
+    for asset_type in ASSET_TYPES:
+        width = max([_record_count(layout, asset_type) for _, layout in groups] + [0])
+        decoded[asset_type] = np.zeros((n, width), dtype=dtypes[asset_type])
+        decoded[asset_type + '_count'] = np.zeros(n, dtype=np.int32)
+
+    suffix_dtype = frame_suffix_struct(major, minor)
+    for rows, layout in groups:
+        row_starts = starts[rows]
+        frame_numbers = _gather(buffer, row_starts, _span(layout['frame_number'], 4))
+        decoded['frame_number'][rows] = frame_numbers.view('<i4')[:, 0]
+        suffix = _gather(buffer, row_starts, _span(layout['suffix'], suffix_dtype.itemsize)).view(suffix_dtype)
+        decoded['timestamp'][rows] = suffix['timestamp'][:, 0]
+
+        first = int(row_starts[0])
+        data = memoryview(buffer)[first:first + layout['size']]
+        for asset_type in ASSET_TYPES:
+            columns = _record_columns(data, layout, asset_type, major, minor)
+            count = len(columns) // dtypes[asset_type].itemsize
+            decoded[asset_type + '_count'][rows] = count
+            if count:
+                decoded[asset_type][rows, :count] = _gather(buffer, row_starts, columns).view(dtypes[asset_type])
+
+    return decoded
+
+
+# Split frames into groups that share one layout. Frames can only share a
+# layout if they have the same size; within a size, every frame is checked
+# against the first one's layout by comparing the bytes of its counts, ids and
+# names. Frames that differ start the next group. Returns [(rows, layout)].
+def _layout_groups(buffer, starts, sizes, major, minor):
+    groups = []
+    payload_sizes = sizes - PACKET_HEADER_SIZE
+    order = np.argsort(payload_sizes, kind='stable')
+    boundaries = np.flatnonzero(np.diff(payload_sizes[order])) + 1
+    for pending in np.split(order, boundaries):
+        while len(pending):
+            first = int(starts[pending[0]])
+            layout = frame_layout(memoryview(buffer)[first:first + int(payload_sizes[pending[0]])], major, minor)
+            columns = np.concatenate([np.arange(start, end) for start, end in layout['structure']] +
+                                     [np.empty(0, dtype=np.int64)])
+            structure = _gather(buffer, starts[pending], columns)
+            matches = (structure == structure[0]).all(axis=1)
+            groups.append((pending[matches], layout))
+            pending = pending[~matches]
+    return groups
+
+
+# Record count of an asset type in a layout (all bones of a frame for skeletons)
+def _record_count(layout, asset_type):
+    if asset_type == 'skeletons':
+        return sum(count for _, _, count in layout['skeletons'])
+    return layout[asset_type][1]
+
+
+# Payload byte offsets that make up the records of an asset type, in order,
+# so gathering them yields contiguous records of its structures dtype.
+# `data` is the payload of one frame with this layout.
+def _record_columns(data, layout, asset_type, major, minor):
+    if asset_type == 'labeled_markers':
+        offset, count = layout['labeled_markers']
+        return _span(offset, count * labeled_marker_struct(major, minor).itemsize)
+
+    if asset_type == 'rigid_bodies':
+        blocks = [layout['rigid_bodies']]
+    else:
+        blocks = [(offset, count) for _, offset, count in layout['skeletons']]
+
+    dtype = rigid_body_struct(major, minor)
+    columns = []
+    for offset, count in blocks:
+        if has_fixed_rigid_body_records(major):
+            columns.append(_span(offset, count * dtype.itemsize))
+        else:
+            columns.extend(_legacy_rigid_body_columns(data, offset, major, minor, dtype))
+    return np.concatenate(columns + [np.empty(0, dtype=np.int64)])
+
+
+# Pre-3.0 rigid bodies have their markers between the pose and the error, so
+# each record is gathered in two pieces; marker counts are read from `data`,
+# one frame of the group
+def _legacy_rigid_body_columns(data, rb_offsets, major, minor, dtype):
+    tail_size = dtype.itemsize - 32
+    columns = []
+    for rb_offset in rb_offsets:
+        end = _skip_legacy_rigid_body(data, rb_offset, major, minor, [])
+        columns.append(_span(rb_offset, 32))   # id + pos + rot
+        columns.append(_span(end - tail_size, tail_size))   # error, params
+    return columns
+
+
+def _span(offset, size):
+    return np.arange(offset, offset + size, dtype=np.int64)
+
+
+# Bytes at starts[i] + columns for every row i, as a (len(starts), len(columns))
+# uint8 array. Evenly spaced rows (a run of same-sized packets) are copied out
+# of a strided view of the file one contiguous column range at a time; others
+# are gathered in blocks of rows to bound the index arrays.
+def _gather(buffer, starts, columns):
+    out = np.empty((len(starts), len(columns)), dtype=np.uint8)
+    if len(starts) > 1 and len(columns):
+        strides = np.diff(starts)
+        if strides[0] > 0 and (strides == strides[0]).all():
+            rows = np.ndarray((len(starts), int(columns.max()) + 1), dtype=np.uint8, buffer=buffer,
+                              offset=int(starts[0]), strides=(int(strides[0]), 1))
+            breaks = np.flatnonzero(np.diff(columns) != 1) + 1
+            for start, end in zip(np.r_[0, breaks], np.r_[breaks, len(columns)]):
+                out[:, start:end] = rows[:, columns[start]:columns[end - 1] + 1]
+            return out
+    for row in range(0, len(starts), GATHER_ROWS):
+        block = starts[row:row + GATHER_ROWS]
+        out[row:row + len(block)] = buffer[block[:, None] + columns]
+    return out
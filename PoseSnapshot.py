@@ -0,0 +1,125 @@
+import numpy as np
+
+
+# Pose columns: x, y, z, qx, qy, qz, qw
+POSE_WIDTH = 7
+
+# Stand-in for frames without rigid bodies
+NO_RECORDS = np.zeros(0, dtype=[('id', '<u4'), ('pos', '<f4', (3,)), ('rot', '<f4', (4,))])
+
+
+# One of LatestPoses' two buffers: the poses of every rigid body and bone of a
+# frame, rigid bodies first and then each skeleton's bones, in frame order.
+class PoseFrame:
+    def __init__(self) -> None:
+        # Odd while the data thread is writing into this buffer
+        self.sequence = 0
+
+        self.frame_number = -1
+        self.timestamp = 0.0
+        self.poses = np.zeros((0, POSE_WIDTH), dtype=np.float32)
+
+        # Record ids the rows were laid out for, and the lookups built from them:
+        # rigid body id -> row, skeleton id -> (bone id -> row, rows slice)
+        self.ids = None
+        self.rigid_body_rows = {}
+        self.skeleton_rows = {}
+
+    def layout(self, ids, rigid_body_ids, skeletons) -> None:
+        self.ids = ids
+        self.rigid_body_rows = {int(rigid_body_id): row for row, rigid_body_id in enumerate(rigid_body_ids)}
+        self.skeleton_rows = {}
+        row = len(rigid_body_ids)
+        for skeleton_id, bones in skeletons:
+            # frames pack bone ids as (skeleton id << 16) | bone id
+            bone_rows = {int(bone_id) & 0xffff: row + i for i, bone_id in enumerate(bones['id'])}
+            self.skeleton_rows[skeleton_id] = (bone_rows, slice(row, row + len(bones)))
+            row += len(bones)
+        if len(self.poses) != row:
+            self.poses = np.zeros((row, POSE_WIDTH), dtype=np.float32)
+
+
+# Double-buffered poses of the latest frame, for loops that only need where
+# things are now. The data thread fills the back buffer and then makes it the
+# front one with a single reference assignment, so readers never take a lock
+# and never wait on decoding.
+#
+# A reader that is preempted for a whole frame can find the data thread
+# writing into the buffer it is reading from; every buffer carries a sequence
+# counter that is odd during writes, and reads retry if it changed.
+class LatestPoses:
+    def __init__(self) -> None:
+        self.front = PoseFrame()
+        self.back = PoseFrame()
+
+    # Store the poses of a structures.FrameArrays; called from the data thread
+    def update(self, frame) -> None:
+        rigid_bodies = frame.rigid_bodies if frame.rigid_bodies is not None else NO_RECORDS
+        skeletons = list(frame.skeletons.items())
+
+        # the assets of a frame rarely change, so their ids double as the
+        # layout key and rows are only looked up again when they do
+        ids = (rigid_bodies['id'].tobytes(),) + tuple(
+            (skeleton_id, bones['id'].tobytes()) for skeleton_id, bones in skeletons)
+
+        back = self.back
+        back.sequence += 1
+        if ids != back.ids:
+            back.layout(ids, rigid_bodies['id'], skeletons)
+        back.frame_number = frame.frame_number
+        back.timestamp = frame.timestamp
+
+        poses = back.poses
+        row = 0
+        for records in [rigid_bodies] + [bones for _, bones in skeletons]:
+            end = row + len(records)
+            poses[row:end, 0:3] = records['pos']
+            poses[row:end, 3:7] = records['rot']
+            row = end
+        back.sequence += 1
+
+        self.back = self.front
+        self.front = back
+
+    # (frame number, timestamp, copy of rows of the front buffer's poses).
+    # `rows` maps a PoseFrame to a row or slice, or None if the asset is not
+    # in the frame, in which case None is returned.
+    def __read(self, rows):
+        while True:
+            front = self.front
+            sequence = front.sequence
+            if sequence % 2:
+                continue
+            index = rows(front)
+            try:
+                pose = front.poses[index].copy() if index is not None else None
+            except IndexError:
+                # rows were laid out again under us, the sequence has moved on
+                continue
+            snapshot = (front.frame_number, front.timestamp, pose)
+            if front.sequence == sequence:
+                return snapshot if pose is not None else None
+
+    # Latest (frame number, timestamp, pose) of a rigid body, pose as
+    # [x, y, z, qx, qy, qz, qw]; None if it was not in the latest frame
+    def rigid_body(self, rigid_body_id: int):
+        return self.__read(lambda front: front.rigid_body_rows.get(rigid_body_id))
+
+    # Same for one bone of a skeleton
+    def bone(self, skeleton_id: int, bone_id: int):
+        def rows(front):
+            bones = front.skeleton_rows.get(skeleton_id)
+            return bones[0].get(bone_id) if bones is not None else None
+        return self.__read(rows)
+
+    # Same for all bones of a skeleton, pose as a (bones, 7) array
+    def skeleton(self, skeleton_id: int):
+        def rows(front):
+            bones = front.skeleton_rows.get(skeleton_id)
+            return bones[1] if bones is not None else None
+        return self.__read(rows)
+
+    # Frame number and timestamp of the latest frame
+    def latest_frame(self):
+        return self.__read(lambda front: slice(0, 0))[:2]
+
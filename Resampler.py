@@ -0,0 +1,183 @@
+import math
+from collections import OrderedDict
+from contextlib import nullcontext
+
+import numpy as np
+
+from PoseSnapshot import POSE_WIDTH
+
+
+# Asset types resampled, and the output name of their ids
+RESAMPLED_TYPES = OrderedDict([
+    ('rigid_bodies', 'rigid_body_ids'),
+    ('skeletons', 'bone_ids')
+])
+
+# Above this quaternion dot product slerp falls back to normalized lerp
+SLERP_THRESHOLD = 0.9995
+
+
+# Spherical linear interpolation between quaternions q0 and q1 (..., 4) at
+# alpha (...), taking the shorter arc
+def slerp(q0, q1, alpha):
+    alpha = alpha[..., None]
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    q1 = np.where(dot < 0, -q1, q1)
+    dot = np.abs(dot)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        theta = np.arccos(np.minimum(dot, 1.0))
+        sin_theta = np.sin(theta)
+        near = dot > SLERP_THRESHOLD
+        w0 = np.where(near, 1.0 - alpha, np.sin((1.0 - alpha) * theta) / sin_theta)
+        w1 = np.where(near, alpha, np.sin(alpha * theta) / sin_theta)
+        q = w0 * q0 + w1 * q1
+        return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+# Resamples the rigid body and bone poses in a FrameBuffer onto a uniform
+# clock of `rate` samples per second, with sample k at k / rate seconds of the
+# FrameSuffixData timestamp. Positions are interpolated linearly, rotations
+# with slerp, between the frames on either side of a sample.
+#
+# update() only looks at frames appended since the previous call (keeping the
+# last frame before them), so it costs O(new frames); call it at least once
+# per buffer_capacity frames, frames evicted in between are a gap. Samples
+# are only produced up to the latest frame, never extrapolated.
+#
+# Poses are NaN where an asset is missing or not tracked in either frame
+# around a sample, and across gaps between frames longer than max_gap seconds.
+class Resampler:
+    def __init__(self, frame_buffer, rate: float, max_gap: float = 0.1, lock=None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.frame_buffer = frame_buffer
+        self.rate = rate
+        self.max_gap = max_gap
+        # Held while copying new frames out of the buffer
+        self.lock = lock if lock is not None else nullcontext()
+
+        self.samples = 0
+        self.reset()
+
+    # Start over from the frames currently in the buffer
+    def reset(self) -> None:
+        # Frame number of the last frame processed
+        self.frame_number = None
+        # Index of the next sample, its time is next_sample / rate
+        self.next_sample = None
+        # Last frame processed: timestamp, and per asset type the ids and
+        # (ids, 7) poses of its tracked assets
+        self.last_time = None
+        self.last = OrderedDict((asset_type, (np.zeros(0, dtype=np.uint32), np.zeros((0, POSE_WIDTH))))
+                                for asset_type in RESAMPLED_TYPES)
+
+    # Resample the frames appended since the last call. Returns 'time' (m,)
+    # and per asset type its ids (k,) and (m, k, 7) poses [x, y, z, qx, qy, qz, qw]:
+    #   rigid_body_ids, rigid_bodies
+    #   bone_ids (skeleton id << 16 | bone id), skeletons
+    # Ids are those of the assets in the frames involved, so they can change
+    # from call to call.
+    def update(self) -> OrderedDict:
+        with self.lock:
+            latest = self.frame_buffer.latest(1)['frame_number']
+            if self.frame_number is not None and len(latest) and latest[-1] < self.frame_number:
+                # frame numbers restarted, a new Motive session
+                self.reset()
+            if self.frame_number is None:
+                window = self.frame_buffer.latest()
+            else:
+                window = self.frame_buffer.since(self.frame_number)
+            window = OrderedDict(
+                (name, view.copy() if view is not None else None) for name, view in window.items())
+
+        if len(window['frame_number']):
+            self.frame_number = int(window['frame_number'][-1])
+
+        times = window['timestamp']
+        poses = OrderedDict(
+            (asset_type, self.__dense(window[asset_type], window[asset_type + '_count'], asset_type))
+            for asset_type in RESAMPLED_TYPES)
+
+        # the last frame of the previous call opens the interval of the first sample
+        if self.last_time is not None:
+            times = np.concatenate(([self.last_time], times))
+        else:
+            for asset_type, (ids, dense) in poses.items():
+                poses[asset_type] = (ids, dense[1:])
+
+        # frames out of timestamp order can't bracket a sample
+        keep = np.ones(len(times), dtype=bool)
+        if len(times) > 1:
+            keep[1:] = times[1:] > np.maximum.accumulate(times)[:-1]
+        times = times[keep]
+        poses = OrderedDict((asset_type, (ids, dense[keep])) for asset_type, (ids, dense) in poses.items())
+
+        sample_times = np.zeros(0)
+        if len(times) >= 2:
+            if self.next_sample is None:
+                self.next_sample = math.ceil(times[0] * self.rate)
+            last_sample = math.floor(times[-1] * self.rate)
+            sample_times = np.arange(self.next_sample, last_sample + 1) / self.rate
+            self.next_sample = max(self.next_sample, last_sample + 1)
+
+        resampled = OrderedDict()
+        resampled['time'] = sample_times
+        if len(sample_times):
+            before = np.clip(np.searchsorted(times, sample_times, side='right') - 1, 0, len(times) - 2)
+            t0 = times[before]
+            t1 = times[before + 1]
+            alpha = (sample_times - t0) / (t1 - t0)
+            gap = (t1 - t0) > self.max_gap
+        for asset_type, ids_name in RESAMPLED_TYPES.items():
+            ids, dense = poses[asset_type]
+            resampled[ids_name] = ids
+            if len(sample_times):
+                resampled[asset_type] = self.__interpolate(dense[before], dense[before + 1], alpha, gap)
+            else:
+                resampled[asset_type] = np.zeros((0, len(ids), POSE_WIDTH))
+
+        if len(times):
+            self.last_time = float(times[-1])
+            for asset_type, (ids, dense) in poses.items():
+                tracked = ~np.isnan(dense[-1, :, 0])
+                self.last[asset_type] = (ids[tracked], dense[-1][tracked])
+        self.samples += len(sample_times)
+        return resampled
+
+    # (ids, (1 + n, ids, 7) poses) of the records of n frames, with the last
+    # frame of the previous call first; NaN where an asset is not tracked
+    def __dense(self, records, counts, asset_type):
+        last_ids, last_poses = self.last[asset_type]
+        frames = len(counts)
+        if records is None or frames == 0:
+            ids = last_ids
+            dense = np.full((1 + frames, len(ids), POSE_WIDTH), np.nan)
+            dense[0] = last_poses
+            return ids, dense
+
+        valid = np.arange(records.shape[1]) < counts[:, None]
+        rows, columns = np.nonzero(valid)
+        valid_records = records[rows, columns]
+        ids = np.union1d(last_ids, valid_records['id'])
+
+        dense = np.full((1 + frames, len(ids), POSE_WIDTH), np.nan)
+        dense[0, np.searchsorted(ids, last_ids)] = last_poses
+        if 'params' in records.dtype.names:
+            # bit 0 of params: tracking valid
+            tracked = (valid_records['params'] & 0x01) != 0
+            rows = rows[tracked]
+            valid_records = valid_records[tracked]
+        slots = np.searchsorted(ids, valid_records['id'])
+        dense[1 + rows, slots, 0:3] = valid_records['pos']
+        dense[1 + rows, slots, 3:7] = valid_records['rot']
+        return ids, dense
+
+    @staticmethod
+    def __interpolate(before, after, alpha, gap):
+        pose = np.empty(before.shape)
+        pose[..., 0:3] = before[..., 0:3] + alpha[:, None, None] * (after[..., 0:3] - before[..., 0:3])
+        pose[..., 3:7] = slerp(before[..., 3:7], after[..., 3:7],
+                               np.broadcast_to(alpha[:, None], before.shape[:2]))
+        pose[gap] = np.nan
+        return pose
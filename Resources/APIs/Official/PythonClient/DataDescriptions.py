@@ -125,6 +125,8 @@ def get_data_sub_packet_type(new_data):
 
 # cMarkerSetDescription
 class MarkerSetDescription:
+    __slots__ = ('marker_set_name', 'marker_names_list')
+
     def __init__(self):
         self.marker_set_name="Not Set"
         self.marker_names_list=[]
@@ -152,6 +154,8 @@ class MarkerSetDescription:
         return out_string
 
 class RBMarker:
+    __slots__ = ('marker_name', 'active_label', 'pos')
+
     def __init__(self, marker_name="", active_label=0, pos=[0.0,0.0,0.0]):
         self.marker_name = marker_name
         self.active_label = active_label
@@ -168,6 +172,8 @@ class RBMarker:
         return out_string
 
 class RigidBodyDescription:
+    __slots__ = ('sz_name', 'id_num', 'parent_id', 'pos', 'rb_marker_list')
+
     def __init__(self,sz_name="", new_id=0, parent_id=0,pos=[0.0,0.0,0.0]):
         self.sz_name=sz_name
         self.id_num = new_id
@@ -191,8 +197,10 @@ class RigidBodyDescription:
     def get_num_markers(self):
         return len(self.rb_marker_list)
 
-    def add_rb_marker(self,new_rb_maker):
-        self.rb_marker_list.append(copy.deepcopy(new_rb_maker))
+    def add_rb_marker(self,new_rb_maker, copy_data=True):
+        if copy_data:
+            new_rb_maker = copy.deepcopy(new_rb_maker)
+        self.rb_marker_list.append(new_rb_maker)
         return self.get_num_markers()
 
     def get_description_dict(self):
@@ -225,6 +233,8 @@ class RigidBodyDescription:
         return out_string
 
 class SkeletonDescription:
+    __slots__ = ('name', 'id_num', 'rigid_body_description_list')
+
     def __init__(self, name="", new_id=0):
         self.name = name
         self.id_num = new_id
@@ -236,8 +246,10 @@ class SkeletonDescription:
     def set_id(self, new_id):
         self.id_num = new_id
 
-    def add_rigid_body_description(self,rigid_body_description):
-        self.rigid_body_description_list.append(copy.deepcopy(rigid_body_description))
+    def add_rigid_body_description(self,rigid_body_description, copy_data=True):
+        if copy_data:
+            rigid_body_description = copy.deepcopy(rigid_body_description)
+        self.rigid_body_description_list.append(rigid_body_description)
         return len(self.rigid_body_description_list)
 
     def get_description_dict(self):
@@ -267,6 +279,9 @@ class SkeletonDescription:
         return out_string
 
 class ForcePlateDescription:
+    __slots__ = ('id_num', 'serial_number', 'width', 'length', 'position', 'cal_matrix', 'corners',
+                 'plate_type', 'channel_data_type', 'channel_list')
+
     def __init__(self, new_id=0, serial_number=""):
         self.id_num = new_id
         self.serial_number = serial_number
@@ -304,8 +319,10 @@ class ForcePlateDescription:
     def set_channel_data_type(self, channel_data_type):
         self.channel_data_type = channel_data_type
 
-    def add_channel_name(self,channel_name):
-        self.channel_list.append(copy.deepcopy(channel_name))
+    def add_channel_name(self,channel_name, copy_data=True):
+        if copy_data:
+            channel_name = copy.deepcopy(channel_name)
+        self.channel_list.append(channel_name)
         return len(self.channel_list)
 
     def get_cal_matrix_as_string(self, tab_str="", level=0):
@@ -369,6 +386,9 @@ class ForcePlateDescription:
 
 class DeviceDescription:
     """Device Description class"""
+    __slots__ = ('id_num', 'name', 'serial_number', 'device_type', 'channel_data_type',
+                 'channel_list')
+
     def __init__(self,new_id,name, serial_number,device_type,channel_data_type):
         self.id_num=new_id
         self.name=name
@@ -409,6 +429,8 @@ class DeviceDescription:
 
 class CameraDescription:
     """Camera Description class"""
+    __slots__ = ('name', 'position', 'orientation')
+
     def __init__(self, name, position_vec3, orientation_quat):
         self.name=name
         self.position=position_vec3
@@ -432,8 +454,11 @@ class CameraDescription:
 # Full data descriptions
 class DataDescriptions():
     """Data Descriptions class"""
-    order_num = 0
+    __slots__ = ('data_order_dict', 'marker_set_list', 'rigid_body_list', 'skeleton_list',
+                 'force_plate_list', 'device_list', 'camera_list', 'order_num')
+
     def __init__(self):
+        self.order_num = 0
         self.data_order_dict={}
         self.marker_set_list=[]
         self.rigid_body_list=[]
@@ -450,82 +475,94 @@ class DataDescriptions():
         return order_name
 
     # Add Marker Set
-    def add_marker_set(self, new_marker_set):
+    def add_marker_set(self, new_marker_set, copy_data=True):
         """Add a marker set"""
         order_name = self.generate_order_name()
 
         # generate order entry
         pos = len(self.marker_set_list)
         self.data_order_dict[order_name]=("marker_set_list", pos)
-        self.marker_set_list.append(copy.deepcopy(new_marker_set))
+        if copy_data:
+            new_marker_set = copy.deepcopy(new_marker_set)
+        self.marker_set_list.append(new_marker_set)
 
     # Add Rigid Body
-    def add_rigid_body(self, new_rigid_body):
+    def add_rigid_body(self, new_rigid_body, copy_data=True):
         """Add a rigid body"""
         order_name = self.generate_order_name()
 
         # generate order entry
         pos = len(self.rigid_body_list)
         self.data_order_dict[order_name]=("rigid_body_list", pos)
-        self.rigid_body_list.append(copy.deepcopy(new_rigid_body))
+        if copy_data:
+            new_rigid_body = copy.deepcopy(new_rigid_body)
+        self.rigid_body_list.append(new_rigid_body)
 
 
     # Add a skeleton
-    def add_skeleton(self, new_skeleton):
+    def add_skeleton(self, new_skeleton, copy_data=True):
         """Add a skeleton"""
         order_name = self.generate_order_name()
 
         # generate order entry
         pos = len(self.skeleton_list)
         self.data_order_dict[order_name]=("skeleton_list", pos)
-        self.skeleton_list.append(copy.deepcopy(new_skeleton))
+        if copy_data:
+            new_skeleton = copy.deepcopy(new_skeleton)
+        self.skeleton_list.append(new_skeleton)
 
 
     # Add a force plate
-    def add_force_plate(self, new_force_plate):
+    def add_force_plate(self, new_force_plate, copy_data=True):
         """Add a force plate"""
         order_name = self.generate_order_name()
 
         # generate order entry
         pos = len(self.force_plate_list)
         self.data_order_dict[order_name]=("force_plate_list", pos)
-        self.force_plate_list.append(copy.deepcopy(new_force_plate))
+        if copy_data:
+            new_force_plate = copy.deepcopy(new_force_plate)
+        self.force_plate_list.append(new_force_plate)
 
 
-    def add_device(self, newdevice):
+    def add_device(self, newdevice, copy_data=True):
         """ add_device - Add a device"""
         order_name = self.generate_order_name()
 
         # generate order entry
         pos = len(self.device_list)
         self.data_order_dict[order_name]=("device_list", pos)
-        self.device_list.append(copy.deepcopy(newdevice))
+        if copy_data:
+            newdevice = copy.deepcopy(newdevice)
+        self.device_list.append(newdevice)
 
 
-    def add_camera(self, newcamera):
+    def add_camera(self, newcamera, copy_data=True):
         """ Add a new camera """
         order_name = self.generate_order_name()
 
         # generate order entry
         pos = len(self.camera_list)
         self.data_order_dict[order_name]=("camera_list", pos)
-        self.camera_list.append(copy.deepcopy(newcamera))
+        if copy_data:
+            newcamera = copy.deepcopy(newcamera)
+        self.camera_list.append(newcamera)
 
-    def add_data(self, new_data):
+    def add_data(self, new_data, copy_data=True):
         """Add data based on data type"""
         data_type = type(new_data)
         if data_type == MarkerSetDescription:
-            self.add_marker_set(new_data)
+            self.add_marker_set(new_data, copy_data)
         elif data_type == RigidBodyDescription:
-            self.add_rigid_body(new_data)
+            self.add_rigid_body(new_data, copy_data)
         elif data_type == SkeletonDescription:
-            self.add_skeleton(new_data)
+            self.add_skeleton(new_data, copy_data)
         elif data_type == ForcePlateDescription:
-            self.add_force_plate(new_data)
+            self.add_force_plate(new_data, copy_data)
         elif data_type == DeviceDescription:
-            self.add_device(new_data)
+            self.add_device(new_data, copy_data)
         elif data_type == CameraDescription:
-            self.add_camera(new_data)
+            self.add_camera(new_data, copy_data)
         elif data_type is None:
             data_type = None
         else:
@@ -593,6 +630,10 @@ class DataDescriptions():
 
         return out_string
 
+    def __str__(self):
+        """Render the descriptions on demand, e.g. by print()"""
+        return self.get_as_string()
+
     def get_description_dict(self):
         # TODO: right now this only returns skeletons (and respective RBs, etc.,)
         desc_dict = OrderedDict()
@@ -113,7 +113,12 @@ def get_as_string(input_str):
 
 
 #MoCap Frame Classes
+# add_* methods store a deep copy of their argument. Pass copy_data=False to
+# hand a freshly built object over to the container instead; the caller must
+# not modify it afterwards. NatNetClient builds frames this way.
 class FramePrefixData:
+    __slots__ = ('frame_number',)
+
     def __init__(self, frame_number):
         self.frame_number=frame_number
 
@@ -129,6 +134,8 @@ class FramePrefixData:
         return out_str
 
 class MarkerData:
+    __slots__ = ('model_name', 'marker_pos_list')
+
     def __init__(self):
         self.model_name=""
         self.marker_pos_list=[]
@@ -136,8 +143,10 @@ class MarkerData:
     def set_model_name(self, model_name):
         self.model_name = model_name
 
-    def add_pos(self, pos):
-        self.marker_pos_list.append(copy.deepcopy(pos))
+    def add_pos(self, pos, copy_data=True):
+        if copy_data:
+            pos = copy.deepcopy(pos)
+        self.marker_pos_list.append(pos)
         return len(self.marker_pos_list)
 
     def get_num_points(self):
@@ -164,17 +173,21 @@ class MarkerData:
         return out_str
 
 class MarkerSetData:
+    __slots__ = ('marker_data_list', 'unlabeled_markers')
+
     def __init__(self):
         self.marker_data_list=[]
         self.unlabeled_markers=MarkerData()
         self.unlabeled_markers.set_model_name("")
 
-    def add_marker_data(self, marker_data):
-        self.marker_data_list.append(copy.deepcopy(marker_data))
+    def add_marker_data(self, marker_data, copy_data=True):
+        if copy_data:
+            marker_data = copy.deepcopy(marker_data)
+        self.marker_data_list.append(marker_data)
         return len(self.marker_data_list)
 
-    def add_unlabeled_marker(self, pos):
-        self.unlabeled_markers.add_pos(pos)
+    def add_unlabeled_marker(self, pos, copy_data=True):
+        self.unlabeled_markers.add_pos(pos, copy_data)
 
     def get_marker_set_count(self):
         return len(self.marker_data_list)
@@ -211,6 +224,8 @@ class MarkerSetData:
         return out_str
 
 class RigidBodyMarker:
+    __slots__ = ('pos', 'id_num', 'size', 'error')
+
     def __init__(self):
         self.pos = [0.0,0.0,0.0]
         self.id_num = 0
@@ -236,6 +251,8 @@ class RigidBodyMarker:
         return out_str
 
 class RigidBody:
+    __slots__ = ('id_num', 'pos', 'rot', 'rb_marker_list', 'tracking_valid', 'error')
+
     def __init__(self, new_id, pos, rot):
         self.id_num = new_id
         self.pos=pos
@@ -244,8 +261,10 @@ class RigidBody:
         self.tracking_valid = False
         self.error = 0.0
 
-    def add_rigid_body_marker(self, rigid_body_marker):
-        self.rb_marker_list.append(copy.deepcopy(rigid_body_marker))
+    def add_rigid_body_marker(self, rigid_body_marker, copy_data=True):
+        if copy_data:
+            rigid_body_marker = copy.deepcopy(rigid_body_marker)
+        self.rb_marker_list.append(rigid_body_marker)
         return len(self.rb_marker_list)
 
     def get_data_dict(self):
@@ -296,11 +315,15 @@ class RigidBody:
         return out_str
 
 class RigidBodyData:
+    __slots__ = ('rigid_body_list',)
+
     def __init__(self):
         self.rigid_body_list=[]
 
-    def add_rigid_body(self, rigid_body):
-        self.rigid_body_list.append(copy.deepcopy(rigid_body))
+    def add_rigid_body(self, rigid_body, copy_data=True):
+        if copy_data:
+            rigid_body = copy.deepcopy(rigid_body)
+        self.rigid_body_list.append(rigid_body)
         return len(self.rigid_body_list)
 
     def get_rigid_body_count(self):
@@ -324,12 +347,16 @@ class RigidBodyData:
         return out_str
 
 class Skeleton:
+    __slots__ = ('id_num', 'rigid_body_list')
+
     def __init__(self, new_id=0):
         self.id_num=new_id
         self.rigid_body_list=[]
 
-    def add_rigid_body(self, rigid_body):
-        self.rigid_body_list.append(copy.deepcopy(rigid_body))
+    def add_rigid_body(self, rigid_body, copy_data=True):
+        if copy_data:
+            rigid_body = copy.deepcopy(rigid_body)
+        self.rigid_body_list.append(rigid_body)
         return len(self.rigid_body_list)
 
     def get_data_dict(self):
@@ -354,11 +381,15 @@ class Skeleton:
         return out_str
 
 class SkeletonData:
+    __slots__ = ('skeleton_list',)
+
     def __init__(self):
         self.skeleton_list=[]
 
-    def add_skeleton(self, new_skeleton):
-        self.skeleton_list.append(copy.deepcopy(new_skeleton))
+    def add_skeleton(self, new_skeleton, copy_data=True):
+        if copy_data:
+            new_skeleton = copy.deepcopy(new_skeleton)
+        self.skeleton_list.append(new_skeleton)
 
     def get_skeleton_count(self):
         return len(self.skeleton_list)
@@ -384,6 +415,8 @@ class SkeletonData:
         return out_str
 
 class LabeledMarker:
+    __slots__ = ('id_num', 'pos', 'size', 'param', 'residual')
+
     def __init__(self, new_id, pos, size=0.0, param = 0, residual=0.0):
         self.id_num=new_id
         self.pos = pos
@@ -431,11 +464,15 @@ class LabeledMarker:
         return out_str
 
 class LabeledMarkerData:
+    __slots__ = ('labeled_marker_list',)
+
     def __init__(self):
         self.labeled_marker_list=[]
 
-    def add_labeled_marker(self, labeled_marker):
-        self.labeled_marker_list.append(copy.deepcopy(labeled_marker))
+    def add_labeled_marker(self, labeled_marker, copy_data=True):
+        if copy_data:
+            labeled_marker = copy.deepcopy(labeled_marker)
+        self.labeled_marker_list.append(labeled_marker)
         return len(self.labeled_marker_list)
 
     def get_labeled_marker_count(self):
@@ -463,12 +500,16 @@ class LabeledMarkerData:
         return out_str
 
 class ForcePlateChannelData:
+    __slots__ = ('frame_list',)
+
     def __init__(self):
         # list of floats
         self.frame_list=[]
 
-    def add_frame_entry(self, frame_entry):
-        self.frame_list.append(copy.deepcopy(frame_entry))
+    def add_frame_entry(self, frame_entry, copy_data=True):
+        if copy_data:
+            frame_entry = copy.deepcopy(frame_entry)
+        self.frame_list.append(frame_entry)
         return len(self.frame_list)
 
     def get_data_dict(self):
@@ -497,12 +538,16 @@ class ForcePlateChannelData:
         return out_str
 
 class ForcePlate:
+    __slots__ = ('id_num', 'channel_data_list')
+
     def __init__(self, new_id=0):
         self.id_num = new_id
         self.channel_data_list=[]
 
-    def add_channel_data(self, channel_data):
-        self.channel_data_list.append(copy.deepcopy(channel_data))
+    def add_channel_data(self, channel_data, copy_data=True):
+        if copy_data:
+            channel_data = copy.deepcopy(channel_data)
+        self.channel_data_list.append(channel_data)
         return len(self.channel_data_list)
 
     def get_data_dict(self):
@@ -525,11 +570,15 @@ class ForcePlate:
         return out_str
 
 class ForcePlateData:
+    __slots__ = ('force_plate_list',)
+
     def __init__(self):
         self.force_plate_list=[]
 
-    def add_force_plate(self, force_plate):
-        self.force_plate_list.append(copy.deepcopy(force_plate))
+    def add_force_plate(self, force_plate, copy_data=True):
+        if copy_data:
+            force_plate = copy.deepcopy(force_plate)
+        self.force_plate_list.append(force_plate)
         return len(self.force_plate_list)
 
     def get_force_plate_count(self):
@@ -557,12 +606,16 @@ class ForcePlateData:
         return out_str
 
 class DeviceChannelData:
+    __slots__ = ('frame_list',)
+
     def __init__(self):
         # list of floats
         self.frame_list=[]
 
-    def add_frame_entry(self, frame_entry):
-        self.frame_list.append(copy.deepcopy(frame_entry))
+    def add_frame_entry(self, frame_entry, copy_data=True):
+        if copy_data:
+            frame_entry = copy.deepcopy(frame_entry)
+        self.frame_list.append(frame_entry)
         return len(self.frame_list)
     
     def get_data_dict(self):
@@ -591,12 +644,16 @@ class DeviceChannelData:
         return out_str
 
 class Device:
+    __slots__ = ('id_num', 'channel_data_list')
+
     def __init__(self, new_id):
         self.id_num=new_id
         self.channel_data_list = []
 
-    def add_channel_data(self, channel_data):
-        self.channel_data_list.append(copy.deepcopy(channel_data))
+    def add_channel_data(self, channel_data, copy_data=True):
+        if copy_data:
+            channel_data = copy.deepcopy(channel_data)
+        self.channel_data_list.append(channel_data)
         return len(self.channel_data_list)
     
     def get_data_dict(self):
@@ -620,11 +677,15 @@ class Device:
         return out_str
 
 class DeviceData:
+    __slots__ = ('device_list',)
+
     def __init__(self):
         self.device_list=[]
 
-    def add_device(self, device):
-        self.device_list.append(copy.deepcopy(device))
+    def add_device(self, device, copy_data=True):
+        if copy_data:
+            device = copy.deepcopy(device)
+        self.device_list.append(device)
         return len(self.device_list)
 
     def get_device_count(self):
@@ -650,6 +711,10 @@ class DeviceData:
         return out_str
 
 class FrameSuffixData:
+    __slots__ = ('timecode', 'timecode_sub', 'timestamp', 'stamp_camera_mid_exposure',
+                 'stamp_data_received', 'stamp_transmit', 'param', 'is_recording',
+                 'tracked_models_changed')
+
     def __init__(self):
         self.timecode=-1
         self.timecode_sub=-1
@@ -663,8 +728,8 @@ class FrameSuffixData:
 
     def get_data_dict(self):
         data = OrderedDict()
-        for prop, val in vars(self).items():
-            data[prop] = val
+        for prop in self.__slots__:
+            data[prop] = getattr(self, prop)
 
         return data
 
@@ -685,6 +750,9 @@ class FrameSuffixData:
         return out_str
 
 class MoCapData:
+    __slots__ = ('prefix_data', 'marker_set_data', 'rigid_body_data', 'skeleton_data',
+                 'labeled_marker_data', 'force_plate_data', 'device_data', 'suffix_data')
+
     def __init__(self):
         #Packet Parts
         self.prefix_data = None
@@ -783,6 +851,10 @@ class MoCapData:
 
         return out_str
 
+    # rendered on demand, e.g. by print()
+    def __str__(self):
+        return self.get_as_string()
+
 
 # test program
 
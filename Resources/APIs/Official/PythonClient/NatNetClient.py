@@ -15,12 +15,19 @@
 # OptiTrack NatNet direct depacketization library for Python 3.x
 
 import socket
+import select
 import struct
+import queue
+from collections import deque
 from threading import Thread
 import copy
 import time
 from Resources.APIs.Official.PythonClient import DataDescriptions
 from Resources.APIs.Official.PythonClient import MoCapData
+import structures
+from ClientMetrics import ClientMetrics
+from FlatFrame import FlatFrame
+from ModelDefCache import model_def_hash
 
 def trace( *args ):
     # uncomment the one you want to use
@@ -53,6 +60,10 @@ DoubleValue = struct.Struct( '<d' )
 NNIntValue = struct.Struct( '<I')
 FPCalMatrixRow = struct.Struct( '<ffffffffffff' )
 FPCorners      = struct.Struct( '<ffffffffffff')
+FrameStamps    = struct.Struct( '<QQQ' )
+
+# Non-blocking receive flag; not available on Windows, where select is used instead
+DONT_WAIT = getattr( socket, 'MSG_DONTWAIT', 0 )
 
 class NatNetClient:
     # print_level = 0 off
@@ -88,10 +99,65 @@ class NatNetClient:
         self.rigid_body_description_listener = None
         self.rb_marker_description_listener = None
 
+        # Set to a ModelDefCache to keep model definitions across sessions: the
+        # last ones stored for a server are delivered to the description
+        # listeners as soon as its NAT_SERVERINFO arrives, and a NAT_MODELDEF
+        # identical to the last one parsed is not parsed again.
+        self.model_def_cache = None
+        self.__model_def_hash = None
+        self.__data_descs = None
+
+        # Set this to receive replies to requests as (message id, payload):
+        #   NAT_SERVERINFO            server version [major, minor, build, revision]
+        #   NAT_MODELDEF              DataDescriptions
+        #   NAT_RESPONSE              int result code or response string
+        #   NAT_UNRECOGNIZED_REQUEST  None
+        self.command_response_listener = None
+
         # Assign callback methods to get asset specific frame data.
         self.skeletons_frame_listener = None
         self.rigid_bodies_frame_listener = None
 
+        # Set this to receive each frame as a structures.FrameArrays of NumPy views
+        # into the packet buffer. The arrays are only valid during the callback;
+        # copy anything that needs to outlive it.
+        self.frame_arrays_listener = None
+
+        # Set this to receive each frame as one flat record (FlatFrame) instead
+        # of new_frame_listener's nested dicts. The same FlatFrame is refilled
+        # for every frame; copy its values to keep them.
+        self.flat_frame_listener = None
+        self.flat_frame = FlatFrame()
+
+        # Set this to tee every received packet, called as (data, arrival time in
+        # time.perf_counter seconds) on the receiving thread before the packet is
+        # queued. data is only valid during the call (see PacketCapture.CaptureWriter).
+        self.packet_listener = None
+
+        # structures.Subscription of the assets frame_arrays_listener gets;
+        # None decodes everything
+        self.subscription = None
+
+        # Received packets wait here for the decode thread. Set before run().
+        # When it is full, incoming frames are dropped (counted in packets_overflowed).
+        self.receive_queue_size = 512
+        self.receive_queue = None
+
+        # Kernel receive buffer (SO_RCVBUF) for sockets that carry frames, in bytes.
+        # 0 keeps the OS default. Set before run().
+        self.socket_receive_buffer_size = 0
+
+        # The data thread receives into a pool of preallocated packet buffers and
+        # drains up to receive_batch_size pending datagrams per wakeup. A buffer
+        # returns to the pool once its packet has been processed.
+        self.packet_buffer_size = 64*1024
+        self.packet_pool_size = 64
+        self.receive_batch_size = 64
+        self.__packet_pool = deque()
+
+        # Frame loss, rate, decode time and latency telemetry, see get_metrics()
+        self.metrics = ClientMetrics()
+
 
         # Set Application Name
         self.__application_name = "Not Set"
@@ -102,6 +168,12 @@ class NatNetClient:
         # NatNet stream version. This will be updated to the actual version the server is using during runtime.
         self.__nat_net_requested_version = [0,0,0,0]
 
+        # Frame decoding formats for the requested version (structures.DecodePlan)
+        self.__decode_plan = structures.decode_plan(0,0)
+
+        # Hi-res stamps of the frame being processed, from its decoded suffix
+        self.__frame_stamps = None
+
         # server stream version. This will be updated to the actual version the server is using during initialization.
         self.__server_version = [0,0,0,0]
 
@@ -113,6 +185,7 @@ class NatNetClient:
 
         self.command_thread = None
         self.data_thread = None
+        self.decode_thread = None
         self.command_socket = None
         self.data_socket = None
 
@@ -169,6 +242,7 @@ class NatNetClient:
                 self.__nat_net_requested_version[1] = minor
                 self.__nat_net_requested_version[2] = 0
                 self.__nat_net_requested_version[3] = 0
+                self.__update_decode_plan()
                 print("changing bitstream MAIN")
                 # get original output state
                 #print_results = self.get_print_results()
@@ -268,6 +342,10 @@ class NatNetClient:
             result.settimeout(2.0)
             result.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
+            # in unicast mode frames also arrive on the command socket
+            if result is not None:
+                self.__set_receive_buffer_size( result )
+
         return result
 
     # Create a data socket to attach to the NatNet stream
@@ -322,188 +400,154 @@ class NatNetClient:
             if(self.multicast_address != "255.255.255.255"):
                 result.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, socket.inet_aton(self.multicast_address) + socket.inet_aton(self.local_ip_address))
 
+        if result is not None:
+            self.__set_receive_buffer_size( result )
         return result
 
-    # Unpack a rigid body object from a data packet
-    def __unpack_rigid_body( self, data, major, minor, rb_num):
-        offset = 0
-
-        # ID (4 bytes)
-        new_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
-        offset += 4
-
-        trace_mf( "RB: %3.1d ID: %3.1d"% (rb_num, new_id))
-
-        # Position and orientation
-        pos = Vector3.unpack( data[offset:offset+12] )
-        offset += 12
-        trace_mf( "\tPosition    : [%3.2f, %3.2f, %3.2f]"% (pos[0], pos[1], pos[2] ))
-
-        rot = Quaternion.unpack( data[offset:offset+16] )
-        offset += 16
-        trace_mf( "\tOrientation : [%3.2f, %3.2f, %3.2f, %3.2f]"% (rot[0], rot[1], rot[2], rot[3] ))
-
-        rigid_body = MoCapData.RigidBody(new_id, pos, rot)
+    # Apply socket_receive_buffer_size, if set. The OS may round or cap it
+    # (e.g. net.core.rmem_max on Linux), see get_socket_receive_buffer_size().
+    def __set_receive_buffer_size( self, in_socket ):
+        if self.socket_receive_buffer_size > 0:
+            try:
+                in_socket.setsockopt( socket.SOL_SOCKET, socket.SO_RCVBUF, self.socket_receive_buffer_size )
+            except socket.error as msg:
+                print("ERROR: could not set socket receive buffer size:\n%s" %msg)
+
+    # Effective kernel receive buffer size of the data socket, in bytes
+    def get_socket_receive_buffer_size( self ):
+        if self.data_socket is None:
+            return 0
+        return self.data_socket.getsockopt( socket.SOL_SOCKET, socket.SO_RCVBUF )
+
+    # Unpack a rigid body record at offset (3.0 and later). Returns the offset
+    # after it and the rigid body.
+    def __unpack_rigid_body( self, data, offset, plan ):
+        values = plan.rigid_body.unpack_from( data, offset ) + plan.rigid_body_padding
+        rigid_body = MoCapData.RigidBody( values[0], values[1:4], values[4:8] )
+        rigid_body.error = values[8]
+        rigid_body.tracking_valid = ( values[9] & 0x01 ) != 0
+        return offset + plan.rigid_body.size, rigid_body
+
+    # Unpack a rigid body record at offset (before 3.0), its marker data inline
+    def __unpack_legacy_rigid_body( self, data, offset, plan ):
+        values = plan.rigid_body_pose.unpack_from( data, offset )
+        offset += plan.rigid_body_pose.size
+        rigid_body = MoCapData.RigidBody( values[0], values[1:4], values[4:8] )
 
         # RB Marker Data ( Before version 3.0.  After Version 3.0 Marker data is in description )
-        if( major < 3  and major != 0) :
-            # Marker count (4 bytes)
-            marker_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
-            offset += 4
-            marker_count_range = range( 0, marker_count )
-            trace_mf( "\tMarker Count:", marker_count )
-
-            rb_marker_list=[]
-            for i in marker_count_range:
-                rb_marker_list.append(MoCapData.RigidBodyMarker())
-
-            # Marker positions
-            for i in marker_count_range:
-                pos = Vector3.unpack( data[offset:offset+12] )
-                offset += 12
-                trace_mf( "\tMarker", i, ":", pos[0],",", pos[1],",", pos[2] )
-                rb_marker_list[i].pos=pos
-
-
-            if major >= 2:
-                # Marker ID's
-                for i in marker_count_range:
-                    new_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
-                    offset += 4
-                    trace_mf( "\tMarker ID", i, ":", new_id )
-                    rb_marker_list[i].id=new_id
-
-                # Marker sizes
-                for i in marker_count_range:
-                    size = FloatValue.unpack( data[offset:offset+4] )
-                    offset += 4
-                    trace_mf( "\tMarker Size", i, ":", size[0] )
-                    rb_marker_list[i].size=size
-
-            for i in marker_count_range:
-                rigid_body.add_rigid_body_marker(rb_marker_list[i])
-        if major >= 2 :
-            marker_error, = FloatValue.unpack( data[offset:offset+4] )
-            offset += 4
-            trace_mf( "\tMarker Error: %3.2f"% marker_error )
-            rigid_body.error = marker_error
-
-        # Version 2.6 and later
-        if ( ( major == 2 ) and ( minor >= 6 ) ) or major > 2 :
-            param, = struct.unpack( 'h', data[offset:offset+2] )
-            tracking_valid = ( param & 0x01 ) != 0
-            offset += 2
-            is_valid_str='False'
-            if tracking_valid:
-                is_valid_str = 'True'
-            trace_mf( "\tTracking Valid: %s"%is_valid_str)
-            if tracking_valid:
-                rigid_body.tracking_valid = True
-            else:
-                rigid_body.tracking_valid = False
-
-
-        return offset, rigid_body
-
-    # Unpack a skeleton object from a data packet
-    def __unpack_skeleton( self, data, major, minor):
-
-        offset = 0
-        new_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        marker_count = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
+        trace_mf( "\tMarker Count:", marker_count )
+
+        rb_marker_list = []
+        for i in range( 0, marker_count ):
+            rb_marker = MoCapData.RigidBodyMarker()
+            rb_marker.pos = Vector3.unpack_from( data, offset + 12*i )
+            rb_marker_list.append( rb_marker )
+        offset += 12*marker_count
+
+        if plan.marker_ids_and_sizes:
+            # Marker ID's, then marker sizes
+            for i in range( 0, marker_count ):
+                rb_marker_list[i].id_num = NNIntValue.unpack_from( data, offset + 4*i )[0]
+                rb_marker_list[i].size = FloatValue.unpack_from( data, offset + 4*(marker_count + i) )[0]
+            offset += 8*marker_count
+
+        for rb_marker in rb_marker_list:
+            rigid_body.add_rigid_body_marker( rb_marker, copy_data=False )
+
+        values = plan.rigid_body_tail.unpack_from( data, offset ) + plan.rigid_body_padding
+        rigid_body.error = values[0]
+        rigid_body.tracking_valid = ( values[1] & 0x01 ) != 0
+        return offset + plan.rigid_body_tail.size, rigid_body
+
+    # Unpack a skeleton object at offset
+    def __unpack_skeleton( self, data, offset, plan ):
+        new_id = NNIntValue.unpack_from( data, offset )[0]
+        rigid_body_count = NNIntValue.unpack_from( data, offset + 4 )[0]
+        offset += 8
         trace_mf( "ID:", new_id )
+        trace_mf( "Rigid Body Count : ", rigid_body_count )
         skeleton = MoCapData.Skeleton(new_id)
 
-        rigid_body_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
-        offset += 4
-        trace_mf( "Rigid Body Count : %3.1d"% rigid_body_count )
-        for rb_num in range( 0, rigid_body_count ):
-            offset_tmp, rigid_body = self.__unpack_rigid_body( data[offset:], major, minor, rb_num )
-            skeleton.add_rigid_body(rigid_body)
-            offset+=offset_tmp
+        unpack_rigid_body = self.__unpack_rigid_body if plan.fixed_rigid_bodies else self.__unpack_legacy_rigid_body
+        for _ in range( 0, rigid_body_count ):
+            offset, rigid_body = unpack_rigid_body( data, offset, plan )
+            skeleton.add_rigid_body(rigid_body, copy_data=False)
 
         return offset, skeleton
 
     # Unpack Mocap Data Functions
-    def __unpack_frame_prefix_data( self, data):
-        offset = 0
+    #
+    # Every section function takes the whole frame payload and the offset of
+    # its section, and returns the offset after it along with what it decoded,
+    # so nothing is sliced or copied on the way down.
+    def __unpack_frame_prefix_data( self, data, offset ):
         # Frame number (4 bytes)
-        frame_number = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        frame_number = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
         trace_mf( "Frame #:", frame_number )
         frame_prefix_data=MoCapData.FramePrefixData(frame_number)
         return offset, frame_prefix_data
 
-    def __unpack_marker_set_data( self, data, packet_size, major, minor):
+    def __unpack_marker_set_data( self, data, offset, plan ):
         marker_set_data=MoCapData.MarkerSetData()
-        offset = 0
         # Marker set count (4 bytes)
-        marker_set_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        marker_set_count = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
         trace_mf( "Marker Set Count:", marker_set_count )
 
         for i in range( 0, marker_set_count ):
             marker_data = MoCapData.MarkerData()
             # Model name
-            model_name, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-            offset += len( model_name ) + 1
-            trace_mf( "Model Name      : ", model_name.decode( 'utf-8' ) )
+            model_name, offset = structures.read_name( data, offset )
+            trace_mf( "Model Name      : ", model_name )
             marker_data.set_model_name(model_name)
             # Marker count (4 bytes)
-            marker_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            marker_count = NNIntValue.unpack_from( data, offset )[0]
             offset += 4
             trace_mf( "Marker Count    : ", marker_count )
 
             for j in range( 0, marker_count ):
-                pos = Vector3.unpack( data[offset:offset+12] )
+                marker_data.add_pos(Vector3.unpack_from( data, offset ), copy_data=False)
                 offset += 12
-                trace_mf( "\tMarker %3.1d : [%3.2f,%3.2f,%3.2f]"%( j, pos[0], pos[1], pos[2] ))
-                marker_data.add_pos(pos)
-            marker_set_data.add_marker_data(marker_data)
+            marker_set_data.add_marker_data(marker_data, copy_data=False)
 
         # Unlabeled markers count (4 bytes)
-        unlabeled_markers_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        unlabeled_markers_count = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
         trace_mf( "Unlabeled Markers Count:", unlabeled_markers_count )
 
         for i in range( 0, unlabeled_markers_count ):
-            pos = Vector3.unpack( data[offset:offset+12] )
+            marker_set_data.add_unlabeled_marker(Vector3.unpack_from( data, offset ), copy_data=False)
             offset += 12
-            trace_mf( "\tMarker %3.1d : [%3.2f,%3.2f,%3.2f]"%( i, pos[0], pos[1], pos[2] ))
-            marker_set_data.add_unlabeled_marker(pos)
         return offset, marker_set_data
 
-    def __unpack_rigid_body_data( self, data, packet_size, major, minor):
+    def __unpack_rigid_body_data( self, data, offset, plan ):
         rigid_body_data = MoCapData.RigidBodyData()
-        offset = 0
         # Rigid body count (4 bytes)
-        rigid_body_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        rigid_body_count = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
         trace_mf( "Rigid Body Count:", rigid_body_count )
 
-        for i in range( 0, rigid_body_count ):
-            offset_tmp, rigid_body = self.__unpack_rigid_body( data[offset:], major, minor, i )
-            offset += offset_tmp
-            rigid_body_data.add_rigid_body(rigid_body)
-
+        unpack_rigid_body = self.__unpack_rigid_body if plan.fixed_rigid_bodies else self.__unpack_legacy_rigid_body
+        for _ in range( 0, rigid_body_count ):
+            offset, rigid_body = unpack_rigid_body( data, offset, plan )
+            rigid_body_data.add_rigid_body(rigid_body, copy_data=False)
 
         return offset, rigid_body_data
 
-    def __unpack_skeleton_data( self, data, packet_size, major, minor):
+    def __unpack_skeleton_data( self, data, offset, plan ):
         skeleton_data = MoCapData.SkeletonData()
 
-        offset = 0
         # Version 2.1 and later
-        skeleton_count = 0
-        if( ( major == 2 and minor > 0 ) or major > 2 ):
-            skeleton_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        if plan.has_skeletons:
+            skeleton_count = NNIntValue.unpack_from( data, offset )[0]
             offset += 4
             trace_mf( "Skeleton Count:", skeleton_count )
             for _ in range( 0, skeleton_count ):
-                rel_offset, skeleton = self.__unpack_skeleton( data[offset:], major, minor )
-                offset += rel_offset
-                skeleton_data.add_skeleton(skeleton)
-
+                offset, skeleton = self.__unpack_skeleton( data, offset, plan )
+                skeleton_data.add_skeleton(skeleton, copy_data=False)
 
         return offset, skeleton_data
 
@@ -514,370 +558,237 @@ class NatNetClient:
         marker_id = new_id & 0x0000ffff
         return model_id, marker_id
 
-    def __unpack_labeled_marker_data( self, data, packet_size, major, minor):
+    def __unpack_labeled_marker_data( self, data, offset, plan ):
         labeled_marker_data = MoCapData.LabeledMarkerData()
-        offset = 0
         # Labeled markers (Version 2.3 and later)
-        labeled_marker_count = 0
-        if( ( major == 2 and minor > 3 ) or major > 2 ):
-            labeled_marker_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        if plan.has_labeled_markers:
+            labeled_marker_count = NNIntValue.unpack_from( data, offset )[0]
             offset += 4
             trace_mf( "Labeled Marker Count:", labeled_marker_count )
-            for _ in range( 0, labeled_marker_count ):
-                model_id = 0
-                marker_id = 0
-                tmp_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
-                offset += 4
-                model_id, marker_id = self.__decode_marker_id(tmp_id)
-                pos = Vector3.unpack( data[offset:offset+12] )
-                offset += 12
-                size = FloatValue.unpack( data[offset:offset+4] )
-                offset += 4
-                trace_mf("ID     : [MarkerID: %3.1d] [ModelID: %3.1d]"%(marker_id,model_id))
-                trace_mf("  pos  : [%3.2f, %3.2f, %3.2f]"%(pos[0],pos[1],pos[2]))
-                trace_mf("  size : [%3.2f]"%size)
-
-
-                # Version 2.6 and later
-                param = 0
-                if( ( major == 2 and minor >= 6 ) or major > 2):
-                    param, = struct.unpack( 'h', data[offset:offset+2] )
-                    offset += 2
-                    #occluded = ( param & 0x01 ) != 0
-                    #point_cloud_solved = ( param & 0x02 ) != 0
-                    #model_solved = ( param & 0x04 ) != 0
-
-                # Version 3.0 and later
-                residual = 0.0
-                if major >= 3 :
-                    residual, = FloatValue.unpack( data[offset:offset+4] )
-                    offset += 4
-                    trace_mf( "  err  : [%3.2f]"% residual )
 
-                labeled_marker = MoCapData.LabeledMarker(tmp_id,pos,size,param, residual)
-                labeled_marker_data.add_labeled_marker(labeled_marker)
+            # id (model id << 16 | marker id), pos, size, param (2.6 and later),
+            # residual (3.0 and later)
+            labeled_marker = plan.labeled_marker
+            padding = plan.labeled_marker_padding
+            for _ in range( 0, labeled_marker_count ):
+                values = labeled_marker.unpack_from( data, offset ) + padding
+                offset += labeled_marker.size
+                labeled_marker_data.add_labeled_marker(
+                    MoCapData.LabeledMarker( values[0], values[1:4], values[4], values[5], values[6] ),
+                    copy_data=False )
 
         return offset, labeled_marker_data
 
-    def __unpack_force_plate_data( self, data, packet_size, major, minor):
+    def __unpack_force_plate_data( self, data, offset, plan ):
         force_plate_data = MoCapData.ForcePlateData()
-        n_frames_show_max = 4
-        offset = 0
         # Force Plate data (version 2.9 and later)
-        force_plate_count = 0
-        if( ( major == 2 and minor >= 9 ) or major > 2 ):
-            force_plate_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        if plan.has_force_plates:
+            force_plate_count = NNIntValue.unpack_from( data, offset )[0]
             offset += 4
             trace_mf( "Force Plate Count:", force_plate_count )
             for i in range( 0, force_plate_count ):
-                # ID
-                force_plate_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
-                offset += 4
+                # ID, Channel Count
+                force_plate_id = NNIntValue.unpack_from( data, offset )[0]
+                force_plate_channel_count = NNIntValue.unpack_from( data, offset + 4 )[0]
+                offset += 8
                 force_plate = MoCapData.ForcePlate(force_plate_id)
-
-                # Channel Count
-                force_plate_channel_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
-                offset += 4
-
-                trace_mf( "\tForce Plate %3.1d ID: %3.1d Num Channels: %3.1d"% (i, force_plate_id, force_plate_channel_count ))
+                trace_mf( "\tForce Plate ", i, " ID: ", force_plate_id, " Num Channels: ", force_plate_channel_count )
 
                 # Channel Data
                 for j in range( force_plate_channel_count ):
                     fp_channel_data = MoCapData.ForcePlateChannelData()
-                    force_plate_channel_frame_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+                    force_plate_channel_frame_count = NNIntValue.unpack_from( data, offset )[0]
                     offset += 4
-                    out_string="\tChannel %3.1d: "%( j )
-                    out_string+="  %3.1d Frames - Frame Data: "%(force_plate_channel_frame_count)
+                    trace_mf( "\tChannel ", j, ": ", force_plate_channel_frame_count, " Frames" )
 
                     # Force plate frames
-                    n_frames_show = min(force_plate_channel_frame_count, n_frames_show_max)
                     for k in range( force_plate_channel_frame_count ):
-                        force_plate_channel_val = FloatValue.unpack( data[offset:offset+4] )
+                        fp_channel_data.add_frame_entry(FloatValue.unpack_from( data, offset ), copy_data=False)
                         offset += 4
-                        fp_channel_data.add_frame_entry(force_plate_channel_val)
-
-                        if k < n_frames_show:
-                            out_string += "%3.2f "%(force_plate_channel_val)
-                    if n_frames_show < force_plate_channel_frame_count:
-                        out_string += " showing %3.1d of %3.1d frames"%(n_frames_show, force_plate_channel_frame_count)
-                    trace_mf( "%s"% out_string )
-                    force_plate.add_channel_data(fp_channel_data)
-                force_plate_data.add_force_plate(force_plate)
+                    force_plate.add_channel_data(fp_channel_data, copy_data=False)
+                force_plate_data.add_force_plate(force_plate, copy_data=False)
         return offset, force_plate_data
 
-    def __unpack_device_data( self, data, packet_size, major, minor):
+    def __unpack_device_data( self, data, offset, plan ):
         device_data = MoCapData.DeviceData()
-        n_frames_show_max = 4
-        offset = 0
         # Device data (version 2.11 and later)
-        device_count = 0
-        if ( major == 2 and minor >= 11 ) or (major > 2) :
-            device_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        if plan.has_devices:
+            device_count = NNIntValue.unpack_from( data, offset )[0]
             offset += 4
             trace_mf( "Device Count:", device_count )
             for i in range( 0, device_count ):
-
-                # ID
-                device_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
-                offset += 4
+                # ID, Channel Count
+                device_id = NNIntValue.unpack_from( data, offset )[0]
+                device_channel_count = NNIntValue.unpack_from( data, offset + 4 )[0]
+                offset += 8
                 device = MoCapData.Device(device_id)
-                # Channel Count
-                device_channel_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
-                offset += 4
-
-                trace_mf( "\tDevice %3.1d      ID: %3.1d Num Channels: %3.1d"% (i, device_id, device_channel_count ))
+                trace_mf( "\tDevice ", i, " ID: ", device_id, " Num Channels: ", device_channel_count )
 
                 # Channel Data
                 for j in range( 0, device_channel_count ):
                     device_channel_data = MoCapData.DeviceChannelData()
-                    device_channel_frame_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+                    device_channel_frame_count = NNIntValue.unpack_from( data, offset )[0]
                     offset += 4
-                    out_string="\tChannel %3.1d "% (j)
-                    out_string+="  %3.1d Frames - Frame Data: "%(device_channel_frame_count)
+                    trace_mf( "\tChannel ", j, ": ", device_channel_frame_count, " Frames" )
 
                     # Device Frame Data
-                    n_frames_show = min(device_channel_frame_count, n_frames_show_max)
                     for k in range( 0, device_channel_frame_count ):
-                        device_channel_val = int.from_bytes( data[offset:offset+4], byteorder='little' )
-                        device_channel_val = FloatValue.unpack( data[offset:offset+4] )
+                        device_channel_data.add_frame_entry(FloatValue.unpack_from( data, offset ), copy_data=False)
                         offset += 4
-                        if k < n_frames_show:
-                            out_string += "%3.2f "%(device_channel_val)
-
-                        device_channel_data.add_frame_entry(device_channel_val)
-                    if n_frames_show < device_channel_frame_count:
-                        out_string += " showing %3.1d of %3.1d frames"%(n_frames_show, device_channel_frame_count)
-                    trace_mf( "%s"% out_string )
-                    device.add_channel_data(device_channel_data)
-                device_data.add_device(device)
+                    device.add_channel_data(device_channel_data, copy_data=False)
+                device_data.add_device(device, copy_data=False)
         return offset, device_data
 
-    def __unpack_frame_suffix_data( self, data, packet_size, major, minor):
+    def __unpack_frame_suffix_data( self, data, offset, plan ):
         frame_suffix_data = MoCapData.FrameSuffixData()
-        offset = 0
 
-        # Timecode
-        timecode = int.from_bytes( data[offset:offset+4], byteorder='little' )
-        offset += 4
-        frame_suffix_data.timecode = timecode
-
-        timecode_sub = int.from_bytes( data[offset:offset+4], byteorder='little' )
-        offset += 4
-        frame_suffix_data.timecode_sub = timecode_sub
-
-        # Timestamp (increased to double precision in 2.7 and later)
-        if ( major == 2 and minor >= 7 ) or (major > 2 ):
-            timestamp, = DoubleValue.unpack( data[offset:offset+8] )
-            offset += 8
-        else:
-            timestamp, = FloatValue.unpack( data[offset:offset+4] )
-            offset += 4
-        trace_mf("Timestamp : %3.2f"%timestamp)
-        frame_suffix_data.timestamp = timestamp
-
-        # Hires Timestamp (Version 3.0 and later)
-        if major >= 3 :
-            stamp_camera_mid_exposure = int.from_bytes( data[offset:offset+8], byteorder='little' )
-            trace_mf("Mid-exposure timestamp         : %3.1d"%stamp_camera_mid_exposure)
-            offset += 8
-            frame_suffix_data.stamp_camera_mid_exposure = stamp_camera_mid_exposure
-
-            stamp_data_received = int.from_bytes( data[offset:offset+8], byteorder='little' )
-            offset += 8
-            frame_suffix_data.stamp_data_received = stamp_data_received
-            trace_mf("Camera data received timestamp : %3.1d"%stamp_data_received)
-
-            stamp_transmit = int.from_bytes( data[offset:offset+8], byteorder='little' )
-            offset += 8
-            trace_mf("Transmit timestamp             : %3.1d"%stamp_transmit)
-            frame_suffix_data.stamp_transmit = stamp_transmit
-
-
-        # Frame parameters
-        param, = struct.unpack( 'h', data[offset:offset+2] )
-        is_recording = ( param & 0x01 ) != 0
-        tracked_models_changed = ( param & 0x02 ) != 0
-        offset += 2
+        # Timecode, timestamp (double precision from 2.7), hi-res stamps
+        # (3.0 and later) and frame parameters
+        values = plan.suffix.unpack_from( data, offset )
+        frame_suffix_data.timecode = values[0]
+        frame_suffix_data.timecode_sub = values[1]
+        frame_suffix_data.timestamp = values[2]
+        trace_mf( "Timestamp : ", values[2] )
+        if plan.has_stamps:
+            frame_suffix_data.stamp_camera_mid_exposure = values[3]
+            frame_suffix_data.stamp_data_received = values[4]
+            frame_suffix_data.stamp_transmit = values[5]
+
+        param = values[-1]
         frame_suffix_data.param = param
-        frame_suffix_data.is_recording = is_recording
-        frame_suffix_data.tracked_models_changed = tracked_models_changed
+        frame_suffix_data.is_recording = ( param & 0x01 ) != 0
+        frame_suffix_data.tracked_models_changed = ( param & 0x02 ) != 0
 
-        return offset, frame_suffix_data
+        return offset + plan.suffix.size, frame_suffix_data
 
     # Unpack data from a motion capture frame message
-    def __unpack_mocap_data( self, data : bytes, packet_size, major, minor):
+    def __unpack_mocap_data( self, data : bytes, packet_size, plan ):
         mocap_data = MoCapData.MoCapData()
         trace_mf( "MoCap Frame Begin\n-----------------" )
-        data = memoryview( data )
         offset = 0
-        rel_offset = 0
 
         #Frame Prefix Data
-        rel_offset, frame_prefix_data = self.__unpack_frame_prefix_data(data[offset:])
-        offset += rel_offset
+        offset, frame_prefix_data = self.__unpack_frame_prefix_data( data, offset )
         mocap_data.set_prefix_data(frame_prefix_data)
         frame_number = frame_prefix_data.frame_number
 
         #Marker Set Data
-        rel_offset, marker_set_data =self.__unpack_marker_set_data(data[offset:], (packet_size - offset),major, minor)
-        offset += rel_offset
+        offset, marker_set_data = self.__unpack_marker_set_data( data, offset, plan )
         mocap_data.set_marker_set_data(marker_set_data)
-        marker_set_count = marker_set_data.get_marker_set_count()
-        unlabeled_markers_count = marker_set_data.get_unlabeled_marker_count()
 
         # Rigid Body Data
-        rel_offset, rigid_body_data = self.__unpack_rigid_body_data(data[offset:], (packet_size - offset),major, minor)
-        offset += rel_offset
+        offset, rigid_body_data = self.__unpack_rigid_body_data( data, offset, plan )
         mocap_data.set_rigid_body_data(rigid_body_data)
-        rigid_body_count = rigid_body_data.get_rigid_body_count()
 
         # If listener provided, return rigid body frame data
         if self.rigid_bodies_frame_listener is not None:
             self.rigid_bodies_frame_listener(frame_number, rigid_body_data.get_data_dict())
 
         # Skeleton Data
-        rel_offset, skeleton_data = self.__unpack_skeleton_data(data[offset:], (packet_size - offset),major, minor)
-        offset += rel_offset
+        offset, skeleton_data = self.__unpack_skeleton_data( data, offset, plan )
         mocap_data.set_skeleton_data(skeleton_data)
-        skeleton_count = skeleton_data.get_skeleton_count()
 
         # If listener provided, return skeleton frame data
         if self.skeletons_frame_listener is not None:
             self.skeletons_frame_listener(frame_number, skeleton_data.get_data_dict())
 
         # Labeled Marker Data
-        rel_offset, labeled_marker_data = self.__unpack_labeled_marker_data(data[offset:], (packet_size - offset),major, minor)
-        offset += rel_offset
+        offset, labeled_marker_data = self.__unpack_labeled_marker_data( data, offset, plan )
         mocap_data.set_labeled_marker_data(labeled_marker_data)
-        labeled_marker_count = labeled_marker_data.get_labeled_marker_count()
 
         # Force Plate Data
-        rel_offset, force_plate_data = self.__unpack_force_plate_data(data[offset:], (packet_size - offset),major, minor)
-        offset += rel_offset
+        offset, force_plate_data = self.__unpack_force_plate_data( data, offset, plan )
         mocap_data.set_force_plate_data(force_plate_data)
 
         # Device Data
-        rel_offset,device_data = self.__unpack_device_data(data[offset:], (packet_size - offset),major, minor)
-        offset += rel_offset
+        offset, device_data = self.__unpack_device_data( data, offset, plan )
         mocap_data.set_device_data(device_data)
 
         # Frame Suffix Data
-        #rel_offset, timecode, timecode_sub, timestamp, is_recording, tracked_models_changed = \
-        rel_offset, frame_suffix_data =   self.__unpack_frame_suffix_data(data[offset:], (packet_size - offset),major, minor)
-        offset += rel_offset
+        offset, frame_suffix_data = self.__unpack_frame_suffix_data( data, offset, plan )
         mocap_data.set_suffix_data(frame_suffix_data)
 
-
-        timecode = frame_suffix_data.timecode
-        timecode_sub= frame_suffix_data.timecode_sub
-        timestamp = frame_suffix_data.timestamp
-        is_recording = frame_suffix_data.is_recording
-        tracked_models_changed = frame_suffix_data.tracked_models_changed
         # Send information to any listener.
         if self.new_frame_listener is not None:
-            # data_dict={}
-            # data_dict["frame_number"]=frame_number
-            # data_dict[ "timecode"] = timecode
-            # data_dict[ "timecode_sub"] = timecode_sub
-            # data_dict[ "timestamp"] = timestamp
-            # data_dict[ "is_recording"] = is_recording
-            # data_dict[ "tracked_models_changed"] = tracked_models_changed
-            # data_dict[ "marker_set_data"] = marker_set_data
-            # #data_dict[ "unlabeled_markers_count"] = unlabeled_markers_count
-            # data_dict[ "rigid_body_data"] = rigid_body_data
-            # data_dict[ "skeleton_data"] = skeleton_data
-            # data_dict[ "labeled_marker_data"] = labeled_marker_data
-
             self.new_frame_listener( mocap_data.get_data_dict() )
         trace_mf( "MoCap Frame End\n-----------------" )
         return offset, mocap_data
 
+    # Description functions take the whole NAT_MODELDEF payload and the offset
+    # of their description, and return the offset after it along with it.
+
     # Unpack a marker set description packet
-    def __unpack_marker_set_description( self, data, major, minor):
+    def __unpack_marker_set_description( self, data, offset, major, minor):
         ms_desc = DataDescriptions.MarkerSetDescription()
 
-        offset = 0
-
-        name, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-        offset += len( name ) + 1
-        trace_dd( "Marker Set Name: %s" % (name.decode( 'utf-8' )) )
+        name, offset = structures.read_name( data, offset )
+        trace_dd( "Marker Set Name: ", name )
         ms_desc.set_name(name)
 
-        marker_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        marker_count = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
-        trace_dd( "Marker Count : %3.1d" % marker_count)
+        trace_dd( "Marker Count : ", marker_count )
         for i in range( 0, marker_count ):
-            name, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-            offset += len( name ) + 1
-            trace_dd( "\t%2.1d Marker Name: %s"%(i, name.decode( 'utf-8' ) ))
+            name, offset = structures.read_name( data, offset )
+            trace_dd( "\t", i, " Marker Name: ", name )
             ms_desc.add_marker_name(name)
 
         return offset, ms_desc
 
     # Unpack a rigid body description packet
-    def __unpack_rigid_body_description( self, data, major, minor):
+    def __unpack_rigid_body_description( self, data, offset, major, minor):
         rb_desc=DataDescriptions.RigidBodyDescription()
-        offset = 0
 
         # Version 2.0 or higher
         if (major >= 2) or (major == 0):
-            name, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-            offset += len( name ) + 1
+            name, offset = structures.read_name( data, offset )
             rb_desc.set_name(name)
-            trace_dd( "\tRigid Body Name   : ", name.decode( 'utf-8' ) )
+            trace_dd( "\tRigid Body Name   : ", name )
 
         # ID
-        new_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        new_id = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
         rb_desc.set_id(new_id)
-        trace_dd( "\tID                : ", str(new_id))
+        trace_dd( "\tID                : ", new_id )
 
         #Parent ID
-        parent_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        parent_id = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
         rb_desc.set_parent_id(parent_id)
         trace_dd( "\tParent ID         : ", parent_id)
 
         # Position Offsets
-        pos = Vector3.unpack( data[offset:offset+12] )
+        pos = Vector3.unpack_from( data, offset )
         offset += 12
         rb_desc.set_pos(pos[0],pos[1],pos[2])
-
-        trace_dd( "\tPosition          : [%3.2f, %3.2f, %3.2f]"% (pos[0], pos[1], pos[2] ))
+        trace_dd( "\tPosition          : ", pos )
 
         # Version 3.0 and higher, rigid body marker information contained in description
         if (major >= 3) or (major == 0) :
             # Marker Count
-            marker_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            marker_count = NNIntValue.unpack_from( data, offset )[0]
             offset += 4
             trace_dd( "\tNumber of Markers : ", marker_count )
 
-            marker_count_range = range( 0, marker_count )
+            # Marker offsets X,Y,Z, then active labels, then (4.0 and later) names
             offset1 = offset
             offset2 = offset1 + (12*marker_count)
             offset3 = offset2 + (4*marker_count)
-            # Marker Offsets X,Y,Z
             marker_name=""
-            for marker in marker_count_range:
-                # Offset
-                marker_offset = Vector3.unpack(data[offset1:offset1+12])
+            for marker in range( 0, marker_count ):
+                marker_offset = Vector3.unpack_from( data, offset1 )
                 offset1 +=12
 
-                # Active Label
-                active_label = int.from_bytes(data[offset2:offset2+4],byteorder = 'little')
+                active_label = NNIntValue.unpack_from( data, offset2 )[0]
                 offset2 += 4
 
-                #Marker Name
                 if (major >= 4) or (major == 0):
-                    # markername
-                    marker_name, separator, remainder = bytes(data[offset3:]).partition( b'\0' )
+                    marker_name, offset3 = structures.read_name( data, offset3 )
                     marker_name = marker_name.decode( 'utf-8' )
-                    offset3 += len( marker_name ) + 1
 
                 rb_marker=DataDescriptions.RBMarker(marker_name,active_label,marker_offset)
-                rb_desc.add_rb_marker(rb_marker)
-                trace_dd( "\t%3.1d Marker Label: %s Position: [%3.2f %3.2f %3.2f] %s" % (marker,active_label,\
-                   marker_offset[0], marker_offset[1], marker_offset[2],marker_name ))
+                rb_desc.add_rb_marker(rb_marker, copy_data=False)
+                trace_dd( "\t", marker, " Marker Label: ", active_label, " Position: ", marker_offset, " ", marker_name )
 
             offset = offset3
 
@@ -885,89 +796,80 @@ class NatNetClient:
         return offset, rb_desc
 
     # Unpack a skeleton description packet
-    def __unpack_skeleton_description( self, data, major, minor):
+    def __unpack_skeleton_description( self, data, offset, major, minor):
         skeleton_desc = DataDescriptions.SkeletonDescription()
-        offset = 0
 
         #Name
-        name, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-        offset += len( name ) + 1
+        name, offset = structures.read_name( data, offset )
         skeleton_desc.set_name(name)
-        trace_dd( "Name : %s"% name.decode( 'utf-8' ) )
+        trace_dd( "Name : ", name )
 
         #ID
-        new_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        new_id = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
         skeleton_desc.set_id(new_id)
-        trace_dd( "ID : %3.1d"% new_id )
+        trace_dd( "ID : ", new_id )
 
         # # of RigidBodies
-        rigid_body_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        rigid_body_count = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
-        trace_dd( "Rigid Body (Bone) Count : %3.1d" % rigid_body_count)
+        trace_dd( "Rigid Body (Bone) Count : ", rigid_body_count )
 
         # Loop over all Rigid Bodies
         for i in range( 0, rigid_body_count ):
             trace_dd("Rigid Body (Bone) ", i)
-            offset_tmp, rb_desc_tmp = self.__unpack_rigid_body_description( data[offset:], major, minor )
-            offset+= offset_tmp
-            skeleton_desc.add_rigid_body_description(rb_desc_tmp)
-            
+            offset, rb_desc_tmp = self.__unpack_rigid_body_description( data, offset, major, minor )
+            skeleton_desc.add_rigid_body_description(rb_desc_tmp, copy_data=False)
+
         return offset, skeleton_desc
 
-    def __unpack_force_plate_description(self, data, major, minor):
+    def __unpack_force_plate_description(self, data, offset, major, minor):
         fp_desc = None
-        offset = 0
         if major >= 3:
             fp_desc = DataDescriptions.ForcePlateDescription()
             # ID
-            new_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            new_id = NNIntValue.unpack_from( data, offset )[0]
             offset += 4
             fp_desc.set_id(new_id)
-            trace_dd("\tID : ", str(new_id))
+            trace_dd("\tID : ", new_id)
 
             # Serial Number
-            serial_number, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-            offset += len( serial_number ) + 1
+            serial_number, offset = structures.read_name( data, offset )
             fp_desc.set_serial_number(serial_number)
-            trace_dd( "\tSerial Number : ", serial_number.decode( 'utf-8' ) )
+            trace_dd( "\tSerial Number : ", serial_number )
 
             # Dimensions
-            f_width = FloatValue.unpack( data[offset:offset+4])
-            offset += 4
-            trace_dd( "\tWidth  : %3.2f"% f_width)
-            f_length = FloatValue.unpack( data[offset:offset+4])
-            offset += 4
+            f_width = FloatValue.unpack_from( data, offset )
+            f_length = FloatValue.unpack_from( data, offset + 4 )
+            offset += 8
             fp_desc.set_dimensions(f_width[0], f_length[0])
-            trace_dd( "\tLength : %3.2f"% f_length)
+            trace_dd( "\tWidth  : ", f_width[0] )
+            trace_dd( "\tLength : ", f_length[0] )
 
             # Origin
-            origin = Vector3.unpack( data[offset:offset+12] )
+            origin = Vector3.unpack_from( data, offset )
             offset += 12
             fp_desc.set_origin(origin[0],origin[1],origin[2])
-            trace_dd( "\tOrigin : %3.2f, %3.2f, %3.2f"%( origin[0], origin[1], origin[2] ))
+            trace_dd( "\tOrigin : ", origin )
 
             # Calibration Matrix 12x12 floats
             trace_dd("Cal Matrix:")
             cal_matrix_tmp= [[0.0 for col in range(12)] for row in range(12)]
 
             for i in range(0,12):
-                cal_matrix_row=FPCalMatrixRow.unpack(data[offset:offset+(12*4)])
-                trace_dd("\t%3.1d %3.3e %3.3e %3.3e %3.3e %3.3e %3.3e %3.3e %3.3e %3.3e %3.3e %3.3e %3.3e" % (i
-                      , cal_matrix_row[0], cal_matrix_row[1], cal_matrix_row[2], cal_matrix_row[3]
-                      , cal_matrix_row[4], cal_matrix_row[5], cal_matrix_row[6], cal_matrix_row[7]
-                      , cal_matrix_row[8], cal_matrix_row[9], cal_matrix_row[10], cal_matrix_row[11]))
+                cal_matrix_row=FPCalMatrixRow.unpack_from( data, offset )
+                trace_dd("\t", i, " ", cal_matrix_row)
                 cal_matrix_tmp[i] = copy.deepcopy(cal_matrix_row)
                 offset += (12*4)
             fp_desc.set_cal_matrix(cal_matrix_tmp)
             # Corners 4x3 floats
-            corners = FPCorners.unpack(data[offset:offset + (12*4)])
+            corners = FPCorners.unpack_from( data, offset )
             offset += (12*4)
             o_2=0
             trace_dd("Corners:")
             corners_tmp = [[0.0 for col in range(3)] for row in range(4)]
             for i in range(0,4):
-                trace_dd("\t%3.1d %3.3e %3.3e %3.3e"%(i, corners[o_2], corners[o_2+1], corners[o_2+2]))
+                trace_dd("\t", i, " ", corners[o_2:o_2+3])
                 corners_tmp[i][0]=corners[o_2]
                 corners_tmp[i][1]=corners[o_2+1]
                 corners_tmp[i][2]=corners[o_2+2]
@@ -975,95 +877,87 @@ class NatNetClient:
             fp_desc.set_corners(corners_tmp)
 
             # Plate Type int
-            plate_type = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            plate_type = NNIntValue.unpack_from( data, offset )[0]
             offset+=4
             fp_desc.set_plate_type(plate_type)
             trace_dd ("Plate Type : ", plate_type)
 
             # Channel Data Type int
-            channel_data_type = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            channel_data_type = NNIntValue.unpack_from( data, offset )[0]
             offset+=4
             fp_desc.set_channel_data_type(channel_data_type)
             trace_dd("Channel Data Type : ", channel_data_type)
 
             # Number of Channels int
-            num_channels = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            num_channels = NNIntValue.unpack_from( data, offset )[0]
             offset+=4
             trace_dd("Number of Channels : ", num_channels)
 
             # Channel Names list of NoC strings
             for i in range(0, num_channels):
-                channel_name, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-                offset += len( channel_name ) + 1
-                trace_dd( "\tChannel Name %3.1d: %s"%(i, channel_name.decode( 'utf-8' ) ))
-                fp_desc.add_channel_name(channel_name)
+                channel_name, offset = structures.read_name( data, offset )
+                trace_dd( "\tChannel Name ", i, ": ", channel_name )
+                fp_desc.add_channel_name(channel_name, copy_data=False)
 
         trace_dd("unpackForcePlate processed ", offset, " bytes")
         return offset, fp_desc
 
-    def __unpack_device_description(self, data, major, minor):
+    def __unpack_device_description(self, data, offset, major, minor):
         device_desc=None
-        offset = 0
         if major >= 3:
             # new_id
-            new_id = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            new_id = NNIntValue.unpack_from( data, offset )[0]
             offset += 4
-            trace_dd("\tID : ", str(new_id))
+            trace_dd("\tID : ", new_id)
 
             # Name
-            name, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-            offset += len( name ) + 1
-            trace_dd( "\tName : ", name.decode( 'utf-8' ) )
+            name, offset = structures.read_name( data, offset )
+            trace_dd( "\tName : ", name )
 
             # Serial Number
-            serial_number, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-            offset += len( serial_number ) + 1
-            trace_dd( "\tSerial Number : ", serial_number.decode( 'utf-8' ) )
-
+            serial_number, offset = structures.read_name( data, offset )
+            trace_dd( "\tSerial Number : ", serial_number )
 
             # Device Type int
-            device_type = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            device_type = NNIntValue.unpack_from( data, offset )[0]
             offset+=4
             trace_dd ("Device Type : ", device_type)
 
             # Channel Data Type int
-            channel_data_type = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            channel_data_type = NNIntValue.unpack_from( data, offset )[0]
             offset+=4
             trace_dd("Channel Data Type : ", channel_data_type)
 
             device_desc = DataDescriptions.DeviceDescription(new_id,name,serial_number,device_type,channel_data_type)
 
             # Number of Channels int
-            num_channels = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            num_channels = NNIntValue.unpack_from( data, offset )[0]
             offset+=4
             trace_dd("Number of Channels ", num_channels)
 
             # Channel Names list of NoC strings
             for i in range(0, num_channels):
-                channel_name, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-                offset += len( channel_name ) + 1
+                channel_name, offset = structures.read_name( data, offset )
                 device_desc.add_channel_name(channel_name)
-                trace_dd( "\tChannel ",i," Name : ", channel_name.decode( 'utf-8' ) )
+                trace_dd( "\tChannel ",i," Name : ", channel_name )
 
         trace_dd("unpack_device_description processed ", offset, " bytes")
         return offset, device_desc
 
-    def __unpack_camera_description(self, data, major, minor):
-        offset = 0
+    def __unpack_camera_description(self, data, offset, major, minor):
         # Name
-        name, separator, remainder = bytes(data[offset:]).partition( b'\0' )
-        offset += len( name ) + 1
-        trace_dd( "\tName       : %s"% name.decode( 'utf-8' ) )
+        name, offset = structures.read_name( data, offset )
+        trace_dd( "\tName       : ", name )
         # Position
-        position = Vector3.unpack( data[offset:offset+12] )
+        position = Vector3.unpack_from( data, offset )
         offset += 12
-        trace_dd( "\tPosition   : [%3.2f, %3.2f, %3.2f]"% (position[0], position[1], position[2] ))
+        trace_dd( "\tPosition   : ", position )
 
         # Orientation
-        orientation = Quaternion.unpack( data[offset:offset+16] )
+        orientation = Quaternion.unpack_from( data, offset )
         offset += 16
-        trace_dd( "\tOrientation: [%3.2f, %3.2f, %3.2f, %3.2f]"% (orientation[0], orientation[1], orientation[2], orientation[3] ))
-        trace_dd("unpack_camera_description processed %3.1d bytes"% offset)
+        trace_dd( "\tOrientation: ", orientation )
+        trace_dd("unpack_camera_description processed ", offset, " bytes")
 
         camera_desc=DataDescriptions.CameraDescription(name, position, orientation)
         return offset, camera_desc
@@ -1073,44 +967,47 @@ class NatNetClient:
         data_descs = DataDescriptions.DataDescriptions()
         offset = 0
         # # of data sets to process
-        dataset_count = int.from_bytes( data[offset:offset+4], byteorder='little' )
+        dataset_count = NNIntValue.unpack_from( data, offset )[0]
         offset += 4
         trace_dd("Dataset Count : ", str(dataset_count))
         for i in range( 0, dataset_count ):
             trace_dd("Dataset ", str(i))
-            data_type = int.from_bytes( data[offset:offset+4], byteorder='little' )
+            data_type = NNIntValue.unpack_from( data, offset )[0]
             offset += 4
             data_tmp=None
             if data_type == 0 :
                 trace_dd("Type: 0 Markerset")
-                offset_tmp, data_tmp = self.__unpack_marker_set_description( data[offset:], major, minor )
+                offset, data_tmp = self.__unpack_marker_set_description( data, offset, major, minor )
             elif data_type == 1 :
                 trace_dd("Type: 1 Rigid Body")
-                offset_tmp, data_tmp = self.__unpack_rigid_body_description( data[offset:], major, minor )
+                offset, data_tmp = self.__unpack_rigid_body_description( data, offset, major, minor )
             elif data_type == 2 :
                 trace_dd("Type: 2 Skeleton")
-                offset_tmp, data_tmp = self.__unpack_skeleton_description( data[offset:], major, minor )
+                offset, data_tmp = self.__unpack_skeleton_description( data, offset, major, minor )
             elif data_type == 3 :
                 trace_dd("Type: 3 Force Plate")
-                offset_tmp, data_tmp = self.__unpack_force_plate_description(data[offset:], major, minor)
+                offset, data_tmp = self.__unpack_force_plate_description( data, offset, major, minor )
             elif data_type == 4 :
                 trace_dd("Type: 4 Device")
-                offset_tmp, data_tmp = self.__unpack_device_description(data[offset:], major, minor)
+                offset, data_tmp = self.__unpack_device_description( data, offset, major, minor )
             elif data_type == 5 :
                 trace_dd("Type: 5 Camera")
-                offset_tmp, data_tmp = self.__unpack_camera_description(data[offset:], major, minor)
+                offset, data_tmp = self.__unpack_camera_description( data, offset, major, minor )
             else:
                 print("Type: " + str(data_type) + " UNKNOWN")
                 print("ERROR: Type decode failure" )
                 print("\t"+ str(i + 1) +" datasets processed of " + str(dataset_count))
                 print("\t "+ str(offset) +" bytes processed of " + str(packet_size) )
                 print("\tPACKET DECODE STOPPED")
-                return offset
-            offset += offset_tmp
-            data_descs.add_data(data_tmp)
+                return offset, data_descs
+            data_descs.add_data(data_tmp, copy_data=False)
             trace_dd("\t"+ str(i) +" datasets processed of " + str(dataset_count))
             trace_dd("\t "+ str(offset) +" bytes processed of " + str(packet_size) )
 
+        return offset, data_descs
+
+    # Hand a complete set of descriptions to the description listeners
+    def __deliver_data_descriptions( self, data_descs ):
         # If listener provided, return description of each rigid body
         if self.rigid_body_description_listener is not None:
             num_rbs = len(data_descs.rigid_body_list)
@@ -1123,7 +1020,29 @@ class NatNetClient:
             for i in range(num_sks):
                 self.skeleton_description_listener(data_descs.skeleton_list[i].get_description_dict())
 
-        return offset, data_descs
+        # And the complete DataDescriptions object
+        if self.full_description_listener is not None:
+            self.full_description_listener(data_descs)
+
+    def __model_def_cache_key( self ):
+        return self.model_def_cache.key( self.server_ip_address, self.__application_name,
+                                         self.__server_version, [self.get_major(), self.get_minor()] )
+
+    # Deliver the model definitions cached for this server, if nothing newer
+    # has been received yet
+    def __load_cached_model_def( self ):
+        if self.model_def_cache is None or self.__model_def_hash is not None:
+            return
+        cached = self.model_def_cache.load( self.__model_def_cache_key() )
+        if cached is None:
+            return
+        content_hash, payload = cached
+        plan = self.__decode_plan
+        offset, data_descs = self.__unpack_data_descriptions( payload, len(payload), plan.major, plan.minor )
+        self.__model_def_hash = content_hash
+        self.__data_descs = data_descs
+        trace_dd( "Loaded cached model definitions ", content_hash )
+        self.__deliver_data_descriptions( data_descs )
 
     # __unpack_server_info is for local use of the client
     # and will update the values for the versions/ NatNet capabilities
@@ -1156,10 +1075,15 @@ class NatNetClient:
             self.__nat_net_requested_version[1] = self.__nat_net_stream_version_server[1]
             self.__nat_net_requested_version[2] = self.__nat_net_stream_version_server[2]
             self.__nat_net_requested_version[3] = self.__nat_net_stream_version_server[3]
+            self.__update_decode_plan()
             # Determine if the bitstream version can be changed
             if (self.__nat_net_stream_version_server[0] >= 4) and (self.use_multicast == False):
                 self.__can_change_bitstream_version = True
 
+        # Hi-res clock frequency of the server (3.0 and later), used for latencies
+        if packet_size >= offset + 8:
+            self.metrics.clock_frequency = int.from_bytes( data[offset:offset+8], byteorder='little' )
+            offset += 8
 
 
         trace_mf("Sending Application Name: ", self.__application_name)
@@ -1216,7 +1140,7 @@ class NatNetClient:
                             print_level = 1
                         else:
                             print_level = 0
-                message_id = self.__process_message( data , print_level)
+                self.__enqueue_packet( data, message_id, print_level )
 
                 data=bytearray(0)
 
@@ -1227,14 +1151,12 @@ class NatNetClient:
 
     def __data_thread_function( self, in_socket, stop, gprint_level):
         message_id_dict={}
-        data=bytearray(0)
-        # 64k buffer size
-        recv_buffer_size=64*1024
+        packets=[]
 
         while not stop():
-            # Block for input
+            # Block for input, then drain whatever else is pending
             try:
-                data, addr = in_socket.recvfrom( recv_buffer_size )
+                packets = self.__receive_packets( in_socket )
             except socket.error as msg:
                 if not stop():
                     print("ERROR: data socket access error occurred:\n  %s" %msg)
@@ -1249,7 +1171,7 @@ class NatNetClient:
                 #if self.use_multicast:
                 print("ERROR: data socket access timeout occurred. Server not responding")
                 #return 4
-            if len( data ) > 0 :
+            for data, packet_buffer in packets:
                 #peek ahead at message_id
                 message_id = get_message_id(data)
                 tmp_str="mi_%1.1d"%message_id
@@ -1264,15 +1186,127 @@ class NatNetClient:
                             print_level = 1
                         else:
                             print_level = 0
-                message_id = self.__process_message( data , print_level)
+                self.__enqueue_packet( data, message_id, print_level, packet_buffer )
 
-                data=bytearray(0)
+            packets=[]
         return 0
 
+    # Receive up to receive_batch_size datagrams into pooled buffers. Blocks for
+    # the first one only. Returns [(memoryview of the packet, its buffer)].
+    def __receive_packets( self, in_socket ):
+        packets = []
+        flags = 0
+        while len(packets) < self.receive_batch_size:
+            packet_buffer = self.__take_packet_buffer()
+            try:
+                size = in_socket.recv_into( packet_buffer, 0, flags )
+            except BlockingIOError:
+                # nothing left to drain
+                self.__release_packet_buffer( packet_buffer )
+                break
+            except socket.error:
+                self.__release_packet_buffer( packet_buffer )
+                if packets:
+                    # hand over what was received, the error comes back on the next call
+                    break
+                raise
+            if size > 0:
+                packets.append( (memoryview(packet_buffer)[:size], packet_buffer) )
+            else:
+                self.__release_packet_buffer( packet_buffer )
+
+            if DONT_WAIT:
+                flags = DONT_WAIT
+            elif not select.select( [in_socket], [], [], 0 )[0]:
+                break
+        return packets
+
+    def __take_packet_buffer( self ):
+        try:
+            return self.__packet_pool.pop()
+        except IndexError:
+            # pool exhausted (or not filled yet)
+            return bytearray( self.packet_buffer_size )
+
+    def __release_packet_buffer( self, packet_buffer ):
+        if packet_buffer is not None and len(self.__packet_pool) < self.packet_pool_size:
+            self.__packet_pool.append( packet_buffer )
+
+    # Reception only queues the raw packet; decoding happens on the decode thread,
+    # so a slow frame does not keep the socket from being drained.
+    def __enqueue_packet( self, data, message_id, print_level, packet_buffer=None ):
+        arrival_time = time.perf_counter()
+        self.metrics.record_packet( message_id, arrival_time )
+        if self.packet_listener is not None:
+            self.packet_listener( data, arrival_time )
+        if message_id == self.NAT_FRAMEOFDATA:
+            try:
+                self.receive_queue.put_nowait( (data, print_level, packet_buffer) )
+            except queue.Full:
+                self.metrics.record_overflow()
+                self.__release_packet_buffer( packet_buffer )
+                return
+        else:
+            # model defs and command responses are rare, wait for room rather than lose them
+            try:
+                self.receive_queue.put( (data, print_level, packet_buffer), timeout=1.0 )
+            except queue.Full:
+                self.metrics.record_overflow()
+                self.__release_packet_buffer( packet_buffer )
+                return
+        self.metrics.record_queue_depth( self.receive_queue.qsize() )
+
+    # Single decode worker, so packets are processed in the order they arrived
+    def __decode_thread_function( self, stop ):
+        while not stop():
+            try:
+                data, print_level, packet_buffer = self.receive_queue.get( timeout=0.1 )
+            except queue.Empty:
+                continue
+
+            try:
+                self.process_packet( data, print_level )
+            except Exception as error:
+                # a malformed packet or a failing listener must not end decoding
+                self.metrics.record_decode_error( error )
+                print( "ERROR: could not process packet: %r" % error )
+            finally:
+                # listeners are done with the packet, its buffer can be reused
+                self.__release_packet_buffer( packet_buffer )
+        return 0
+
+    # Decode one received packet and call the listeners, recording frame metrics.
+    # Returns the message id.
+    def process_packet( self, data, print_level=0 ):
+        start_time = time.perf_counter()
+        message_id = self.__process_message( data, print_level )
+        decode_time = time.perf_counter() - start_time
+
+        if message_id == self.NAT_FRAMEOFDATA and len(data) >= 8:
+            frame_number = int.from_bytes( data[4:8], byteorder='little' )
+            self.metrics.record_frame( frame_number, decode_time, self.__frame_stamps )
+        return message_id
+
+    # Telemetry: packets received / overflowed, packets per message id, frames
+    # decoded and missing from the frame number sequence (including overflowed
+    # ones), receive rate, queue depth and peak, and p50 / p99 of the decode
+    # time (including listener callbacks) and of the server-side latencies
+    def get_metrics(self):
+        queue_depth = self.receive_queue.qsize() if self.receive_queue is not None else 0
+        return self.metrics.get_data_dict( queue_depth )
+
+    def __update_decode_plan(self):
+        plan = structures.decode_plan(self.get_major(), self.get_minor())
+        if plan is not self.__decode_plan:
+            # descriptions parsed under another version are no reference
+            self.__model_def_hash = None
+        self.__decode_plan = plan
+
     def __process_message( self, data : bytes, print_level=0):
         #return message ID
-        major = self.get_major()
-        minor = self.get_minor()
+        plan = self.__decode_plan
+        major = plan.major
+        minor = plan.minor
 
         trace( "Begin Packet\n-----------------" )
         show_nat_net_version = False
@@ -1291,30 +1325,67 @@ class NatNetClient:
         if message_id == self.NAT_FRAMEOFDATA :
             trace( "Message ID  : %3.1d NAT_FRAMEOFDATA"% message_id )
             trace( "Packet Size : ", packet_size )
-
-            offset_tmp, mocap_data = self.__unpack_mocap_data( data[offset:], packet_size, major, minor )
+            self.__frame_stamps = None
+
+            # one view of the payload for both decoders; slicing it copies nothing
+            payload = memoryview( data )[offset:]
+            if (self.frame_arrays_listener is not None) or (self.flat_frame_listener is not None):
+                offset_tmp, frame_arrays = structures.unpack_mocap_arrays( payload, major, minor,
+                                                                           subscription=self.subscription )
+                if self.frame_arrays_listener is not None:
+                    self.frame_arrays_listener(frame_arrays)
+                if self.flat_frame_listener is not None:
+                    self.flat_frame.update(frame_arrays)
+                    self.flat_frame_listener(self.flat_frame)
+
+            # Only build MoCapData objects if something still consumes them
+            if ((self.frame_arrays_listener is None) and (self.flat_frame_listener is None)) or\
+               (self.new_frame_listener is not None) or\
+               (self.rigid_bodies_frame_listener is not None) or\
+               (self.skeletons_frame_listener is not None) or\
+               (print_level >= 1):
+                offset_tmp, mocap_data = self.__unpack_mocap_data( payload, packet_size, plan )
+                # only render the frame as text when it is actually printed
+                if print_level >= 1:
+                    print("MoCap Frame: %d\n"%(mocap_data.prefix_data.frame_number))
+                    print("%s\n"%mocap_data)
+            if plan.has_stamps:
+                # the suffix ends at offset_tmp, Motive may append more after it:
+                # ... stamp_camera_mid_exposure, stamp_data_received, stamp_transmit (u64), params (i2)
+                self.__frame_stamps = FrameStamps.unpack_from( payload, offset_tmp - FrameStamps.size - 2 )
             offset += offset_tmp
-            # get a string version of the data for output
-            mocap_data_str=mocap_data.get_as_string()
-            if print_level >= 1:
-                print("MoCap Frame: %d\n"%(mocap_data.prefix_data.frame_number))
-                print("%s\n"%mocap_data_str)
 
         elif message_id == self.NAT_MODELDEF :
             trace( "Message ID  : %3.1d NAT_MODELDEF"% message_id )
             trace( "Packet Size : %d"% packet_size )
-            offset_tmp, data_descs = self.__unpack_data_descriptions( data[offset:], packet_size, major, minor)
-            offset += offset_tmp
-            # get a string version of the data for output
-            data_descs_str=data_descs.get_as_string()
+            payload = memoryview( data )[offset:]
+            content_hash = model_def_hash( payload )
+            if content_hash == self.__model_def_hash:
+                # unchanged since the last one parsed or loaded from the cache
+                data_descs = self.__data_descs
+                offset += len( payload )
+            else:
+                offset_tmp, data_descs = self.__unpack_data_descriptions( payload, packet_size, major, minor)
+                offset += offset_tmp
+                self.__model_def_hash = content_hash
+                self.__data_descs = data_descs
+                if self.model_def_cache is not None:
+                    self.model_def_cache.store( self.__model_def_cache_key(), payload, content_hash )
+            self.__deliver_data_descriptions( data_descs )
+            # only render the descriptions as text when they are actually printed
             if print_level>0:
                 print("Data Descriptions:\n")
-                print("%s\n"%(data_descs_str))
+                print("%s\n"%(data_descs))
+            if self.command_response_listener is not None:
+                self.command_response_listener( message_id, data_descs )
 
         elif message_id == self.NAT_SERVERINFO :
             trace( "Message ID  : %3.1d NAT_SERVERINFO"% message_id )
             trace( "Packet Size : ", packet_size )
             offset += self.__unpack_server_info( data[offset:], packet_size, major, minor)
+            if self.command_response_listener is not None:
+                self.command_response_listener( message_id, self.get_server_version() )
+            self.__load_cached_model_def()
 
         elif message_id == self.NAT_RESPONSE :
             trace( "Message ID  : %3.1d NAT_RESPONSE"% message_id )
@@ -1332,10 +1403,15 @@ class NatNetClient:
                         " separator:", separator, " remainder:",remainder )
                 else:
                     trace( "Command response:", message.decode( 'utf-8' ))
+                command_response = message.decode( 'utf-8' )
+            if self.command_response_listener is not None:
+                self.command_response_listener( message_id, command_response )
         elif message_id == self.NAT_UNRECOGNIZED_REQUEST :
             trace( "Message ID  : %3.1d NAT_UNRECOGNIZED_REQUEST: "% message_id )
             trace( "Packet Size : ", packet_size )
             trace( "Received 'Unrecognized request' from server" )
+            if self.command_response_listener is not None:
+                self.command_response_listener( message_id, None )
         elif message_id == self.NAT_MESSAGESTRING :
             trace( "Message ID  : %3.1d NAT_MESSAGESTRING"% message_id)
             trace( "Packet Size : ", packet_size )
@@ -1351,7 +1427,10 @@ class NatNetClient:
         return message_id
 
     def send_request( self, in_socket, command, command_str, address ):
-        # Compose the message in our known message format
+        return in_socket.sendto( self.compose_request( command, command_str ), address )
+
+    # Compose a request packet in our known message format
+    def compose_request( self, command, command_str ):
         packet_size = 0
         if command == self.NAT_REQUEST_MODELDEF or command == self.NAT_REQUEST_FRAMEOFDATA :
             packet_size = 0
@@ -1371,7 +1450,7 @@ class NatNetClient:
         data += command_str.encode( 'utf-8' )
         data += b'\0'
 
-        return in_socket.sendto( data, address )
+        return data
 
     def send_command( self, command_str):
         nTries = 3
@@ -1410,7 +1489,10 @@ class NatNetClient:
         return self.__server_version
 
 
-    def run( self ):
+    # Create the data and command sockets, returns True if successful, False otherwise.
+    # Called by run(); other transports (e.g. asyncio) can call it and drive
+    # the sockets themselves, passing received packets to process_packet().
+    def open_sockets( self ):
         # Create the data socket
         self.data_socket = self.__create_data_socket( self.data_port )
         if self.data_socket is None :
@@ -1423,8 +1505,19 @@ class NatNetClient:
             print( "Could not open command channel" )
             return False
         self.__is_locked = True
+        return True
+
+    def run( self ):
+        if not self.open_sockets():
+            return False
 
         self.stop_threads = False
+        # Create the queue and thread that decode received packets
+        self.receive_queue = queue.Queue( self.receive_queue_size )
+        self.__packet_pool = deque( bytearray( self.packet_buffer_size ) for i in range( self.packet_pool_size ) )
+        self.decode_thread = Thread( target = self.__decode_thread_function, args = (lambda : self.stop_threads, ))
+        self.decode_thread.start()
+
         # Create a separate thread for receiving data packets
         self.data_thread = Thread( target = self.__data_thread_function, args = (self.data_socket, lambda : self.stop_threads, lambda : self.print_level, ))
         self.data_thread.start()
@@ -1449,6 +1542,13 @@ class NatNetClient:
     def shutdown(self):
         print("shutdown called")
         self.stop_threads = True
+        # on Linux closing a socket does not wake a thread blocked in recv,
+        # shutting it down does (it fails with ENOTCONN on UDP, but still wakes)
+        for in_socket in (self.command_socket, self.data_socket):
+            try:
+                in_socket.shutdown( socket.SHUT_RDWR )
+            except OSError:
+                pass
         # closing sockets causes blocking recvfrom to throw
         # an exception and break the loop
         self.command_socket.close()
@@ -1456,4 +1556,5 @@ class NatNetClient:
         # attempt to join the threads back.
         self.command_thread.join()
         self.data_thread.join()
+        self.decode_thread.join()
 
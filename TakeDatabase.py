@@ -0,0 +1,289 @@
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+# Sub-array fields are spread over one column per component
+component_names = {
+    'pos': ('x', 'y', 'z'),
+    'rot': ('x', 'y', 'z', 'w')
+}
+
+# Description tables, filled from DataDescriptions (NAT_MODELDEF)
+description_tables = OrderedDict([
+    ('rigid_body_descriptions',
+     "CREATE TABLE IF NOT EXISTS rigid_body_descriptions ("
+     "id INTEGER PRIMARY KEY, name TEXT, parent_id INTEGER, pos_x REAL, pos_y REAL, pos_z REAL)"),
+    ('skeleton_descriptions',
+     "CREATE TABLE IF NOT EXISTS skeleton_descriptions ("
+     "id INTEGER PRIMARY KEY, name TEXT)"),
+    ('skeleton_bone_descriptions',
+     "CREATE TABLE IF NOT EXISTS skeleton_bone_descriptions ("
+     "skeleton_id INTEGER, id INTEGER, name TEXT, parent_id INTEGER, "
+     "pos_x REAL, pos_y REAL, pos_z REAL, PRIMARY KEY (skeleton_id, id))"),
+    ('marker_set_descriptions',
+     "CREATE TABLE IF NOT EXISTS marker_set_descriptions ("
+     "name TEXT, marker_index INTEGER, marker_name TEXT, PRIMARY KEY (name, marker_index))")
+])
+
+# Indexes created when the take is closed, so they don't slow down inserts
+frame_table_indexes = OrderedDict([
+    ('rigid_bodies', ('id', 'frame_number')),
+    ('skeleton_bones', ('skeleton_id', 'bone_id', 'frame_number')),
+    ('labeled_markers', ('model_id', 'marker_id', 'frame_number'))
+])
+
+
+def sql_type(dtype):
+    if dtype.kind in 'iub':
+        return 'INTEGER'
+    if dtype.kind == 'f':
+        return 'REAL'
+    return 'BLOB'
+
+
+# Record dtype -> [(column name, sql type)], cached per dtype
+_flat_columns = {}
+
+
+def flat_columns(dtype):
+    columns = _flat_columns.get(dtype)
+    if columns is None:
+        columns = []
+        for name in dtype.names:
+            field = dtype[name]
+            if field.shape:
+                base = field.base
+                components = component_names.get(name, range(field.shape[0]))
+                for component in components:
+                    columns.append(('%s_%s' % (name, component), sql_type(base)))
+            else:
+                columns.append((name, sql_type(field)))
+        _flat_columns[dtype] = columns
+    return columns
+
+
+# One list of Python values per flat column of `records`
+def column_values(records):
+    values = []
+    for name in records.dtype.names:
+        field = records[name]
+        if field.ndim > 1:
+            for i in range(field.shape[1]):
+                values.append(field[:, i].tolist())
+        else:
+            values.append(field.tolist())
+    return values
+
+
+# Plain rows for the description tables, so nothing shared with the
+# NatNet thread is touched by the writer thread
+def description_rows(data_descs):
+    rows = OrderedDict((table, []) for table in description_tables)
+    for rigid_body in data_descs.rigid_body_list:
+        rows['rigid_body_descriptions'].append(
+            (rigid_body.id_num, _decode(rigid_body.sz_name), rigid_body.parent_id) + tuple(rigid_body.pos))
+    for skeleton in data_descs.skeleton_list:
+        rows['skeleton_descriptions'].append((skeleton.id_num, _decode(skeleton.name)))
+        for bone in skeleton.rigid_body_description_list:
+            rows['skeleton_bone_descriptions'].append(
+                (skeleton.id_num, bone.id_num, _decode(bone.sz_name), bone.parent_id) + tuple(bone.pos))
+    for marker_set in data_descs.marker_set_list:
+        for i, marker_name in enumerate(marker_set.marker_names_list):
+            rows['marker_set_descriptions'].append(
+                (_decode(marker_set.marker_set_name), i, _decode(marker_name)))
+    return rows
+
+
+def _decode(name):
+    if isinstance(name, bytes):
+        return name.decode('utf-8')
+    return name
+
+
+# SQLite take database. Frames (structures.FrameArrays) are copied on the
+# NatNet data thread and queued; a background writer thread batches them into
+# executemany inserts, one transaction per batch. Tables:
+#   frames                      frame number and suffix (timecode, timestamps, params)
+#   rigid_bodies                one row per rigid body per frame
+#   skeleton_bones              one row per bone per frame
+#   labeled_markers             one row per marker per frame
+#   *_descriptions              asset names and layout from NAT_MODELDEF
+# Tables are only created once an asset type actually shows up.
+class TakeDatabase:
+    def __init__(self, path: str, batch_frames: int = 240, flush_interval: float = 0.5,
+                 max_pending: int = 7200) -> None:
+        self.path = path
+        self.batch_frames = batch_frames
+        self.flush_interval = flush_interval
+
+        # Frames queued, and frames and asset descriptions dropped because the
+        # writer fell max_pending behind
+        self.frame_count = 0
+        self.dropped_frames = 0
+        self.dropped_descriptions = 0
+
+        self.queue = queue.Queue(max_pending)
+        self.error = None
+
+        # table -> list of column names, only touched by the writer thread
+        self.table_columns = {}
+
+        self.writer_thread = threading.Thread(target=self.__writer_thread_function)
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+
+    # Queue one frame for writing. Never blocks; copies everything it keeps.
+    def write_frame(self, frame) -> None:
+        skeletons = [(skeleton_id, bones.copy()) for skeleton_id, bones in frame.skeletons.items()]
+        rigid_bodies = frame.rigid_bodies.copy() if frame.rigid_bodies is not None else None
+        labeled_markers = frame.labeled_markers.copy() if frame.labeled_markers is not None else None
+        suffix = (frame.suffix.dtype, frame.suffix.tolist())
+        self.__put(('frame', (frame.frame_number, suffix, rigid_bodies, skeletons, labeled_markers)))
+
+    # Queue the asset descriptions (DataDescriptions) for writing
+    def write_descriptions(self, data_descs) -> None:
+        self.__put(('descriptions', description_rows(data_descs)))
+
+    def __put(self, item) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            if item[0] == 'frame':
+                self.dropped_frames += 1
+            else:
+                self.dropped_descriptions += 1
+            return
+        if item[0] == 'frame':
+            self.frame_count += 1
+
+    # Write out everything queued, build indexes and close the database
+    def close(self) -> None:
+        if self.writer_thread is not None:
+            # a writer that failed no longer drains the queue
+            while self.writer_thread.is_alive():
+                try:
+                    self.queue.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            self.writer_thread.join()
+            self.writer_thread = None
+        if self.error is not None:
+            raise self.error
+
+    def __writer_thread_function(self) -> None:
+        connection = None
+        try:
+            connection = sqlite3.connect(self.path)
+            running = True
+            while running:
+                batch = [self.queue.get()]
+                while batch[-1] is not None and len(batch) < self.batch_frames:
+                    try:
+                        batch.append(self.queue.get(timeout=self.flush_interval))
+                    except queue.Empty:
+                        break
+                if batch[-1] is None:
+                    batch.pop()
+                    running = False
+                with connection:
+                    self.__write_batch(connection, batch)
+            with connection:
+                self.__create_indexes(connection)
+        except Exception as error:
+            # surfaced by close()
+            self.error = error
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def __write_batch(self, connection, batch) -> None:
+        # table -> (columns, rows)
+        inserts = OrderedDict()
+        for kind, payload in batch:
+            if kind == 'frame':
+                self.__frame_rows(inserts, *payload)
+            else:
+                for table, rows in payload.items():
+                    if rows:
+                        connection.execute(description_tables[table])
+                        placeholders = ', '.join('?' * len(rows[0]))
+                        connection.executemany(
+                            "INSERT OR REPLACE INTO %s VALUES (%s)" % (table, placeholders), rows)
+
+        for table, (columns, rows) in inserts.items():
+            if isinstance(table, tuple):
+                table = table[0]
+            self.__ensure_table(connection, table, columns)
+            statement = "INSERT INTO %s (%s) VALUES (%s)" % (
+                table, ', '.join(name for name, _ in columns), ', '.join('?' * len(columns)))
+            connection.executemany(statement, rows)
+
+    def __frame_rows(self, inserts, frame_number, suffix, rigid_bodies, skeletons, labeled_markers) -> None:
+        suffix_dtype, suffix_values = suffix
+        self.__rows(inserts, 'frames', [('frame_number', 'INTEGER')] + flat_columns(suffix_dtype),
+                    [(frame_number,) + suffix_values])
+
+        if rigid_bodies is not None and len(rigid_bodies):
+            values = column_values(rigid_bodies)
+            self.__rows(inserts, 'rigid_bodies', [('frame_number', 'INTEGER')] + flat_columns(rigid_bodies.dtype),
+                        zip([frame_number] * len(rigid_bodies), *values))
+
+        for skeleton_id, bones in skeletons:
+            if not len(bones):
+                continue
+            # bone ids are packed as (skeleton id << 16) | bone id
+            bone_ids = (bones['id'] & 0xffff).tolist()
+            values = column_values(bones)
+            self.__rows(inserts, 'skeleton_bones',
+                        [('frame_number', 'INTEGER'), ('skeleton_id', 'INTEGER'), ('bone_id', 'INTEGER')]
+                        + flat_columns(bones.dtype),
+                        zip([frame_number] * len(bones), [skeleton_id] * len(bones), bone_ids, *values))
+
+        if labeled_markers is not None and len(labeled_markers):
+            # marker ids are packed as (model id << 16) | marker id
+            model_ids = (labeled_markers['id'] >> 16).tolist()
+            marker_ids = (labeled_markers['id'] & 0xffff).tolist()
+            values = column_values(labeled_markers)
+            self.__rows(inserts, 'labeled_markers',
+                        [('frame_number', 'INTEGER'), ('model_id', 'INTEGER'), ('marker_id', 'INTEGER')]
+                        + flat_columns(labeled_markers.dtype),
+                        zip([frame_number] * len(labeled_markers), model_ids, marker_ids, *values))
+
+    def __rows(self, inserts, table, columns, rows) -> None:
+        pending = inserts.get(table)
+        if pending is not None and pending[0] != columns:
+            # layout changed within the batch (new bitstream version), key by layout
+            table_key = (table, tuple(columns))
+            pending = inserts.get(table_key)
+            if pending is None:
+                pending = inserts[table_key] = (columns, [])
+        elif pending is None:
+            pending = inserts[table] = (columns, [])
+        pending[1].extend(rows)
+
+    # Create a frame table on first use, adding any columns a later layout brings
+    def __ensure_table(self, connection, table, columns) -> None:
+        known = self.table_columns.get(table)
+        if known is None:
+            connection.execute("CREATE TABLE IF NOT EXISTS %s (%s)" % (
+                table, ', '.join('%s %s' % column for column in columns)))
+            known = self.table_columns[table] = [row[1] for row in
+                                                 connection.execute("PRAGMA table_info(%s)" % table)]
+        for name, column_type in columns:
+            if name not in known:
+                connection.execute("ALTER TABLE %s ADD COLUMN %s %s" % (table, name, column_type))
+                known.append(name)
+
+    def __create_indexes(self, connection) -> None:
+        for table, index_columns in frame_table_indexes.items():
+            if table in self.table_columns:
+                connection.execute("CREATE INDEX IF NOT EXISTS %s_index ON %s (%s)" % (
+                    table, table, ', '.join(index_columns)))
+
+
+# Open a take for reading
+def open_take(path: str):
+    return sqlite3.connect(path)
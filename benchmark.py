@@ -0,0 +1,300 @@
+# Imports
+import sys
+import os
+import json
+import time
+import timeit
+import argparse
+import platform
+import subprocess
+import types
+import inspect
+from collections import OrderedDict
+
+import numpy as np
+
+# Get script directory to allow for relative imports
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+
+from Resources.APIs.Official.PythonClient import MoCapData
+from Resources.APIs.Official.PythonClient.NatNetClient import NatNetClient
+
+import structures
+from NatNetSimulator import build_scene, pack_mocap_data, pack_data_descriptions
+from OptiTracker import OptiTracker
+
+
+# Best-of-n time per call, in microseconds
+def time_per_call(func, number=1000, repeat=5):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+# Decode of simulated packets at print_level 0 as it is now, against the same
+# decode plus the text rendering __process_message used to do for every frame
+# and model definition, printed or not ("rendered"). Model definitions are
+# timed with __unpack_data_descriptions, since process_packet skips repeats.
+def bench_frame_rendering():
+    results = OrderedDict()
+    major, minor = 4, 1
+    plan = structures.decode_plan(major, minor)
+    for scene_size in scene_sizes:
+        prefix = '%s v%d.%d ' % (scene_size, major, minor)
+        client = fixture_client(major, minor)
+
+        packet = frame_fixture(scene_size, major, minor)
+        _, mocap_data = client._NatNetClient__unpack_mocap_data(memoryview(packet)[4:], len(packet) - 4, plan)
+        results[prefix + 'process_packet, rendered (us/frame)'] = time_per_call(
+            lambda: (client.process_packet(packet, 0), mocap_data.get_as_string()), number=200)
+        results[prefix + 'process_packet (us/frame)'] = time_per_call(
+            lambda: client.process_packet(packet, 0), number=200)
+
+        data_descs, _ = build_scene(*scene_sizes[scene_size])
+        packet = pack_data_descriptions(data_descs, major, minor)
+        payload = memoryview(packet)[4:]
+        unpack_data_descriptions = client._NatNetClient__unpack_data_descriptions
+        _, data_descs = unpack_data_descriptions(payload, len(packet) - 4, major, minor)
+        results[prefix + '__unpack_data_descriptions, rendered (us/modeldef)'] = time_per_call(
+            lambda: (unpack_data_descriptions(payload, len(packet) - 4, major, minor),
+                     data_descs.get_as_string()), number=200)
+        results[prefix + '__unpack_data_descriptions (us/modeldef)'] = time_per_call(
+            lambda: unpack_data_descriptions(payload, len(packet) - 4, major, minor), number=200)
+    return results
+
+
+# Build a frame the way NatNetClient.__unpack_mocap_data does, either
+# deep-copying every element into its container or handing it over
+def build_frame(copy_data, skeleton_count=3, bone_count=21, rigid_body_count=10, labeled_marker_count=60):
+    pos = (0.1, 0.2, 0.3)
+    rot = (0.0, 0.0, 0.0, 1.0)
+
+    rigid_body_data = MoCapData.RigidBodyData()
+    for rb_num in range(rigid_body_count):
+        rigid_body_data.add_rigid_body(MoCapData.RigidBody(rb_num, pos, rot), copy_data=copy_data)
+
+    skeleton_data = MoCapData.SkeletonData()
+    for skeleton_num in range(skeleton_count):
+        skeleton = MoCapData.Skeleton(skeleton_num)
+        for bone_num in range(bone_count):
+            skeleton.add_rigid_body(MoCapData.RigidBody(bone_num, pos, rot), copy_data=copy_data)
+        skeleton_data.add_skeleton(skeleton, copy_data=copy_data)
+
+    labeled_marker_data = MoCapData.LabeledMarkerData()
+    for marker_num in range(labeled_marker_count):
+        labeled_marker_data.add_labeled_marker(MoCapData.LabeledMarker(marker_num, pos), copy_data=copy_data)
+
+    mocap_data = MoCapData.MoCapData()
+    mocap_data.set_rigid_body_data(rigid_body_data)
+    mocap_data.set_skeleton_data(skeleton_data)
+    mocap_data.set_labeled_marker_data(labeled_marker_data)
+    return mocap_data
+
+
+# Cost of the defensive deep copies in the MoCapData add_* methods
+def bench_frame_construction():
+    results = {
+        'build_frame copy_data=True (us/frame)': time_per_call(lambda: build_frame(True), number=100),
+        'build_frame copy_data=False (us/frame)': time_per_call(lambda: build_frame(False), number=100),
+    }
+    return results
+
+
+# Packet fixtures: scene size -> build_scene arguments
+# (rigid bodies, skeletons, bones per skeleton, markers per asset)
+scene_sizes = OrderedDict([
+    ('1_rigid_body', (1, 0, 0, 3)),
+    ('10_rigid_bodies_2_skeletons', (10, 2, 21, 5)),
+    ('10_skeletons_200_markers', (0, 10, 21, 20)),
+])
+
+# One bitstream version per major version the client handles
+fixture_versions = [(2, 11), (3, 1), (4, 1)]
+
+
+# NAT_FRAMEOFDATA packet of a generated scene
+def frame_fixture(scene_size, major, minor):
+    _, mocap_data = build_scene(*scene_sizes[scene_size])
+    return pack_mocap_data(mocap_data, major, minor)
+
+
+def fixture_client(major, minor, client_class=NatNetClient):
+    client = client_class()
+    client._NatNetClient__nat_net_requested_version = [major, minor, 0, 0]
+    if hasattr(client, '_NatNetClient__update_decode_plan'):
+        client._NatNetClient__update_decode_plan()
+    return client
+
+
+# Per scene size and version: object decode (__unpack_mocap_data), its
+# get_data_dict, array decode (structures.unpack_mocap_arrays), then
+# process_packet with each kind of listener to show the dispatch cost on top
+# of the decode, and what OptiTracker spends storing a frame.
+def bench_frame_pipeline():
+    results = OrderedDict()
+    for scene_size in scene_sizes:
+        for major, minor in fixture_versions:
+            packet = frame_fixture(scene_size, major, minor)
+            payload = memoryview(packet)[4:]
+            packet_size = len(packet) - 4
+            prefix = '%s v%d.%d ' % (scene_size, major, minor)
+
+            client = fixture_client(major, minor)
+            unpack_mocap_data = client._NatNetClient__unpack_mocap_data
+            plan = structures.decode_plan(major, minor)
+            _, mocap_data = unpack_mocap_data(payload, packet_size, plan)
+            _, frame = structures.unpack_mocap_arrays(payload, major, minor)
+
+            results[prefix + '__unpack_mocap_data (us/frame)'] = time_per_call(
+                lambda: unpack_mocap_data(payload, packet_size, plan), number=200)
+            results[prefix + 'get_data_dict (us/frame)'] = time_per_call(mocap_data.get_data_dict, number=200)
+            results[prefix + 'unpack_mocap_arrays (us/frame)'] = time_per_call(
+                lambda: structures.unpack_mocap_arrays(payload, major, minor))
+
+            client.new_frame_listener = lambda data_dict: None
+            results[prefix + 'process_packet new_frame_listener (us/frame)'] = time_per_call(
+                lambda: client.process_packet(packet), number=200)
+            client = fixture_client(major, minor)
+            client.frame_arrays_listener = lambda frame_arrays: None
+            results[prefix + 'process_packet frame_arrays_listener (us/frame)'] = time_per_call(
+                lambda: client.process_packet(packet))
+            client = fixture_client(major, minor)
+            client.flat_frame_listener = lambda flat_frame: None
+            results[prefix + 'process_packet flat_frame_listener (us/frame)'] = time_per_call(
+                lambda: client.process_packet(packet))
+
+            tracker = OptiTracker()
+            results[prefix + 'OptiTracker.get_new_frame_data (us/frame)'] = time_per_call(
+                lambda: tracker.get_new_frame_data(frame))
+    return results
+
+
+# Frames and model definitions dominated by marker sets: many named assets
+# with many markers each, close to the size of a full UDP datagram. Decode
+# time should grow with the bytes in the packet, not with names x packet size.
+large_marker_set_scene = (40, 0, 0, 20, 200)
+
+
+def bench_large_marker_sets():
+    results = OrderedDict()
+    data_descs, mocap_data = build_scene(*large_marker_set_scene)
+    for major, minor in fixture_versions:
+        prefix = 'v%d.%d ' % (major, minor)
+        plan = structures.decode_plan(major, minor)
+        client = fixture_client(major, minor)
+
+        packet = pack_mocap_data(mocap_data, major, minor)
+        payload = memoryview(packet)[4:]
+        unpack_mocap_data = client._NatNetClient__unpack_mocap_data
+        results[prefix + 'frame bytes'] = len(packet)
+        results[prefix + '__unpack_mocap_data (us/frame)'] = time_per_call(
+            lambda: unpack_mocap_data(payload, len(packet) - 4, plan), number=50)
+
+        packet = pack_data_descriptions(data_descs, major, minor)
+        payload = memoryview(packet)[4:]
+        unpack_data_descriptions = client._NatNetClient__unpack_data_descriptions
+        results[prefix + 'modeldef bytes'] = len(packet)
+        results[prefix + '__unpack_data_descriptions (us/modeldef)'] = time_per_call(
+            lambda: unpack_data_descriptions(payload, len(packet) - 4, major, minor), number=50)
+    return results
+
+
+# Path of the client in the repository, for --reference
+NATNET_CLIENT_PATH = 'Resources/APIs/Official/PythonClient/NatNetClient.py'
+
+
+# NatNetClient class as of git revision `revision`, loaded next to the current one
+def reference_client_class(revision):
+    source = subprocess.check_output(['git', 'show', '%s:%s' % (revision, NATNET_CLIENT_PATH)], cwd=SCRIPT_DIR)
+    module = types.ModuleType('NatNetClient_%s' % revision)
+    module.__file__ = os.path.join(SCRIPT_DIR, NATNET_CLIENT_PATH)
+    exec(compile(source, '%s:%s' % (revision, NATNET_CLIENT_PATH), 'exec'), module.__dict__)
+    return module.NatNetClient
+
+
+# bench_large_marker_sets for the client of another revision, e.g. the one
+# before the decoders stopped slicing the packet (data[offset:]) per field.
+# Older __unpack_mocap_data take (major, minor) instead of a decode plan.
+# Payloads are bytes, as older __process_message passed them.
+def bench_reference_decoders(revision):
+    client_class = reference_client_class(revision)
+    results = OrderedDict()
+    data_descs, mocap_data = build_scene(*large_marker_set_scene)
+    for major, minor in fixture_versions:
+        prefix = 'v%d.%d %s ' % (major, minor, revision)
+        client = fixture_client(major, minor, client_class)
+        unpack_mocap_data = client._NatNetClient__unpack_mocap_data
+        if 'plan' in inspect.signature(unpack_mocap_data).parameters:
+            version = (structures.decode_plan(major, minor),)
+        else:
+            version = (major, minor)
+
+        packet = pack_mocap_data(mocap_data, major, minor)
+        payload = packet[4:]
+        results[prefix + '__unpack_mocap_data (us/frame)'] = time_per_call(
+            lambda: unpack_mocap_data(payload, len(packet) - 4, *version), number=50)
+
+        packet = pack_data_descriptions(data_descs, major, minor)
+        payload = packet[4:]
+        unpack_data_descriptions = client._NatNetClient__unpack_data_descriptions
+        results[prefix + '__unpack_data_descriptions (us/modeldef)'] = time_per_call(
+            lambda: unpack_data_descriptions(payload, len(packet) - 4, major, minor), number=50)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=SCRIPT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Print how each result changed against a previous run's JSON
+def compare(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+    for bench, values in results.items():
+        print(bench)
+        for name, value in values.items():
+            old = baseline.get(bench, {}).get(name)
+            if old:
+                print("  %-70s %10.2f %10.2f %+7.1f%%" % (name, old, value, 100.0 * (value - old) / old))
+            else:
+                print("  %-70s %10s %10.2f" % (name, '-', value))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode, dispatch and storage benchmarks")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="JSON file of a previous run to compare against")
+    parser.add_argument('--reference', metavar='REVISION',
+                        help="also time the large marker set decoders of NatNetClient.py at this git revision")
+    args = parser.parse_args()
+
+    benches = [bench_frame_rendering, bench_frame_construction, bench_frame_pipeline, bench_large_marker_sets]
+
+    results = OrderedDict()
+    for bench in benches:
+        results[bench.__name__] = bench()
+    if args.reference:
+        results['bench_reference_decoders'] = bench_reference_decoders(args.reference)
+
+    if args.compare:
+        compare(results, args.compare)
+    else:
+        for bench, values in results.items():
+            print(bench)
+            for name, value in values.items():
+                print("  %-70s %10.2f" % (name, value))
+
+    if args.output:
+        run = OrderedDict()
+        run['commit'] = git_commit()
+        run['date'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        run['python'] = platform.python_version()
+        run['numpy'] = np.__version__
+        run['platform'] = platform.platform()
+        run['results'] = results
+        with open(args.output, 'w') as output_file:
+            json.dump(run, output_file, indent=2)
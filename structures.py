@@ -1,13 +1,497 @@
+import struct
+from collections import OrderedDict
+
 import numpy as np
 
-rb_marker_struct = np.dtype([
-    ('marker_name', 'S256')
-])
+# Record layouts of the fixed-size blocks inside a NAT_FRAMEOFDATA packet.
+# All of them are little endian and packed, so they can be viewed directly
+# out of the receive buffer with np.frombuffer.
+
+# Max bytes searched for the NUL terminator of a name before giving up
+MAX_NAME_LENGTH = 256
+
+Count = struct.Struct('<i')
+
+
+# Record dtypes per (kind, major, minor), so they are only built once
+_record_dtypes = {}
+
+
+# Rigid body record; also used for skeleton bones.
+# Fields mirror the version checks in DecodePlan.
+def rigid_body_struct(major, minor):
+    dtype = _record_dtypes.get(('rigid_body', major, minor))
+    if dtype is not None:
+        return dtype
+    fields = [
+        ('id', '<u4'),
+        ('pos', '<f4', (3,)),
+        ('rot', '<f4', (4,))
+    ]
+    if major >= 2:
+        fields.append(('error', '<f4'))
+    if ((major == 2) and (minor >= 6)) or major > 2:
+        fields.append(('params', '<i2'))
+    dtype = _record_dtypes[('rigid_body', major, minor)] = np.dtype(fields)
+    return dtype
+
+
+# Labeled marker record (version 2.3 and later)
+def labeled_marker_struct(major, minor):
+    dtype = _record_dtypes.get(('labeled_marker', major, minor))
+    if dtype is not None:
+        return dtype
+    fields = [
+        ('id', '<u4'),
+        ('pos', '<f4', (3,)),
+        ('size', '<f4')
+    ]
+    if ((major == 2) and (minor >= 6)) or major > 2:
+        fields.append(('param', '<i2'))
+    if major >= 3:
+        fields.append(('residual', '<f4'))
+    dtype = _record_dtypes[('labeled_marker', major, minor)] = np.dtype(fields)
+    return dtype
+
+
+# Frame suffix (timecode, timestamps and frame parameters)
+def frame_suffix_struct(major, minor):
+    dtype = _record_dtypes.get(('suffix', major, minor))
+    if dtype is not None:
+        return dtype
+    fields = [
+        ('timecode', '<u4'),
+        ('timecode_sub', '<u4')
+    ]
+    # Timestamp increased to double precision in 2.7
+    if ((major == 2) and (minor >= 7)) or major > 2:
+        fields.append(('timestamp', '<f8'))
+    else:
+        fields.append(('timestamp', '<f4'))
+    if major >= 3:
+        fields.append(('stamp_camera_mid_exposure', '<u8'))
+        fields.append(('stamp_data_received', '<u8'))
+        fields.append(('stamp_transmit', '<u8'))
+    fields.append(('param', '<i2'))
+    dtype = _record_dtypes[('suffix', major, minor)] = np.dtype(fields)
+    return dtype
+
+
+# Pre-3.0 rigid bodies carry their marker data inline, so their records
+# are variable length and cannot be viewed with a fixed dtype.
+def has_fixed_rigid_body_records(major):
+    return (major >= 3) or (major == 0)
+
+
+# Struct formats and section flags for decoding the frames of one bitstream
+# version record by record (NatNetClient.__unpack_mocap_data), worked out once
+# so the per-record path has no version checks. Fields a version lacks are
+# filled in from the *_padding tuples, so records always unpack to the same shape:
+#   rigid body      id, x, y, z, qx, qy, qz, qw, error, params
+#   labeled marker  id, x, y, z, size, param, residual
+class DecodePlan:
+    def __init__(self, major, minor):
+        self.major = major
+        self.minor = minor
+
+        # Sections present in a frame
+        self.has_skeletons = ((major == 2) and (minor > 0)) or major > 2
+        self.has_labeled_markers = ((major == 2) and (minor > 3)) or major > 2
+        self.has_force_plates = ((major == 2) and (minor >= 9)) or major > 2
+        self.has_devices = ((major == 2) and (minor >= 11)) or major > 2
+
+        # Rigid bodies: one fixed record, or before 3.0 a pose, the markers
+        # (with ids and sizes from 2.0) and then the error / params tail
+        has_error = major >= 2
+        has_params = ((major == 2) and (minor >= 6)) or major > 2
+        tail = ('f' if has_error else '') + ('h' if has_params else '')
+        self.fixed_rigid_bodies = has_fixed_rigid_body_records(major)
+        self.rigid_body = struct.Struct('<I3f4f' + tail)
+        self.rigid_body_pose = struct.Struct('<I3f4f')
+        self.rigid_body_tail = struct.Struct('<' + tail)
+        self.rigid_body_padding = ((0.0,) if not has_error else ()) + ((0,) if not has_params else ())
+        self.marker_ids_and_sizes = major >= 2
+
+        has_residual = major >= 3
+        self.labeled_marker = struct.Struct(
+            '<I3ff' + ('h' if has_params else '') + ('f' if has_residual else ''))
+        self.labeled_marker_padding = ((0,) if not has_params else ()) + ((0.0,) if not has_residual else ())
+
+        # Suffix: timecode, timecode sub, timestamp (double from 2.7),
+        # hi-res stamps (3.0 and later), params
+        self.has_stamps = major >= 3
+        self.suffix = struct.Struct(
+            '<II' + ('d' if ((major == 2) and (minor >= 7)) or major > 2 else 'f')
+            + ('QQQ' if self.has_stamps else '') + 'h')
+
+
+_decode_plans = {}
+
+
+# Cached DecodePlan for a bitstream version
+def decode_plan(major, minor):
+    plan = _decode_plans.get((major, minor))
+    if plan is None:
+        plan = _decode_plans[(major, minor)] = DecodePlan(major, minor)
+    return plan
+
+
+def read_count(data, offset):
+    return Count.unpack_from(data, offset)[0]
+
+
+# Read a NUL terminated name, searching at most MAX_NAME_LENGTH bytes at a time
+def read_name(data, offset):
+    end = len(data)
+    start = offset
+    while start < end:
+        window = bytes(data[start:min(start + MAX_NAME_LENGTH, end)])
+        nul = window.find(b'\0')
+        if nul >= 0:
+            name_end = start + nul
+            return bytes(data[offset:name_end]), name_end + 1
+        start += len(window)
+    return bytes(data[offset:end]), end
+
+
+# Work out the byte layout of a frame (everything after the message header)
+# from the counts embedded in it, without decoding any records.
+# Returns an OrderedDict of section -> offsets / counts. layout['structure']
+# lists the (start, end) byte spans of every count, id and name read: frames
+# that match in those bytes share the same layout.
+def frame_layout(data, major, minor):
+    layout = OrderedDict()
+    structure = []
+    offset = 0
+
+    # Frame prefix
+    layout['frame_number'] = offset
+    offset += 4
+
+    # Marker sets: name, count, count * xyz
+    marker_sets = []
+    marker_set_count = _read_structure_count(data, offset, structure)
+    offset += 4
+    for _ in range(marker_set_count):
+        name_offset = offset
+        name, offset = read_name(data, offset)
+        structure.append((name_offset, offset))
+        marker_count = _read_structure_count(data, offset, structure)
+        offset += 4
+        marker_sets.append((name, offset, marker_count))
+        offset += 12 * marker_count
+    layout['marker_sets'] = marker_sets
+
+    # Unlabeled markers
+    unlabeled_count = _read_structure_count(data, offset, structure)
+    offset += 4
+    layout['unlabeled_markers'] = (offset, unlabeled_count)
+    offset += 12 * unlabeled_count
+
+    # Rigid bodies
+    rb_size = rigid_body_struct(major, minor).itemsize
+    rigid_body_count = _read_structure_count(data, offset, structure)
+    offset += 4
+    if has_fixed_rigid_body_records(major):
+        layout['rigid_bodies'] = (offset, rigid_body_count)
+        offset += rb_size * rigid_body_count
+    else:
+        rb_offsets = []
+        for _ in range(rigid_body_count):
+            rb_offsets.append(offset)
+            offset = _skip_legacy_rigid_body(data, offset, major, minor, structure)
+        layout['rigid_bodies'] = (rb_offsets, rigid_body_count)
+
+    # Skeletons (version 2.1 and later): id, bone count, bones
+    skeletons = []
+    if ((major == 2) and (minor > 0)) or major > 2:
+        skeleton_count = _read_structure_count(data, offset, structure)
+        offset += 4
+        for _ in range(skeleton_count):
+            skeleton_id = _read_structure_count(data, offset, structure)
+            bone_count = _read_structure_count(data, offset + 4, structure)
+            offset += 8
+            if has_fixed_rigid_body_records(major):
+                skeletons.append((skeleton_id, offset, bone_count))
+                offset += rb_size * bone_count
+            else:
+                bone_offsets = []
+                for _ in range(bone_count):
+                    bone_offsets.append(offset)
+                    offset = _skip_legacy_rigid_body(data, offset, major, minor, structure)
+                skeletons.append((skeleton_id, bone_offsets, bone_count))
+    layout['skeletons'] = skeletons
+
+    # Labeled markers (version 2.3 and later)
+    labeled_marker_count = 0
+    lm_offset = offset
+    if ((major == 2) and (minor > 3)) or major > 2:
+        labeled_marker_count = _read_structure_count(data, offset, structure)
+        offset += 4
+        lm_offset = offset
+        offset += labeled_marker_struct(major, minor).itemsize * labeled_marker_count
+    layout['labeled_markers'] = (lm_offset, labeled_marker_count)
+
+    # Force plates (version 2.9 and later)
+    force_plates = []
+    if ((major == 2) and (minor >= 9)) or major > 2:
+        offset = _channel_blocks(data, offset, force_plates, structure)
+    layout['force_plates'] = force_plates
+
+    # Devices (version 2.11 and later)
+    devices = []
+    if ((major == 2) and (minor >= 11)) or major > 2:
+        offset = _channel_blocks(data, offset, devices, structure)
+    layout['devices'] = devices
+
+    layout['suffix'] = offset
+    offset += frame_suffix_struct(major, minor).itemsize
+    layout['size'] = offset
+    layout['structure'] = structure
+    return layout
+
+
+# Read a count (or id) that determines the layout, noting where it was
+def _read_structure_count(data, offset, structure):
+    structure.append((offset, offset + 4))
+    return read_count(data, offset)
+
+
+# Force plate and device sections share the same shape:
+# count, then per item an id, channel count and per channel a frame count + floats
+def _channel_blocks(data, offset, out_list, structure):
+    item_count = _read_structure_count(data, offset, structure)
+    offset += 4
+    for _ in range(item_count):
+        item_id = _read_structure_count(data, offset, structure)
+        channel_count = _read_structure_count(data, offset + 4, structure)
+        offset += 8
+        channels = []
+        for _ in range(channel_count):
+            frame_count = _read_structure_count(data, offset, structure)
+            offset += 4
+            channels.append((offset, frame_count))
+            offset += 4 * frame_count
+        out_list.append((item_id, channels))
+    return offset
+
+
+def _skip_legacy_rigid_body(data, offset, major, minor, structure):
+    offset += 32  # id + pos + rot
+    if major < 3:
+        marker_count = _read_structure_count(data, offset, structure)
+        offset += 4 + 12 * marker_count
+        if major >= 2:
+            offset += 8 * marker_count  # marker ids and sizes
+    if major >= 2:
+        offset += 4
+    if ((major == 2) and (minor >= 6)) or major > 2:
+        offset += 2
+    return offset
+
+
+# Gather pre-3.0 rigid bodies into the fixed record layout (this copies).
+# Their markers sit between the pose and the error, so every record is two
+# byte ranges; the marker counts give where the second starts, and the bytes
+# of all records are gathered in one pass.
+def _gather_legacy_rigid_bodies(data, rb_offsets, major, minor):
+    dtype = rigid_body_struct(major, minor)
+    if len(rb_offsets) == 0:
+        return np.zeros(0, dtype=dtype)
+    buffer = np.frombuffer(data, np.uint8)
+    starts = np.array(rb_offsets, dtype=np.int64)
+
+    tails = starts + 32   # id + pos + rot
+    marker_counts = buffer[tails[:, None] + _count_columns].view('<u4')[:, 0].astype(np.int64)
+    marker_size = 12
+    if major >= 2:
+        marker_size += 8  # marker ids and sizes
+    tails += 4 + marker_size * marker_counts
+
+    columns = np.concatenate(
+        (starts[:, None] + _pose_columns, tails[:, None] + _tail_columns[:dtype.itemsize - 32]), axis=1)
+    return buffer[columns].view(dtype)[:, 0]
+
+
+_count_columns = np.arange(4)
+_pose_columns = np.arange(32)
+_tail_columns = np.arange(6)   # error, params
+
+
+# Subscribe to every asset of a type
+ALL = 'all'
+
+
+# Which sections of a frame unpack_mocap_arrays materializes. Per asset type:
+#   ALL          every asset
+#   collection   only these ids (names for marker sets, model ids for labeled markers)
+#   None         skip the section; its offsets are still computed to find the next one
+# skeletons may also be a dict of skeleton id -> bone ids (or ALL), e.g. to get
+# only the hand bones of one skeleton.
+class Subscription:
+    def __init__(self, marker_sets=ALL, unlabeled_markers=True, rigid_bodies=ALL, skeletons=ALL,
+                 labeled_markers=ALL, force_plates=ALL, devices=ALL):
+        self.marker_sets = _selection(marker_sets, set)
+        self.unlabeled_markers = unlabeled_markers
+        self.rigid_bodies = _selection(rigid_bodies, _id_array)
+        if isinstance(skeletons, dict):
+            self.skeletons = OrderedDict(
+                (int(skeleton_id), _selection(bones, _id_array)) for skeleton_id, bones in skeletons.items())
+        else:
+            self.skeletons = _selection(
+                skeletons, lambda skeleton_ids: OrderedDict((int(skeleton_id), ALL) for skeleton_id in skeleton_ids))
+        self.labeled_markers = _selection(labeled_markers, _id_array)
+        self.force_plates = _selection(force_plates, set)
+        self.devices = _selection(devices, set)
+
+
+def _selection(ids, convert):
+    if ids is None:
+        return None
+    if isinstance(ids, str) and ids == ALL:
+        return ALL
+    return convert(ids)
+
+
+def _id_array(ids):
+    return np.array(sorted(ids), dtype=np.uint32)
+
+
+# Records whose id, shifted right by `shift` and masked to 16 bits if
+# `mask` is set, is in `ids` (ALL keeps everything)
+def _select(records, ids, shift=0, mask=False):
+    if ids is ALL:
+        return records
+    keys = records['id']
+    if shift:
+        keys = keys >> shift
+    if mask:
+        keys = keys & 0xffff
+    # broadcast compare, much cheaper than np.isin for a handful of ids
+    return records[(keys[:, None] == ids).any(axis=1)]
+
+
+# Decoded frame whose arrays are views into the packet buffer
+class FrameArrays:
+    def __init__(self, frame_number):
+        self.frame_number = frame_number
+        self.marker_sets = OrderedDict()    # name -> (n, 3) float32
+        self.unlabeled_markers = None       # (n, 3) float32
+        self.rigid_bodies = None            # rigid_body_struct records
+        self.skeletons = OrderedDict()      # skeleton id -> rigid_body_struct records
+        self.labeled_markers = None         # labeled_marker_struct records
+        self.force_plates = OrderedDict()   # id -> list of float32 channel arrays
+        self.devices = OrderedDict()        # id -> list of float32 channel arrays
+        self.suffix = None                  # frame_suffix_struct record
+
+    @property
+    def timestamp(self):
+        return float(self.suffix['timestamp'])
+
+    @property
+    def tracked_models_changed(self):
+        return (int(self.suffix['param']) & 0x02) != 0
+
+    def get_data_dict(self):
+        data = OrderedDict()
+        data['frame_number'] = self.frame_number
+        data['marker_sets'] = self.marker_sets
+        data['unlabeled_markers'] = self.unlabeled_markers
+        data['rigid_bodies'] = self.rigid_bodies
+        data['skeletons'] = self.skeletons
+        data['labeled_markers'] = self.labeled_markers
+        data['force_plates'] = self.force_plates
+        data['devices'] = self.devices
+        data['suffix'] = self.suffix
+
+        return data
+
+    # Copy that no longer refers to the packet buffer
+    def copy(self):
+        frame = FrameArrays(self.frame_number)
+        frame.marker_sets = OrderedDict((name, markers.copy()) for name, markers in self.marker_sets.items())
+        frame.unlabeled_markers = _copy(self.unlabeled_markers)
+        frame.rigid_bodies = _copy(self.rigid_bodies)
+        frame.skeletons = OrderedDict((skeleton_id, bones.copy()) for skeleton_id, bones in self.skeletons.items())
+        frame.labeled_markers = _copy(self.labeled_markers)
+        frame.force_plates = OrderedDict(
+            (plate_id, [channel.copy() for channel in channels]) for plate_id, channels in self.force_plates.items())
+        frame.devices = OrderedDict(
+            (device_id, [channel.copy() for channel in channels]) for device_id, channels in self.devices.items())
+        frame.suffix = _copy(self.suffix)
+        return frame
+
+
+def _copy(array):
+    return array.copy() if array is not None else None
+
+
+# Decode a NAT_FRAMEOFDATA payload (message header already stripped) into
+# NumPy structured arrays. Apart from pre-3.0 rigid bodies and id-filtered
+# subscriptions, every array is a view into `data`, so it is only valid as
+# long as that buffer is. Sections not in `subscription` are left empty.
+# Returns (bytes consumed, FrameArrays).
+def unpack_mocap_arrays(data, major, minor, layout=None, subscription=None):
+    if layout is None:
+        layout = frame_layout(data, major, minor)
+    if subscription is None:
+        subscription = _subscribe_all
+
+    frame = FrameArrays(read_count(data, layout['frame_number']))
+
+    if subscription.marker_sets is not None:
+        for name, offset, count in layout['marker_sets']:
+            name = name.decode('utf-8')
+            if subscription.marker_sets is ALL or name in subscription.marker_sets:
+                frame.marker_sets[name] = np.frombuffer(data, '<f4', 3 * count, offset).reshape(count, 3)
+
+    if subscription.unlabeled_markers:
+        offset, count = layout['unlabeled_markers']
+        frame.unlabeled_markers = np.frombuffer(data, '<f4', 3 * count, offset).reshape(count, 3)
+
+    rb_dtype = rigid_body_struct(major, minor)
+    if subscription.rigid_bodies is not None:
+        offset, count = layout['rigid_bodies']
+        if has_fixed_rigid_body_records(major):
+            rigid_bodies = np.frombuffer(data, rb_dtype, count, offset)
+        else:
+            rigid_bodies = _gather_legacy_rigid_bodies(data, offset, major, minor)
+        frame.rigid_bodies = _select(rigid_bodies, subscription.rigid_bodies)
+
+    if subscription.skeletons is not None:
+        for skeleton_id, offset, count in layout['skeletons']:
+            if subscription.skeletons is ALL:
+                bone_ids = ALL
+            else:
+                bone_ids = subscription.skeletons.get(skeleton_id)
+                if bone_ids is None:
+                    continue
+            if has_fixed_rigid_body_records(major):
+                bones = np.frombuffer(data, rb_dtype, count, offset)
+            else:
+                bones = _gather_legacy_rigid_bodies(data, offset, major, minor)
+            # bone ids are packed as (skeleton id << 16) | bone id
+            frame.skeletons[skeleton_id] = _select(bones, bone_ids, mask=True)
+
+    if subscription.labeled_markers is not None:
+        offset, count = layout['labeled_markers']
+        labeled_markers = np.frombuffer(data, labeled_marker_struct(major, minor), count, offset)
+        # marker ids are packed as (model id << 16) | marker id
+        frame.labeled_markers = _select(labeled_markers, subscription.labeled_markers, shift=16)
+
+    if subscription.force_plates is not None:
+        for item_id, channels in layout['force_plates']:
+            if subscription.force_plates is ALL or item_id in subscription.force_plates:
+                frame.force_plates[item_id] = [np.frombuffer(data, '<f4', n, o) for o, n in channels]
+
+    if subscription.devices is not None:
+        for item_id, channels in layout['devices']:
+            if subscription.devices is ALL or item_id in subscription.devices:
+                frame.devices[item_id] = [np.frombuffer(data, '<f4', n, o) for o, n in channels]
+
+    frame.suffix = np.frombuffer(data, frame_suffix_struct(major, minor), 1, layout['suffix'])[0]
 
+    return layout['size'], frame
 
-skeleton_struct = np.dtype([
-    ('szName', 'S20'),
-    ("skeletonID", 'i32'),
-    ()
 
-])
\ No newline at end of file
+_subscribe_all = Subscription()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the modules at the repository root, as the scripts there do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
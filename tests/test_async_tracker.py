@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from AsyncOptiTracker import AsyncOptiTracker
+from FrameBuffer import REJECT_NEWEST
+from NatNetSimulator import build_scene, FrameTemplate, pack_server_info, NatNetSimulator
+from OptiTracker import OptiTracker
+
+
+def frame_packets(numbers, version=(4, 1)):
+    _, mocap_data = build_scene(2, 1, 5, 3, 0)
+    template = FrameTemplate(mocap_data, *version)
+    return [bytes(template.frame(number, number / 120.0)) for number in numbers]
+
+
+def tracker(**kwargs):
+    tracker = AsyncOptiTracker(**kwargs)
+    tracker.client.process_packet(pack_server_info("Motive", (3, 1, 0, 0), (4, 1, 0, 0), 1000000000))
+    return tracker
+
+
+# Feed packets through the client on the loop, one per loop iteration
+async def feed(tracker, packets):
+    for packet in packets:
+        await asyncio.sleep(0)
+        tracker.client.process_packet(packet)
+
+
+def test_record_frames_returns_once_frames_arrived():
+    async def main():
+        optitracker = tracker()
+        recording = asyncio.ensure_future(optitracker.record(frames=3))
+        await feed(optitracker, frame_packets(range(10, 16)))
+        return await asyncio.wait_for(recording, 1.0)
+
+    captured = asyncio.run(main())
+    assert list(captured['frame_number']) == [10, 11, 12]
+    assert captured['rigid_bodies_count'].tolist() == [2, 2, 2]
+
+
+def test_record_duration_returns_frames_fed_meanwhile():
+    async def main():
+        optitracker = tracker()
+        recording = asyncio.ensure_future(optitracker.record(duration=0.2))
+        await feed(optitracker, frame_packets(range(5)))
+        return await recording
+
+    assert list(asyncio.run(main())['frame_number']) == [0, 1, 2, 3, 4]
+
+
+def test_record_frames_on_full_reject_buffer_returns():
+    async def main():
+        optitracker = tracker(buffer_capacity=2, eviction=REJECT_NEWEST)
+        await feed(optitracker, frame_packets(range(2)))
+        recording = asyncio.ensure_future(optitracker.record(frames=2))
+        await feed(optitracker, frame_packets(range(2, 4)))
+        return await asyncio.wait_for(recording, 1.0)
+
+    assert len(asyncio.run(main())['frame_number']) == 0
+
+
+def test_record_needs_duration_or_frames():
+    with pytest.raises(ValueError):
+        asyncio.run(tracker().record())
+
+
+@pytest.fixture
+def simulator():
+    simulator = NatNetSimulator((4, 1), 240.0, use_multicast=False, command_port=0)
+    simulator.start()
+    yield simulator
+    simulator.stop()
+
+
+def test_frames_from_server_on_a_new_loop(simulator):
+    optitracker = AsyncOptiTracker()
+    optitracker.client.set_use_multicast(False)
+    optitracker.client.command_port = simulator.command_port
+    assert optitracker.async_client.frame_queue is None
+
+    async def main():
+        await optitracker.start_client()
+        try:
+            data_descs = await optitracker.request_model_def_async()
+            numbers = []
+            frames = optitracker.frames()
+            async for frame in frames:
+                numbers.append(frame.frame_number)
+                if len(numbers) == 5:
+                    break
+            await frames.aclose()
+            return data_descs, numbers
+        finally:
+            await optitracker.stop_client()
+
+    # a loop that did not exist when the tracker was built
+    data_descs, numbers = asyncio.run(main())
+    assert len(data_descs.rigid_body_list) == 2
+    assert numbers == sorted(numbers) and len(numbers) == 5
+
+
+def test_request_model_def_is_not_overridden():
+    assert AsyncOptiTracker.request_model_def is OptiTracker.request_model_def
@@ -0,0 +1,83 @@
+import pytest
+
+import structures
+from Resources.APIs.Official.PythonClient.NatNetClient import NatNetClient
+from NatNetSimulator import build_scene, FrameTemplate, pack_data_descriptions, pack_server_info
+
+
+def server_info(version):
+    return pack_server_info("Motive", (3, 1, 0, 0), tuple(version) + (0, 0), 1000000000)
+
+
+def test_plans_are_cached_per_version():
+    assert structures.decode_plan(3, 1) is structures.decode_plan(3, 1)
+    assert structures.decode_plan(3, 1) is not structures.decode_plan(3, 0)
+
+
+@pytest.mark.parametrize('version, sections', [
+    ((2, 0), (False, False, False, False)),
+    ((2, 5), (True, True, False, False)),
+    ((2, 9), (True, True, True, False)),
+    ((2, 11), (True, True, True, True)),
+    ((3, 0), (True, True, True, True)),
+])
+def test_plan_sections(version, sections):
+    plan = structures.decode_plan(*version)
+    assert (plan.has_skeletons, plan.has_labeled_markers, plan.has_force_plates, plan.has_devices) == sections
+
+
+@pytest.mark.parametrize('version', [(2, 5), (2, 11), (3, 1), (4, 1)])
+def test_plan_matches_record_dtypes(version):
+    plan = structures.decode_plan(*version)
+    assert plan.suffix.size == structures.frame_suffix_struct(*version).itemsize
+    assert plan.labeled_marker.size == structures.labeled_marker_struct(*version).itemsize
+    if plan.fixed_rigid_bodies:
+        assert plan.rigid_body.size == structures.rigid_body_struct(*version).itemsize
+    assert plan.has_stamps == (version[0] >= 3)
+
+
+# What set_nat_net_version does once the server accepted a Bitstream command
+def switch_version(client, version):
+    client._NatNetClient__nat_net_requested_version = list(version) + [0, 0]
+    client._NatNetClient__update_decode_plan()
+
+
+# The bitstream version changes between frames: later frames are decoded
+# with the new layout, by both decoders
+def test_version_change_mid_stream():
+    _, mocap_data = build_scene(2, 1, 5, 3, 0)
+    client = NatNetClient()
+    frames = []
+    objects = []
+    client.frame_arrays_listener = lambda frame: frames.append(frame.copy())
+    client.new_frame_listener = objects.append
+
+    client.process_packet(server_info((4, 1)))
+    for frame_number, version in enumerate([(4, 1), (3, 1), (2, 11), (4, 0)]):
+        switch_version(client, version)
+        packet = bytes(FrameTemplate(mocap_data, *version).frame(frame_number, frame_number / 120.0))
+        client.process_packet(packet)
+        assert frames[-1].frame_number == frame_number
+        assert frames[-1].rigid_bodies.dtype == structures.rigid_body_struct(*version)
+        assert list(frames[-1].rigid_bodies['id']) == [1, 2]
+        assert len(objects[-1]['rigid_body_data']) == 2
+
+
+def test_model_definitions_parsed_again_after_version_change():
+    data_descs, _ = build_scene(2, 1, 5, 3, 0)
+    client = NatNetClient()
+    received = []
+    client.full_description_listener = received.append
+
+    client.process_packet(server_info((4, 1)))
+    packet = pack_data_descriptions(data_descs, 4, 1)
+    client.process_packet(packet)
+    client.process_packet(packet)
+    # unchanged descriptions are not parsed twice
+    assert received[0] is received[1]
+
+    switch_version(client, (3, 1))
+    client.process_packet(pack_data_descriptions(data_descs, 3, 1))
+    assert received[2] is not received[1]
+    assert len(received[2].rigid_body_list) == 2
+    assert len(received[2].skeleton_list) == 1
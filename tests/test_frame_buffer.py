@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+import structures
+from FrameBuffer import FrameBuffer, EVICT_OLDEST, REJECT_NEWEST
+from NatNetSimulator import build_scene, FrameTemplate
+
+
+def frames(numbers, version=(4, 1), rigid_body_count=2, bone_count=5):
+    _, mocap_data = build_scene(rigid_body_count, 1, bone_count, 3, 0)
+    template = FrameTemplate(mocap_data, *version)
+    for number in numbers:
+        packet = bytes(template.frame(number, number / 120.0))
+        yield structures.unpack_mocap_arrays(memoryview(packet)[4:], *version)[1]
+
+
+def filled(capacity, numbers, eviction=EVICT_OLDEST, **kwargs):
+    frame_buffer = FrameBuffer(capacity, eviction)
+    for frame in frames(numbers, **kwargs):
+        frame_buffer.append(frame)
+    return frame_buffer
+
+
+def test_evict_oldest_keeps_latest_frames():
+    frame_buffer = filled(4, range(10))
+    assert len(frame_buffer) == 4
+    assert (frame_buffer.appended, frame_buffer.evicted, frame_buffer.received) == (10, 6, 10)
+    assert list(frame_buffer.latest()['frame_number']) == [6, 7, 8, 9]
+    assert list(frame_buffer.latest(2)['frame_number']) == [8, 9]
+
+
+def test_reject_newest_keeps_first_frames():
+    frame_buffer = FrameBuffer(4, REJECT_NEWEST)
+    stored = [frame_buffer.append(frame) for frame in frames(range(6))]
+    assert stored == [True] * 4 + [False] * 2
+    assert (frame_buffer.appended, frame_buffer.evicted, frame_buffer.received) == (4, 2, 6)
+    assert list(frame_buffer.latest()['frame_number']) == [0, 1, 2, 3]
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        FrameBuffer(0)
+    with pytest.raises(ValueError):
+        FrameBuffer(4, 'drop')
+
+
+def test_latest_frames_are_contiguous_views():
+    frame_buffer = filled(4, range(7))
+    latest = frame_buffer.latest()
+    assert latest['rigid_bodies'].shape == (4, 2)
+    assert np.shares_memory(latest['rigid_bodies'], frame_buffer.records['rigid_bodies'])
+    assert list(latest['rigid_bodies_count']) == [2, 2, 2, 2]
+    # all bones of a frame share one row
+    assert latest['skeletons'].shape == (4, 5)
+    assert list(latest['rigid_bodies'][-1]['id']) == [1, 2]
+
+
+def test_since_returns_newer_frames():
+    frame_buffer = filled(8, range(20, 30))
+    assert list(frame_buffer.since(25)['frame_number']) == [26, 27, 28, 29]
+    assert len(frame_buffer.since(29)['frame_number']) == 0
+    assert list(frame_buffer.since(0)['frame_number']) == list(range(22, 30))
+
+
+def test_rows_grow_with_more_records():
+    frame_buffer = FrameBuffer(4)
+    for frame in frames(range(2), rigid_body_count=2):
+        frame_buffer.append(frame)
+    for frame in frames(range(2, 4), rigid_body_count=5):
+        frame_buffer.append(frame)
+    latest = frame_buffer.latest()
+    assert latest['rigid_bodies'].shape == (4, 5)
+    assert list(latest['rigid_bodies_count']) == [2, 2, 5, 5]
+    assert list(latest['rigid_bodies'][0, :2]['id']) == [1, 2]
+
+
+def test_version_change_drops_older_rows():
+    frame_buffer = FrameBuffer(4)
+    for frame in frames(range(2), version=(3, 1)):
+        frame_buffer.append(frame)
+    for frame in frames(range(2, 3), version=(2, 5)):
+        frame_buffer.append(frame)
+    latest = frame_buffer.latest()
+    assert latest['rigid_bodies'].dtype == structures.rigid_body_struct(2, 5)
+    assert list(latest['rigid_bodies_count']) == [0, 0, 2]
+    assert list(latest['frame_number']) == [0, 1, 2]
+
+
+def test_clear_resets_counters():
+    frame_buffer = filled(2, range(5), eviction=REJECT_NEWEST)
+    frame_buffer.clear()
+    assert (len(frame_buffer), frame_buffer.appended, frame_buffer.evicted, frame_buffer.received) == (0, 0, 0, 0)
+    for frame in frames([40]):
+        assert frame_buffer.append(frame)
+    assert list(frame_buffer.latest()['frame_number']) == [40]
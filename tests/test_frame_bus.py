@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+import structures
+from FrameBus import FramePublisher, FrameBusReader
+from NatNetSimulator import build_scene, FrameTemplate
+
+
+def decoded_frame(frame_number, version=(4, 1)):
+    _, mocap_data = build_scene(2, 1, 5, 3, 0)
+    packet = bytes(FrameTemplate(mocap_data, *version).frame(frame_number, frame_number / 120.0))
+    return structures.unpack_mocap_arrays(memoryview(packet)[4:], *version)[1]
+
+
+def test_close_while_publishing():
+    publisher = FramePublisher(capacity=8)
+    frame = decoded_frame(1)
+    errors = []
+
+    def publish():
+        try:
+            for i in range(2000):
+                publisher.write_frame(frame)
+        except Exception as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=publish)
+    thread.start()
+    while publisher.arrays is not None and publisher.published < 10:
+        pass
+    publisher.close()
+    thread.join()
+    assert errors == []
+
+
+def test_reader_close_with_live_views():
+    publisher = FramePublisher(capacity=8)
+    try:
+        publisher.write_frame(decoded_frame(1))
+        reader = FrameBusReader(publisher.name)
+        views = reader.latest(1)
+        with pytest.raises(BufferError):
+            reader.close()
+        # still attached
+        assert list(reader.read(1)['frame_number']) == [1]
+
+        del views
+        reader.close()
+        assert reader.arrays is None
+    finally:
+        publisher.close()
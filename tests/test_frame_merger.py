@@ -0,0 +1,84 @@
+import time
+
+from FrameMerger import FrameMerger
+
+
+class Frame:
+    def __init__(self, timestamp, name=None) -> None:
+        self.timestamp = timestamp
+        self.name = name
+
+    def copy(self):
+        return self
+
+
+def test_frames_released_in_local_time_order():
+    released = []
+    merger = FrameMerger(2, lambda source, frame: released.append(frame.name))
+    # server 1's clock is 100 s ahead
+    merger.push(0, Frame(1.00, 'a0'), arrival=1.00)
+    merger.push(1, Frame(101.01, 'b0'), arrival=1.01)
+    merger.push(0, Frame(1.02, 'a1'), arrival=1.02)
+    merger.push(1, Frame(101.03, 'b1'), arrival=1.03)
+    merger.flush(everything=True)
+    assert released == ['a0', 'b0', 'a1', 'b1']
+
+
+def test_offset_follows_clock_drift():
+    merger = FrameMerger(1, lambda source, frame: None, offset_window=1.0)
+    merger.push(0, Frame(0.0), arrival=5.0)
+    assert merger.offsets[0] == 5.0
+    # a less delayed frame lowers the offset right away
+    merger.push(0, Frame(1.0), arrival=5.5)
+    assert merger.offsets[0] == 4.5
+    # the server clock now runs slow: the offset rises once the
+    # earlier minimum is older than offset_window
+    merger.push(0, Frame(1.1), arrival=6.0)
+    assert merger.offsets[0] == 4.5
+    merger.push(0, Frame(1.2), arrival=6.7)
+    assert merger.offsets[0] == 4.9
+    merger.push(0, Frame(1.3), arrival=6.8)
+    assert merger.offsets[0] == 4.9
+
+
+def test_buffered_frames_placed_with_current_offset():
+    released = []
+    merger = FrameMerger(2, lambda source, frame: released.append(frame.name), window=10.0)
+    merger.push(0, Frame(10.0, 'a'), arrival=12.0)     # offset 2.0, local time 12.0
+    merger.push(0, Frame(10.5, 'a2'), arrival=12.5)
+    # a less delayed frame moves source 0's earlier frames back to 11.0
+    merger.push(0, Frame(11.0, 'a3'), arrival=12.0)
+    merger.push(1, Frame(11.3, 'b'), arrival=11.3)     # offset 0.0, local time 11.3
+    merger.flush(everything=True)
+    assert released == ['a', 'b', 'a2', 'a3']
+
+
+def test_listener_called_outside_the_lock():
+    merger = None
+    locked = []
+
+    def listener(source, frame):
+        locked.append(merger.lock.locked())
+        if frame.name == 'a':
+            # pushing from the listener must not deadlock
+            merger.push(0, Frame(frame.timestamp + 1.0, 'b'), arrival=frame.timestamp + 1.0)
+
+    merger = FrameMerger(1, listener)
+    merger.push(0, Frame(0.0, 'a'), arrival=0.0)
+    merger.flush(everything=True)
+    assert locked == [False, False]
+
+
+def test_started_merger_flushes_a_stalled_source():
+    released = []
+    merger = FrameMerger(2, lambda source, frame: released.append(frame.name), window=0.02)
+    merger.start(0.005)
+    try:
+        merger.push(0, Frame(0.0, 'a'))
+        deadline = time.monotonic() + 2.0
+        while not released and time.monotonic() < deadline:
+            time.sleep(0.005)
+    finally:
+        merger.stop()
+    assert released == ['a']
+    assert merger.flush_thread is None
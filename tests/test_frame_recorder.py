@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+h5py = pytest.importorskip('h5py')
+
+import structures
+from FrameRecorder import FrameRecorder, open_recording
+from NatNetSimulator import build_scene, FrameTemplate
+
+
+def decoded_frame(frame_number, bone_count=5, version=(4, 1)):
+    _, mocap_data = build_scene(2, 1, bone_count, 3, 0)
+    packet = bytes(FrameTemplate(mocap_data, *version).frame(frame_number, frame_number / 120.0))
+    return structures.unpack_mocap_arrays(memoryview(packet)[4:], *version)[1]
+
+
+def test_write_frame_after_close_is_ignored(tmp_path):
+    recorder = FrameRecorder(str(tmp_path / 'take.h5'))
+    recorder.write_frame(decoded_frame(1))
+    recorder.close()
+    # the decode thread may still deliver a frame
+    recorder.write_frame(decoded_frame(2))
+    recorder.flush()
+    recorder.close()
+
+    with h5py.File(str(tmp_path / 'take.h5'), 'r') as f:
+        assert list(f['frames']['frame_number']) == [1]
+
+
+def test_definition_change_waits_for_frame_boundary(tmp_path):
+    recorder = FrameRecorder(str(tmp_path / 'take.h5'), flush_every=100)
+    recorder.write_frame(decoded_frame(1, bone_count=5))
+    recorder.write_frame(decoded_frame(2, bone_count=6))
+    # nothing is written before flush_every frames
+    assert 'frames' not in recorder.file
+    recorder.close()
+
+    with h5py.File(str(tmp_path / 'take.h5'), 'r') as f:
+        assert list(f['frames']['frame_number']) == [1, 2]
+        skeleton_tables = sorted(name for name in f['skeletons'])
+        assert len(skeleton_tables) == 2
+        first, second = (f['skeletons'][name] for name in skeleton_tables)
+        assert list(first['frame_number']) == [1]
+        assert first['bones'].shape == (1, 5)
+        assert list(second['frame_number']) == [2]
+        assert second['bones'].shape == (1, 6)
+
+
+@pytest.mark.parametrize('version', [(2, 11), (3, 1), (4, 1)])
+def test_recording_reads_back(tmp_path, version):
+    path = str(tmp_path / 'take.h5')
+    recorder = FrameRecorder(path, flush_every=4, chunk_rows=8)
+    written = [decoded_frame(number, version=version).copy() for number in range(10)]
+    for frame in written:
+        recorder.write_frame(frame)
+    recorder.close()
+
+    with open_recording(path) as f:
+        assert f.attrs['frame_count'] == 10
+        assert list(f['frames']['frame_number']) == list(range(10))
+        assert f['frames']['timestamp'][3] == pytest.approx(3 / 120.0)
+
+        # one table per rigid body, one row per frame
+        assert sorted(f['rigid_bodies']) == ['1', '2']
+        table = f['rigid_bodies/2']
+        assert list(table['frame_number']) == list(range(10))
+        np.testing.assert_array_equal(table['pos'][7], written[7].rigid_bodies[1]['pos'])
+
+        bones = f['skeletons/3']['bones']
+        assert bones.shape == (10, 5)
+        np.testing.assert_array_equal(bones[9]['rot'], written[9].skeletons[3]['rot'])
+
+        # labeled markers are split by model id
+        assert sorted(f['labeled_markers']) == ['1', '2', '3']
+        assert len(f['labeled_markers/3']) == 10 * 3
@@ -0,0 +1,73 @@
+import os
+import time
+
+from Resources.APIs.Official.PythonClient.NatNetClient import NatNetClient
+from ModelDefCache import ModelDefCache, model_def_hash, CACHE_MAGIC
+from NatNetSimulator import build_scene, pack_data_descriptions, pack_server_info
+
+
+def server_info():
+    return pack_server_info("Motive", (3, 1, 0, 0), (4, 1, 0, 0), 1000000000)
+
+
+def test_store_and_load(tmp_path):
+    cache = ModelDefCache(str(tmp_path))
+    key = ModelDefCache.key('10.0.0.1', 'Motive', (3, 1, 0, 0), (4, 1))
+    assert cache.load(key) is None
+
+    content_hash = cache.store(key, b'first')
+    assert content_hash == model_def_hash(b'first')
+    assert cache.load(key) == (content_hash, b'first')
+    # other servers and versions have keys of their own
+    assert cache.load(ModelDefCache.key('10.0.0.1', 'Motive', (3, 1, 0, 0), (3, 1))) is None
+
+
+def test_newest_payload_wins_and_old_ones_are_pruned(tmp_path):
+    cache = ModelDefCache(str(tmp_path), keep=2)
+    key = ModelDefCache.key('10.0.0.1', 'Motive', (3, 1, 0, 0), (4, 1))
+    for i, payload in enumerate([b'one', b'two', b'three']):
+        cache.store(key, payload)
+        # mtimes order the files
+        path = os.path.join(str(tmp_path), '%s_%s.modeldef' % (key, model_def_hash(payload)))
+        os.utime(path, (time.time() + i, time.time() + i))
+    assert cache.load(key)[1] == b'three'
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_corrupt_files_are_skipped(tmp_path):
+    cache = ModelDefCache(str(tmp_path))
+    key = ModelDefCache.key('10.0.0.1', 'Motive', (3, 1, 0, 0), (4, 1))
+    cache.store(key, b'good')
+    path = os.path.join(str(tmp_path), '%s_%s.modeldef' % (key, model_def_hash(b'bad')))
+    with open(path, 'wb') as cache_file:
+        cache_file.write(CACHE_MAGIC + b'tampered')
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    assert cache.load(key)[1] == b'good'
+
+
+def test_key_is_a_safe_file_name():
+    key = ModelDefCache.key('fe80::1%eth0', 'Motive/Tracker', (3, 1, 0, 0), (4, 1))
+    assert '/' not in key and ':' not in key and '%' not in key
+
+
+# A second session with the same server gets its model definitions from the
+# cache as soon as the server is known, and doesn't parse the same reply again
+def test_client_uses_cache_across_sessions(tmp_path):
+    data_descs, _ = build_scene(2, 1, 5, 3, 0)
+    packet = pack_data_descriptions(data_descs, 4, 1)
+
+    first = NatNetClient()
+    first.model_def_cache = ModelDefCache(str(tmp_path))
+    first.process_packet(server_info())
+    first.process_packet(packet)
+
+    second = NatNetClient()
+    second.model_def_cache = ModelDefCache(str(tmp_path))
+    received = []
+    second.full_description_listener = received.append
+    second.process_packet(server_info())
+    assert len(received) == 1
+    assert [body.sz_name for body in received[0].rigid_body_list] == [b'RigidBody1', b'RigidBody2']
+
+    second.process_packet(packet)
+    assert received[1] is received[0]
@@ -0,0 +1,131 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from Resources.APIs.Official.PythonClient.NatNetClient import NatNetClient
+from NatNetSimulator import build_scene, FrameTemplate, pack_server_info
+
+
+def connected_client(version=(4, 1)):
+    client = NatNetClient()
+    client.process_packet(pack_server_info("Motive", (3, 1, 0, 0), tuple(version) + (0, 0), 1000000000))
+    return client
+
+
+def frame_packet(frame_number, version=(4, 1)):
+    _, mocap_data = build_scene(2, 1, 5, 3, 0)
+    return bytes(FrameTemplate(mocap_data, *version).frame(frame_number, frame_number / 120.0))
+
+
+# Run the decode thread over `packets` until `processed` returns True
+def run_decode_thread(client, packets, processed, timeout=5.0):
+    client.receive_queue = queue.Queue()
+    stopped = []
+    thread = threading.Thread(target=client._NatNetClient__decode_thread_function,
+                              args=(lambda: bool(stopped),))
+    thread.start()
+    try:
+        for packet in packets:
+            client.receive_queue.put((packet, 0, bytearray(len(packet))))
+        deadline = time.monotonic() + timeout
+        while not processed() and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stopped.append(True)
+        thread.join()
+
+
+def test_corrupt_packet_does_not_stop_decoding():
+    client = connected_client()
+    frames = []
+    client.frame_arrays_listener = lambda frame: frames.append(frame.frame_number)
+
+    valid = frame_packet(8)
+    # header claims the full frame, the payload is cut short
+    corrupt = valid[:len(valid) // 3]
+    run_decode_thread(client, [corrupt, valid], lambda: frames)
+
+    assert frames == [8]
+    metrics = client.get_metrics()
+    assert metrics['decode_errors'] == 1
+    assert metrics['last_decode_error'] is not None
+
+
+def test_failing_listener_does_not_stop_decoding():
+    client = connected_client()
+    frames = []
+
+    def listener(frame):
+        frames.append(frame.frame_number)
+        if len(frames) == 1:
+            raise RuntimeError("listener failed")
+
+    client.frame_arrays_listener = listener
+    run_decode_thread(client, [frame_packet(1), frame_packet(2)], lambda: len(frames) == 2)
+
+    assert frames == [1, 2]
+    assert client.get_metrics()['decode_errors'] == 1
+
+
+def test_packet_buffers_return_to_pool_after_errors():
+    client = connected_client()
+    client.frame_arrays_listener = lambda frame: 1 / 0
+    pool = client._NatNetClient__packet_pool
+    run_decode_thread(client, [frame_packet(1), frame_packet(2)],
+                      lambda: client.metrics.decode_errors == 2)
+    assert len(pool) == 2
+
+
+@pytest.mark.parametrize('version', [(2, 11), (3, 1), (4, 1)])
+def test_process_packet_decodes_frames(version):
+    client = connected_client(version)
+    frames = []
+    client.frame_arrays_listener = frames.append
+    assert client.process_packet(frame_packet(17, version)) == NatNetClient.NAT_FRAMEOFDATA
+    assert frames[0].frame_number == 17
+    assert len(frames[0].rigid_bodies) == 2
+
+
+# Motive ends frame packets with a 4 byte end-of-data tag after the suffix
+def tagged_frame_packet(frame_number, version, stamps):
+    _, mocap_data = build_scene(2, 1, 5, 3, 0)
+    packet = FrameTemplate(mocap_data, *version).frame(frame_number, frame_number / 120.0, stamps)
+    packet += (0).to_bytes(4, byteorder='little')
+    packet[2:4] = (len(packet) - 4).to_bytes(2, byteorder='little')
+    return bytes(packet)
+
+
+@pytest.mark.parametrize('arrays', [True, False])
+@pytest.mark.parametrize('version', [(3, 1), (4, 1)])
+def test_latencies_come_from_the_decoded_suffix(version, arrays):
+    client = connected_client(version)
+    if arrays:
+        client.frame_arrays_listener = lambda frame: None
+    # 1 GHz clock: exposure 5 ms and data received 1 ms before transmit
+    stamps = (1000000000, 1004000000, 1005000000)
+    client.process_packet(tagged_frame_packet(3, version, stamps))
+
+    metrics = client.get_metrics()
+    assert metrics['frames_decoded'] == 1
+    assert metrics['system_latency_ms']['p50'] == pytest.approx(5.0)
+    assert metrics['software_latency_ms']['p50'] == pytest.approx(1.0)
+
+
+def test_packets_counted_from_both_receive_threads():
+    client = connected_client()
+    metrics = client.metrics
+    metrics.reset()
+
+    def receive():
+        for i in range(20000):
+            metrics.record_packet(NatNetClient.NAT_FRAMEOFDATA, float(i))
+
+    threads = [threading.Thread(target=receive) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.packets_received == 40000
+    assert metrics.message_counts[NatNetClient.NAT_FRAMEOFDATA] == 40000
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from OptiTracker import OptiTracker
+from FrameBuffer import EVICT_OLDEST, REJECT_NEWEST
+from NatNetSimulator import build_scene, FrameTemplate, pack_server_info
+
+
+def frame_packets(numbers, version=(4, 1)):
+    _, mocap_data = build_scene(2, 1, 5, 3, 0)
+    template = FrameTemplate(mocap_data, *version)
+    return [bytes(template.frame(number, number / 120.0)) for number in numbers]
+
+
+def tracker(**kwargs):
+    tracker = OptiTracker(**kwargs)
+    tracker.client.process_packet(pack_server_info("Motive", (3, 1, 0, 0), (4, 1, 0, 0), 1000000000))
+    return tracker
+
+
+# Feed packets through the client from another thread, as the decode thread would
+def feed_later(tracker, packets, delay=0.05):
+    def feed():
+        time.sleep(delay)
+        for packet in packets:
+            tracker.client.process_packet(packet)
+    thread = threading.Thread(target=feed)
+    thread.start()
+    return thread
+
+
+@pytest.mark.parametrize('eviction', [EVICT_OLDEST, REJECT_NEWEST])
+def test_record_frames(eviction):
+    optitracker = tracker(buffer_capacity=16, eviction=eviction)
+    thread = feed_later(optitracker, frame_packets(range(100, 104)))
+    captured = optitracker.record(frames=3, duration=5.0)
+    thread.join()
+    assert list(captured['frame_number']) == [100, 101, 102]
+
+
+def test_record_frames_on_full_reject_buffer_returns():
+    optitracker = tracker(buffer_capacity=2, eviction=REJECT_NEWEST)
+    for packet in frame_packets(range(2)):
+        optitracker.client.process_packet(packet)
+    thread = feed_later(optitracker, frame_packets(range(2, 5)))
+    captured = optitracker.record(frames=3)
+    thread.join()
+    assert len(captured['frame_number']) == 0
+    assert optitracker.frame_buffer.evicted == 3
+
+
+def test_record_needs_duration_or_frames():
+    with pytest.raises(ValueError):
+        tracker().record()
+
+
+def test_frames_of_several_servers_are_merged():
+    optitracker = OptiTracker(servers=['10.0.0.1', '10.0.0.2'], reorder_window=10.0)
+    received = []
+    optitracker.frame_listener = lambda source, frame: received.append((source, frame.frame_number))
+    for source in optitracker.sources:
+        source.client.process_packet(pack_server_info("Motive", (3, 1, 0, 0), (4, 1, 0, 0), 1000000000))
+
+    for first, second in zip(frame_packets(range(0, 5)), frame_packets(range(100, 105))):
+        optitracker.sources[0].client.process_packet(first)
+        optitracker.sources[1].client.process_packet(second)
+    # as stop_client does once the clients are shut down
+    optitracker.merger.flush(everything=True)
+
+    assert sorted(received) == [(0, n) for n in range(5)] + [(1, n) for n in range(100, 105)]
+    for source in (0, 1):
+        numbers = [number for frame_source, number in received if frame_source == source]
+        assert numbers == sorted(numbers)
+    assert list(optitracker.sources[1].frame_buffer.latest()['frame_number']) == list(range(100, 105))
+    metrics = optitracker.get_metrics()
+    assert metrics['frames_merged'] == 10
+    assert metrics['frames_late'] == 0
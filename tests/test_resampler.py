@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+import pytest
+
+import structures
+from FrameBuffer import FrameBuffer
+from Resampler import Resampler, slerp
+from NatNetSimulator import build_scene, FrameTemplate
+
+
+def y_rotation(angle):
+    return np.array([0.0, math.sin(angle / 2), 0.0, math.cos(angle / 2)])
+
+
+def test_slerp():
+    q0 = y_rotation(0.0)
+    q1 = y_rotation(math.pi / 2)
+    alpha = np.array([0.0, 0.5, 1.0])
+    q = slerp(np.broadcast_to(q0, (3, 4)), np.broadcast_to(q1, (3, 4)), alpha)
+    np.testing.assert_allclose(q, [q0, y_rotation(math.pi / 4), q1], atol=1e-12)
+    # q and -q are the same rotation, the shorter arc is taken
+    np.testing.assert_allclose(slerp(q0, -q1, np.array(0.5)), y_rotation(math.pi / 4), atol=1e-12)
+    # nearly equal rotations fall back to a normalized lerp
+    q2 = y_rotation(1e-6)
+    assert np.linalg.norm(slerp(q0, q2, np.array(0.5))) == pytest.approx(1.0)
+
+
+# Frames of the simulator's scene at 120 Hz: everything spins about y at
+# 1/4 turn per second (see FrameTemplate.frame)
+def fill(frame_buffer, numbers, rate=120.0, version=(4, 1), untracked=None):
+    _, mocap_data = build_scene(2, 1, 3, 3, 0)
+    template = FrameTemplate(mocap_data, *version)
+    for number in numbers:
+        packet = bytes(template.frame(number, number / rate))
+        frame = structures.unpack_mocap_arrays(memoryview(packet)[4:], *version)[1].copy()
+        if untracked is not None and number == untracked:
+            frame.rigid_bodies['params'][1] = 0
+        frame_buffer.append(frame)
+
+
+def test_samples_on_a_uniform_clock():
+    frame_buffer = FrameBuffer(64)
+    fill(frame_buffer, range(13))
+    resampled = Resampler(frame_buffer, rate=50.0).update()
+
+    # frames span 0 .. 0.1 s
+    np.testing.assert_allclose(resampled['time'], [0.0, 0.02, 0.04, 0.06, 0.08, 0.1])
+    assert list(resampled['rigid_body_ids']) == [1, 2]
+    assert resampled['rigid_bodies'].shape == (6, 2, 7)
+    assert list(resampled['bone_ids']) == [(3 << 16) | bone for bone in (1, 2, 3)]
+    assert resampled['skeletons'].shape == (6, 3, 7)
+
+    # rotation at constant angular velocity is exact under slerp
+    for sample_time, poses in zip(resampled['time'], resampled['rigid_bodies']):
+        expected = y_rotation(0.5 * math.pi * sample_time)
+        np.testing.assert_allclose(poses[:, 3:7], [expected, expected], atol=1e-6)
+
+
+def test_updates_continue_where_the_last_one_stopped():
+    frame_buffer = FrameBuffer(64)
+    resampler = Resampler(frame_buffer, rate=100.0)
+    fill(frame_buffer, range(7))
+    first = resampler.update()
+    fill(frame_buffer, range(7, 13))
+    second = resampler.update()
+    assert len(resampler.update()['time']) == 0
+
+    times = np.concatenate((first['time'], second['time']))
+    np.testing.assert_allclose(times, np.arange(11) / 100.0)
+    assert resampler.samples == 11
+
+
+def test_gaps_and_untracked_assets_are_nan():
+    frame_buffer = FrameBuffer(64)
+    # frames 5 to 29 missing: a 0.21 s gap
+    fill(frame_buffer, list(range(5)) + list(range(30, 33)), untracked=31)
+    resampled = Resampler(frame_buffer, rate=100.0, max_gap=0.1).update()
+
+    times = resampled['time']
+    poses = resampled['rigid_bodies']
+    in_gap = (times > 4 / 120.0) & (times < 30 / 120.0)
+    assert in_gap.any()
+    assert np.isnan(poses[in_gap]).all()
+    assert not np.isnan(poses[times <= 4 / 120.0]).any()
+
+    # rigid body 2 is not tracked in frame 31, rigid body 1 is
+    around_31 = (times > 30 / 120.0) & (times < 32 / 120.0)
+    assert around_31.any()
+    assert np.isnan(poses[around_31, 1]).all()
+    assert not np.isnan(poses[around_31, 0]).any()
+
+
+def test_frame_number_restart_starts_over():
+    frame_buffer = FrameBuffer(64)
+    resampler = Resampler(frame_buffer, rate=100.0)
+    fill(frame_buffer, range(20, 30))
+    resampler.update()
+    frame_buffer.clear()
+    fill(frame_buffer, range(0, 5))
+    resampled = resampler.update()
+    np.testing.assert_allclose(resampled['time'], np.arange(4) / 100.0)
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        Resampler(FrameBuffer(4), rate=0.0)
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+import structures
+from Resources.APIs.Official.PythonClient.NatNetClient import NatNetClient
+from NatNetSimulator import build_scene, FrameTemplate, pack_mocap_data, pack_server_info
+
+# One version per change to the frame bitstream the decoders handle
+versions = [(2, 0), (2, 5), (2, 7), (2, 9), (2, 11), (3, 0), (3, 1), (4, 0), (4, 1)]
+
+
+def animated_packet(version, frame_number=42, t=0.3):
+    _, mocap_data = build_scene(3, 2, 4, 3, 5)
+    return bytes(FrameTemplate(mocap_data, *version).frame(frame_number, t))
+
+
+# Objects decoded record by record, the reference for the arrays
+def object_frame(packet, version):
+    client = NatNetClient()
+    client.process_packet(pack_server_info("Motive", (3, 1, 0, 0), tuple(version) + (0, 0), 1000000000))
+    return client._NatNetClient__unpack_mocap_data(
+        memoryview(packet)[4:], len(packet) - 4, structures.decode_plan(*version))
+
+
+@pytest.mark.parametrize('version', versions)
+def test_arrays_match_object_decoder(version):
+    packet = animated_packet(version)
+    consumed, frame = structures.unpack_mocap_arrays(memoryview(packet)[4:], *version)
+    object_consumed, mocap_data = object_frame(packet, version)
+
+    assert consumed == object_consumed == len(packet) - 4
+    assert frame.frame_number == 42
+    assert frame.timestamp == pytest.approx(0.3)
+
+    marker_data_list = mocap_data.marker_set_data.marker_data_list
+    assert list(frame.marker_sets) == [marker_data.model_name.decode('utf-8') for marker_data in marker_data_list]
+    for markers, marker_data in zip(frame.marker_sets.values(), marker_data_list):
+        np.testing.assert_allclose(markers, marker_data.marker_pos_list)
+    np.testing.assert_allclose(frame.unlabeled_markers,
+                               mocap_data.marker_set_data.unlabeled_markers.marker_pos_list)
+
+    rigid_body_list = mocap_data.rigid_body_data.rigid_body_list
+    assert frame.rigid_bodies.dtype == structures.rigid_body_struct(*version)
+    assert list(frame.rigid_bodies['id']) == [rigid_body.id_num for rigid_body in rigid_body_list]
+    np.testing.assert_allclose(frame.rigid_bodies['pos'], [rigid_body.pos for rigid_body in rigid_body_list])
+    np.testing.assert_allclose(frame.rigid_bodies['rot'], [rigid_body.rot for rigid_body in rigid_body_list])
+
+    skeleton_list = mocap_data.skeleton_data.skeleton_list
+    assert list(frame.skeletons) == [skeleton.id_num for skeleton in skeleton_list]
+    for bones, skeleton in zip(frame.skeletons.values(), skeleton_list):
+        assert list(bones['id']) == [bone.id_num for bone in skeleton.rigid_body_list]
+        np.testing.assert_allclose(bones['pos'], [bone.pos for bone in skeleton.rigid_body_list])
+
+    labeled_marker_list = mocap_data.labeled_marker_data.labeled_marker_list
+    if labeled_marker_list:
+        assert frame.labeled_markers.dtype == structures.labeled_marker_struct(*version)
+        assert list(frame.labeled_markers['id']) == [marker.id_num for marker in labeled_marker_list]
+        np.testing.assert_allclose(frame.labeled_markers['pos'], [marker.pos for marker in labeled_marker_list])
+    else:
+        assert len(frame.labeled_markers) == 0
+
+
+@pytest.mark.parametrize('version', [(3, 1), (4, 1)])
+def test_fixed_records_are_views_of_the_packet(version):
+    packet = bytearray(animated_packet(version))
+    _, frame = structures.unpack_mocap_arrays(memoryview(packet)[4:], *version)
+    buffer = np.frombuffer(packet, np.uint8)
+    assert np.shares_memory(frame.rigid_bodies, buffer)
+    assert np.shares_memory(frame.labeled_markers, buffer)
+    assert all(np.shares_memory(bones, buffer) for bones in frame.skeletons.values())
+
+    copied = frame.copy()
+    assert not np.shares_memory(copied.rigid_bodies, buffer)
+    np.testing.assert_array_equal(copied.rigid_bodies, frame.rigid_bodies)
+
+
+@pytest.mark.parametrize('version, itemsize', [((1, 0), 32), ((2, 5), 36), ((2, 6), 38), ((3, 0), 38)])
+def test_rigid_body_record_sizes(version, itemsize):
+    assert structures.rigid_body_struct(*version).itemsize == itemsize
+
+
+def test_frame_layout_structure_identifies_layout():
+    _, small = build_scene(2, 1, 4, 3, 0)
+    _, large = build_scene(3, 1, 4, 3, 0)
+    version = (4, 1)
+    first = pack_mocap_data(small, *version)
+    layout = structures.frame_layout(memoryview(first)[4:], *version)
+    assert layout['size'] == len(first) - 4
+    assert layout['rigid_bodies'][1] == 2
+
+    other = structures.frame_layout(memoryview(pack_mocap_data(large, *version))[4:], *version)
+    assert other['rigid_bodies'][1] == 3
+    assert other['suffix'] > layout['suffix']
+
+
+def test_read_name_spans_search_windows():
+    name = b'x' * (3 * structures.MAX_NAME_LENGTH + 5)
+    data = b'\x01\x02' + name + b'\0rest'
+    assert structures.read_name(data, 2) == (name, 2 + len(name) + 1)
+    # unterminated names run to the end of the data
+    assert structures.read_name(b'abc', 0) == (b'abc', 3)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import structures
+from structures import ALL, Subscription
+from OptiTracker import OptiTracker
+from NatNetSimulator import build_scene, FrameTemplate, pack_data_descriptions, pack_server_info
+
+# Scene: rigid bodies 1-3, skeletons 4 and 5 with 4 bones, 3 markers per asset
+scene = (3, 2, 4, 3, 2)
+
+
+def decode(version, subscription):
+    _, mocap_data = build_scene(*scene)
+    packet = bytes(FrameTemplate(mocap_data, *version).frame(7, 0.25))
+    return structures.unpack_mocap_arrays(memoryview(packet)[4:], *version, subscription=subscription)[1]
+
+
+@pytest.mark.parametrize('version', [(2, 11), (3, 1), (4, 1)])
+def test_only_subscribed_assets_are_decoded(version):
+    frame = decode(version, Subscription(
+        marker_sets=['RigidBody1'], unlabeled_markers=False, rigid_bodies=[2],
+        skeletons=None, labeled_markers=[4], force_plates=None, devices=None))
+
+    assert list(frame.marker_sets) == ['RigidBody1']
+    assert frame.unlabeled_markers is None
+    assert list(frame.rigid_bodies['id']) == [2]
+    assert len(frame.skeletons) == 0
+    # labeled markers are selected by model id
+    assert list(frame.labeled_markers['id'] >> 16) == [4, 4, 4]
+    # skipped sections still locate the ones after them
+    assert frame.frame_number == 7
+    assert frame.timestamp == pytest.approx(0.25)
+
+
+@pytest.mark.parametrize('version', [(2, 11), (4, 1)])
+def test_skeleton_bone_subscription(version):
+    frame = decode(version, Subscription(rigid_bodies=None, skeletons={5: [1, 3], 4: ALL}))
+    assert frame.rigid_bodies is None
+    assert list(frame.skeletons) == [4, 5]
+    assert len(frame.skeletons[4]) == 4
+    assert list(frame.skeletons[5]['id'] & 0xffff) == [1, 3]
+
+
+def test_empty_selection_decodes_nothing():
+    frame = decode((4, 1), Subscription(rigid_bodies=[], labeled_markers=[]))
+    assert len(frame.rigid_bodies) == 0
+    assert len(frame.labeled_markers) == 0
+    assert len(frame.skeletons) == 2
+
+
+def tracker_with_descriptions(version=(4, 1)):
+    data_descs, mocap_data = build_scene(*scene)
+    tracker = OptiTracker()
+    client = tracker.client
+    client.process_packet(pack_server_info("Motive", (3, 1, 0, 0), tuple(version) + (0, 0), 1000000000))
+    client.process_packet(pack_data_descriptions(data_descs, *version))
+    frames = []
+    tracker.frame_listener = lambda source, frame: frames.append(frame.copy())
+    return tracker, FrameTemplate(mocap_data, *version), frames
+
+
+def test_tracker_subscribes_by_name():
+    tracker, template, frames = tracker_with_descriptions()
+    tracker.subscribe(rigid_bodies=['RigidBody3', 1], skeletons={'Skeleton2': ['Skeleton2_Bone2']})
+    tracker.client.process_packet(bytes(template.frame(1, 0.0)))
+
+    frame = frames[-1]
+    assert sorted(frame.rigid_bodies['id']) == [1, 3]
+    assert list(frame.skeletons) == [5]
+    assert list(frame.skeletons[5]['id']) == [(5 << 16) | 2]
+    assert frame.labeled_markers is None
+
+    tracker.unsubscribe()
+    tracker.client.process_packet(bytes(template.frame(2, 0.01)))
+    assert len(frames[-1].rigid_bodies) == 3
+    assert np.array_equal(sorted(frames[-1].skeletons), [4, 5])
+
+
+def test_unknown_name_is_an_error():
+    tracker, _, _ = tracker_with_descriptions()
+    with pytest.raises(ValueError):
+        tracker.subscribe(rigid_bodies=['NoSuchBody'])
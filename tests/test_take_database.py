@@ -0,0 +1,86 @@
+import sqlite3
+
+import pytest
+
+import structures
+from TakeDatabase import TakeDatabase, open_take
+from NatNetSimulator import build_scene, FrameTemplate
+
+
+def frames(numbers, version=(4, 1)):
+    _, mocap_data = build_scene(2, 1, 4, 3, 0)
+    template = FrameTemplate(mocap_data, *version)
+    for number in numbers:
+        packet = bytes(template.frame(number, number / 120.0, (1000 * number, 1000 * number + 5, 1000 * number + 9)))
+        yield structures.unpack_mocap_arrays(memoryview(packet)[4:], *version)[1]
+
+
+def test_frames_and_descriptions_read_back(tmp_path):
+    path = str(tmp_path / 'take.db')
+    data_descs, _ = build_scene(2, 1, 4, 3, 0)
+    take = TakeDatabase(path, batch_frames=4)
+    take.write_descriptions(data_descs)
+    written = [frame.copy() for frame in frames(range(10))]
+    for frame in written:
+        take.write_frame(frame)
+    take.close()
+    assert take.frame_count == 10 and take.dropped_frames == 0
+
+    connection = open_take(path)
+    try:
+        rows = connection.execute(
+            "SELECT frame_number, timestamp, stamp_transmit FROM frames ORDER BY frame_number").fetchall()
+        assert [row[0] for row in rows] == list(range(10))
+        assert rows[3][1] == pytest.approx(3 / 120.0)
+        assert rows[3][2] == 3009
+
+        rigid_body = written[7].rigid_bodies[1]
+        row = connection.execute(
+            "SELECT pos_x, pos_y, pos_z, rot_w FROM rigid_bodies WHERE frame_number = 7 AND id = 2").fetchone()
+        assert row == pytest.approx(tuple(rigid_body['pos']) + (rigid_body['rot'][3],))
+
+        assert connection.execute("SELECT COUNT(*) FROM skeleton_bones").fetchone()[0] == 10 * 4
+        assert connection.execute(
+            "SELECT COUNT(*) FROM labeled_markers WHERE model_id = 3").fetchone()[0] == 10 * 3
+
+        names = connection.execute("SELECT id, name FROM rigid_body_descriptions ORDER BY id").fetchall()
+        assert names == [(1, 'RigidBody1'), (2, 'RigidBody2')]
+        assert connection.execute(
+            "SELECT name FROM skeleton_bone_descriptions WHERE skeleton_id = 3 AND id = 2").fetchone() == \
+            ('Skeleton1_Bone2',)
+
+        indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'rigid_bodies_index', 'skeleton_bones_index', 'labeled_markers_index'} <= indexes
+    finally:
+        connection.close()
+
+
+# The bitstream version changes during the take: later frames bring columns
+# the first ones lack, which are added and left NULL for the earlier rows
+def test_layout_change_mid_take(tmp_path):
+    path = str(tmp_path / 'take.db')
+    take = TakeDatabase(path, batch_frames=3)
+    for frame in frames(range(4), version=(2, 5)):
+        take.write_frame(frame)
+    for frame in frames(range(4, 8), version=(4, 1)):
+        take.write_frame(frame)
+    take.close()
+
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute(
+            "SELECT frame_number, params FROM rigid_bodies WHERE id = 1 ORDER BY frame_number").fetchall()
+        assert [row[0] for row in rows] == list(range(8))
+        assert [row[1] for row in rows] == [None] * 4 + [1] * 4
+        stamps = connection.execute("SELECT stamp_transmit FROM frames ORDER BY frame_number").fetchall()
+        assert [row[0] for row in stamps] == [None] * 4 + [4009, 5009, 6009, 7009]
+    finally:
+        connection.close()
+
+
+def test_close_raises_writer_error(tmp_path):
+    take = TakeDatabase(str(tmp_path / 'missing' / 'take.db'))
+    for frame in frames(range(3)):
+        take.write_frame(frame)
+    with pytest.raises(sqlite3.OperationalError):
+        take.close()